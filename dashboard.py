@@ -1,26 +1,28 @@
 
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from src.core.google_sheets_client import GoogleSheetsClient
-from fpdf import FPDF
+from src.core.google_sheets_client import get_shared_client
+from src.core.sheet_snapshot import sync_sheet_data, SheetSnapshotStore
+from src.core.background_refresh import BackgroundRefresher
+from src.core.profiling import (
+    available_profilers, profile_lap, profile_rerun, profile_section, profiling_forced, timed
+)
 from datetime import datetime
-import time
-import matplotlib.pyplot as plt
-import tempfile
-import re
-import seaborn as sns
-import os
-import re
-
-# Configuración de matplotlib para estilo profesional
-plt.style.use('ggplot')
-sns.set_palette("husl")
 
 # Custom Modules
-from src.components.profesionales_component import render_professionals_tab
-from src.utils.rutas_utils import create_route_pdf, generate_all_routes_zip, create_municipality_report_pdf, create_general_professionals_report_pdf
-from src.utils.trazabilidad_utils import scan_trazabilidades, get_rendicion_stats, load_historical_data_db, load_historical_data_json
+# Los generadores de PDF (fpdf, matplotlib, seaborn, PIL) se importan dentro de
+# la función que los usa, al abrir su módulo o pulsar su botón, y el componente
+# de profesionales en la rama de main que abre su módulo, para no pagar su
+# carga en cada arranque.
+from src.utils.trazabilidad_utils import read_historical_data_json, get_path_version
+from src.utils.historico_utils import HISTORICAL_DB_PATH, HistoricalStore, historical_db_is_current, write_historical_db
+from src.utils.filtros_utils import FilterIndex
+from src.utils.pendientes_utils import PendingBacklog
+from src.utils.exportar_utils import available_formats, export_cached, export_filename, export_mime, filter_fingerprint
+from src.utils.terapias_utils import THERAPY_CODE_COL, add_therapy_code, drop_therapy_code, get_therapy_codes
+from src.utils.normalizacion_utils import normalize_data
 
 # --- CONFIG & STYLING ---
 st.set_page_config(
@@ -126,51 +128,11 @@ st.markdown("""
 
 # --- UTILS ---
 
-class BasePDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'Sistema de Gestión Terapéutica', 0, 1, 'C')
-        self.set_font('Arial', 'I', 10)
-        self.cell(0, 10, f'Generado el: {datetime.now().strftime("%Y-%m-%d %H:%M")}', 0, 1, 'C')
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
-
-def clean_therapy_standard(val):
-    """
-    Normaliza los nombres de terapias a códigos estándar:
-    - TL: Terapia de Lenguaje / Fonoaudiología
-    - TF: Terapia Física / Fisioterapia
-    - TO: Terapia Ocupacional
-    - PS: Psicología
-    Elimina números y caracteres extra.
-    """
-    if pd.isna(val): return "N/A"
-    s = str(val).upper().strip()
-    
-    # 1. Códigos estándar y variaciones comunes
-    if 'TL' in s or 'FONO' in s or 'LENGUAJ' in s or 'COMUNICA' in s: return 'TL'
-    if 'TF' in s or 'FISI' in s: return 'TF'
-    if 'TO' in s or 'OCUP' in s: return 'TO'
-    if 'PS' in s or 'SICO' in s: return 'PS'
-    if 'EDUC' in s or 'ESP' in s: return 'EE'
-    
-    # 2. Limpieza de prefijos numéricos ("01. TL", "2-TF")
-    # Eliminar todo lo que NO sea letra
-    cleaned = re.sub(r'[^A-Z]', '', s)
-    
-    # Si queda algo razonable (2-3 chars), usarlo
-    if 2 <= len(cleaned) <= 3:
-        return cleaned
-        
-    # 3. Fallback estricto: Si no se reconoció nada válido (ej: "1", "A", "2023"), agrupar
-    return "OTROS"
-
+@timed()
 def create_executive_pdf(df_filtered, kpi_data):
     """Genera un reporte ejecutivo completo y profesional"""
+    from src.utils.reportes_utils import BasePDF
+
     pdf = BasePDF()
     
     # ==================== PORTADA ====================
@@ -308,14 +270,12 @@ def create_executive_pdf(df_filtered, kpi_data):
     pdf.ln(3)
     
     if 'TIPO DE TERAPIAS' in df_filtered.columns:
-        # Normalizar datos para evitar duplicados (espacios, mayúsculas)
-        df_therapy = df_filtered.copy()
-        df_therapy = df_filtered.copy()
-        # df_therapy['TIPO DE TERAPIAS'] = df_therapy['TIPO DE TERAPIAS'].astype(str).str.strip().str.upper()
-        df_therapy['TIPO DE TERAPIAS'] = df_therapy['TIPO DE TERAPIAS'].apply(clean_therapy_standard)
+        # Códigos de terapia normalizados (columna categórica THERAPY_CODE calculada al cargar)
+        therapy = get_therapy_codes(df_filtered, 'TIPO DE TERAPIAS')
         
-        therapy_counts = df_therapy['TIPO DE TERAPIAS'].value_counts()
-        therapy_sessions = df_therapy.groupby('TIPO DE TERAPIAS')['CANTIDAD'].sum() if 'CANTIDAD' in df_therapy.columns else None
+        therapy_counts = therapy.value_counts()
+        therapy_counts = therapy_counts[therapy_counts > 0]
+        therapy_sessions = df_filtered['CANTIDAD'].groupby(therapy, observed=True).sum() if 'CANTIDAD' in df_filtered.columns else None
         
         pdf.set_font("Arial", 'B', 10)
         pdf.set_fill_color(200, 220, 255)
@@ -475,7 +435,10 @@ def create_executive_pdf(df_filtered, kpi_data):
     
     return pdf.output(dest='S').encode('latin-1', 'replace')
 
+@timed()
 def create_novedades_pdf(df_filtered):
+    from src.utils.reportes_utils import BasePDF
+
     pdf = BasePDF()
     pdf.add_page()
     pdf.set_font("Arial", 'B', 14)
@@ -499,245 +462,109 @@ def create_novedades_pdf(df_filtered):
         pdf.ln(3)
     return pdf.output(dest='S').encode('latin-1', 'replace')
 
-def create_historical_report_pdf(df):
-    """Genera un reporte EVOLUTIVO y ANALÍTICO (2018-Presente)"""
-    pdf = BasePDF()
-    
-    # --- HELPER: Save Plot to Temp File ---
-    def save_plot_to_image(fig):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-            fig.savefig(tmpfile.name, dpi=300, bbox_inches='tight')
-            return tmpfile.name
+@st.cache_resource
+def get_sheet_refresher(sheet_url):
+    """Un refrescador por hoja, compartido entre sesiones (stale-while-revalidate, 5 min)."""
+    def fetch():
+        # Solo descarga la hoja si Drive reporta cambios; si no, usa el snapshot local
+        client = get_shared_client('credentials.json')
+        return sync_sheet_data(client, sheet_url)
 
-    # Datos Preparados
-    if 'AÑO_DATA' not in df.columns:
-        return None
-        
-    # Agrupar por año
-    df_yearly = df.groupby('AÑO_DATA').agg({
-        'CEDULA': 'nunique',
-        'CANTIDAD': 'sum',
-        'PROFESIONAL': 'nunique',
-        'MUNICIPIO': 'nunique'
-    }).reset_index().sort_values('AÑO_DATA')
-    df_yearly.columns = ['Año', 'Pacientes', 'Sesiones', 'Profesionales', 'Municipios']
-
-    # ==================== PÁGINA 1: PORTADA Y RESUMEN ====================
-    pdf.add_page()
-    pdf.ln(30)
-    pdf.set_font("Arial", 'B', 26)
-    pdf.cell(0, 15, "INFORME DE EVOLUCIÓN HISTÓRICA", 0, 1, 'C')
-    pdf.set_font("Arial", '', 14)
-    min_year = df_yearly['Año'].min()
-    max_year = df_yearly['Año'].max()
-    pdf.cell(0, 10, f"Análisis Longitudinal {min_year} - {max_year}", 0, 1, 'C')
-    pdf.ln(10)
-    
-    # Resumen acumulado
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 8, "Cifras Acumuladas del Periodo:", 0, 1, 'C')
-    
-    total_sess_hist = df['CANTIDAD'].sum()
-    unique_pats_hist = df['CEDULA'].nunique()
-    
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 8, f"Total Sesiones Realizadas: {int(total_sess_hist):,}", 0, 1, 'C')
-    pdf.cell(0, 8, f"Total Pacientes Atendidos: {unique_pats_hist:,}", 0, 1, 'C')
-    
-    pdf.ln(30)
-    pdf.set_font("Arial", 'I', 10)
-    pdf.multi_cell(0, 5, "Este documento presenta el análisis detallado del comportamiento operativo a lo largo de los años. Se enfoca en identificar tendencias de crecimiento, patrones estacionales y la evolución de la demanda de servicios terapéuticos.", 0, 'C')
+    return BackgroundRefresher(
+        fetch,
+        ttl=300,
+        initial=lambda: SheetSnapshotStore().load(sheet_url)
+    )
 
-    # ==================== PÁGINA 2: EVOLUCIÓN DEL CRECIMIENTO ====================
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "1. CURVA DE CRECIMIENTO ANUAL", 0, 1)
-    pdf.ln(5)
-    
-    # Gráfico 1: Evolución Pacientes vs Sesiones
-    fig, ax1 = plt.subplots(figsize=(10, 5))
-    
-    color = 'tab:blue'
-    ax1.set_xlabel('Año')
-    ax1.set_ylabel('Pacientes', color=color)
-    ax1.plot(df_yearly['Año'], df_yearly['Pacientes'], color=color, marker='o', linewidth=2, label='Pacientes')
-    ax1.tick_params(axis='y', labelcolor=color)
-    ax1.grid(True, alpha=0.3)
-    
-    ax2 = ax1.twinx()  
-    color = 'tab:red'
-    ax2.set_ylabel('Sesiones', color=color)  
-    ax2.plot(df_yearly['Año'], df_yearly['Sesiones'], color=color, marker='s', linestyle='--', linewidth=2, label='Sesiones')
-    ax2.tick_params(axis='y', labelcolor=color)
-    
-    plt.title("Evolución de Volumen Operativo")
-    fig.tight_layout()
-    
-    img_path = save_plot_to_image(fig)
-    pdf.image(img_path, x=10, w=190)
-    plt.close(fig)
-    os.remove(img_path)
-    
-    pdf.ln(5)
-    
-    # Tabla de Datos Anual
-    pdf.set_font("Arial", 'B', 10)
-    pdf.set_fill_color(220, 220, 220)
-    pdf.cell(25, 8, "Año", 1, 0, 'C', 1)
-    pdf.cell(40, 8, "Pacientes", 1, 0, 'C', 1)
-    pdf.cell(40, 8, "Sesiones", 1, 0, 'C', 1)
-    pdf.cell(40, 8, "Profesionales", 1, 0, 'C', 1)
-    pdf.cell(40, 8, "Var. Pacientes", 1, 1, 'C', 1) # Variación Anual
-    
-    pdf.set_font("Arial", '', 10)
-    prev_pats = 0
-    for idx, row in df_yearly.iterrows():
-        year = str(int(row['Año']))
-        pats = int(row['Pacientes'])
-        sess = int(row['Sesiones'])
-        profs = int(row['Profesionales'])
-        
-        # Calcular variación porcentual
-        if prev_pats > 0:
-            var_pct = ((pats - prev_pats) / prev_pats) * 100
-            var_str = f"{var_pct:+.1f}%"
-        else:
-            var_str = "-"
-        prev_pats = pats
-        
-        pdf.cell(25, 7, year, 1, 0, 'C')
-        pdf.cell(40, 7, f"{pats:,}", 1, 0, 'C')
-        pdf.cell(40, 7, f"{sess:,}", 1, 0, 'C')
-        pdf.cell(40, 7, f"{profs}", 1, 0, 'C')
-        pdf.cell(40, 7, var_str, 1, 1, 'C')
+def get_data_version(meta):
+    """Versión de los datos: solo cambia cuando la hoja se volvió a descargar."""
+    return f"{meta.get('modified_time', '')}|{meta.get('synced_at', '')}"
 
-    # ==================== PÁGINA 3: EVOLUCIÓN DE SERVICIOS ====================
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "2. EVOLUCIÓN DE TIPOS DE TERAPIA", 0, 1)
-    pdf.ln(5)
-    pdf.set_font("Arial", '', 10)
-    pdf.multi_cell(0, 5, "Análisis de cómo ha cambiado la composición de las terapias a lo largo de los años.")
-    pdf.ln(5)
-    
-    if 'TIPO_TERAPIA' in df.columns or 'TIPO DE TERAPIAS' in df.columns:
-        col_terapia = 'TIPO_TERAPIA' if 'TIPO_TERAPIA' in df.columns else 'TIPO DE TERAPIAS'
-        
-        # Limpieza rápida
-        df_srv = df.copy()
-        # Limpieza rápida
-        df_srv = df.copy()
-        # df_srv[col_terapia] = df_srv[col_terapia].astype(str).str.strip().str.upper()
-        df_srv[col_terapia] = df_srv[col_terapia].apply(clean_therapy_standard)
-        
-        # Pivot Table: Año vs Terapia (Cantidad)
-        pivot_srv = df_srv.groupby(['AÑO_DATA', col_terapia])['CANTIDAD'].sum().unstack(fill_value=0)
-        
-        # Filtrar Top 5 Terapias históricas para el gráfico (para no saturar)
-        top_services = df_srv.groupby(col_terapia)['CANTIDAD'].sum().sort_values(ascending=False).head(5).index
-        pivot_plot = pivot_srv[top_services]
-        
-        # Área Plot
-        fig2, ax2 = plt.subplots(figsize=(10, 6))
-        pivot_plot.plot(kind='area', stacked=True, alpha=0.6, ax=ax2)
-        plt.title("Tendencia de Volumen por Tipo de Terapia (Top 5)")
-        plt.ylabel("Número de Sesiones")
-        plt.xlabel("Año")
-        plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
-        fig2.tight_layout()
-        
-        img_path2 = save_plot_to_image(fig2)
-        pdf.image(img_path2, x=10, w=180)
-        plt.close(fig2)
-        os.remove(img_path2)
-        
-    # ==================== PÁGINA 4: ANÁLISIS POR EPS ====================
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "3. DINÁMICA DE CLIENTES (EPS)", 0, 1)
-    
-    if 'EPS' in df.columns:
-        # Pivot: Año vs EPS (Pacientes)
-        df_eps_clean = df.copy()
-        # Limpiar EPS nulas
-        df_eps_clean = df_eps_clean[df_eps_clean['EPS'].notna()]
-        
-        # Top 6 EPS históricas
-        top_eps = df_eps_clean['EPS'].value_counts().head(6).index
-        
-        df_eps_evo = df_eps_clean[df_eps_clean['EPS'].isin(top_eps)].groupby(['AÑO_DATA', 'EPS'])['CEDULA'].nunique().unstack(fill_value=0)
-        
-        # Line Plot Multiserie
-        fig3, ax3 = plt.subplots(figsize=(10, 6))
-        df_eps_evo.plot(kind='line', marker='o', linewidth=2, ax=ax3)
-        plt.title("Evolución de Pacientes en Top 6 EPS")
-        plt.ylabel("Pacientes Activos")
-        plt.grid(True, alpha=0.3)
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        fig3.tight_layout()
-        
-        img_path3 = save_plot_to_image(fig3)
-        pdf.image(img_path3, x=10, w=180)
-        plt.close(fig3)
-        os.remove(img_path3)
-        
-    # ==================== CONCLUSIONES (Generadas Dinámicamente) ====================
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "4. CONCLUSIONES ESTRATÉGICAS", 0, 1)
-    pdf.ln(5)
-    pdf.set_font("Arial", '', 11)
-    
-    conclusions = []
-    
-    # 1. Crecimiento Total
-    start_vals = df_yearly.iloc[0]
-    end_vals = df_yearly.iloc[-1]
-    years_diff = end_vals['Año'] - start_vals['Año']
-    if years_diff > 0:
-        growth_pats = ((end_vals['Pacientes'] - start_vals['Pacientes']) / start_vals['Pacientes']) * 100
-        conclusions.append(f"• En el periodo de {int(years_diff)} años, la base de pacientes ha variado un {growth_pats:+.1f}%.")
-    
-    # 2. Año Pico
-    peak_year_row = df_yearly.loc[df_yearly['Sesiones'].idxmax()]
-    conclusions.append(f"• El año {int(peak_year_row['Año'])} registró la mayor actividad histórica con {int(peak_year_row['Sesiones']):,} sesiones.")
-
-    # 3. Diversificación
-    if 'EPS' in df.columns:
-        eps_start = df[df['AÑO_DATA'] == min_year]['EPS'].nunique()
-        eps_end = df[df['AÑO_DATA'] == max_year]['EPS'].nunique()
-        conclusions.append(f"• La cartera de clientes ha pasado de {eps_start} EPS en {min_year} a {eps_end} EPS en {max_year}.")
-
-    for c in conclusions:
-        pdf.multi_cell(0, 8, c.encode('latin-1', 'replace').decode('latin-1'))
-        pdf.ln(2)
+# Columnas de la hoja de ingresos con índice de filas (filtros y vistas por profesional)
+INTAKE_INDEX_COLUMNS = ['PROFESIONAL', 'MUNICIPIO', 'EPS', 'TIPO DE USUARIO']
 
-    return pdf.output(dest='S').encode('latin-1', 'replace')
+@timed()
+@st.cache_resource(max_entries=4, show_spinner=False)
+def prepare_data(sheet_url, data_version, _df):
+    """
+    Normaliza y tipa el DataFrame una sola vez por versión de los datos y
+    construye su índice de filas. El resultado se comparte entre sesiones y
+    reruns: los módulos no deben mutarlo.
+
+    Returns:
+        FilterIndex: índice de filas; el DataFrame preparado (con la columna
+        categórica THERAPY_CODE) está en `.df`.
+    """
+    df = normalize_data(_df)
+    if 'CANTIDAD' in df.columns:
+        df = df.assign(CANTIDAD=pd.to_numeric(df['CANTIDAD'], errors='coerce').fillna(0))
+    df = add_therapy_code(df, 'TIPO DE TERAPIAS')
+    return FilterIndex(df, INTAKE_INDEX_COLUMNS, version=f"{sheet_url}|{data_version}")
+
+def load_prepared_data(sheet_url):
+    """Datos listos para los módulos (normalizados, CANTIDAD numérica) con su índice de filas."""
+    # Sin copia: prepare_data solo lee el DataFrame compartido y devuelve uno nuevo
+    df, meta = get_sheet_refresher(sheet_url).get()
+    return prepare_data(sheet_url, get_data_version(meta or {}), df)
 
-@st.cache_data(ttl=300)
-def load_data(sheet_url):
-    client = GoogleSheetsClient('credentials.json')
-    data = client.get_sheet_data(sheet_url)
-    if not data:
-        return pd.DataFrame()
-    return pd.DataFrame(data)
+def render_data_age(sheet_url):
+    refresher = get_sheet_refresher(sheet_url)
+    age = refresher.age_seconds()
+    if age is None:
+        st.sidebar.caption("🕒 Datos desde snapshot local")
+    elif age < 60:
+        st.sidebar.caption("🕒 Datos actualizados hace menos de 1 min")
+    else:
+        st.sidebar.caption(f"🕒 Datos actualizados hace {int(age // 60)} min")
+    if refresher.is_refreshing():
+        st.sidebar.caption("🔄 Actualizando en segundo plano...")
+    elif refresher.last_error is not None:
+        st.sidebar.caption(f"⚠️ Último refresco falló: {refresher.last_error}")
 
-def normalize_data(df):
+def render_export_download(df, fingerprint, file_stem, key, label="⬇️ Descargar", encoding='utf-8'):
     """
-    Global normalization for dataframe.
-    - Standardizes Professional Names (specifically merges Yeris Aponte variants).
+    Selector de formato + botón de exportación. El archivo se genera solo al
+    pedirlo (no en cada rerun) y se cachea por la huella de los filtros.
+    `df` puede ser una función sin argumentos que devuelve las filas, para
+    consultarlas solo al pedir la descarga y si el archivo no está en caché.
     """
-    if 'PROFESIONAL' in df.columns:
-        # Standardize strings to uppercase and strip
-        df['PROFESIONAL'] = df['PROFESIONAL'].astype(str).str.strip().str.upper()
-        
-        # Yeris Aponte Global Unification
-        # Matches: "YERIS APONTE", "YERIS APONTE VEREDA", "DR YERIS", etc.
-        regex_pattern = r'(YERIS\s+APONTE|DR\.?\s*YERIS)'
-        mask_yeris = df['PROFESIONAL'].str.contains(regex_pattern, regex=True, na=False)
-        df.loc[mask_yeris, 'PROFESIONAL'] = 'YERIS APONTE'
-        
-    return df
+    formats = available_formats()
+    fmt = st.selectbox("Formato", formats, key=f"{key}_fmt", label_visibility="collapsed")
+    if st.button("Preparar descarga", key=f"{key}_prep", use_container_width=True):
+        with st.spinner("Generando archivo..."):
+            data = export_cached(fingerprint, fmt, df, encoding)
+        st.download_button(
+            label,
+            data=data,
+            file_name=export_filename(file_stem, fmt),
+            mime=export_mime(fmt),
+            key=f"{key}_dl",
+            use_container_width=True
+        )
+
+@timed()
+@st.cache_resource(max_entries=4, show_spinner=False)
+def prepare_pending_backlog(data_version, _df):
+    """Backlog de eventos pendientes, construido una vez por versión de los datos preparados."""
+    return PendingBacklog(_df, version=data_version)
+
+# JSON del histórico (fuente de la base SQLite que consulta el módulo)
+HISTORICAL_SOURCE_PATH = 'data/processed/trazabilidad_LIMPIA.json'
+
+@timed()
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_historical_store(source_path, source_version):
+    """
+    Base SQLite del histórico lista para consultar. Se reconstruye desde el JSON
+    solo si este cambió desde la última construcción (o si la base no existe);
+    sin JSON se usa la base existente (p. ej. generada con consolidar_historico.py).
+    """
+    if source_version is not None and not historical_db_is_current(HISTORICAL_DB_PATH, source_path, source_version):
+        df = read_historical_data_json(source_path)
+        write_historical_db(df, HISTORICAL_DB_PATH, source=source_path, source_version=source_version)
+    if not os.path.exists(HISTORICAL_DB_PATH):
+        return None
+    return HistoricalStore(HISTORICAL_DB_PATH)
 
 def render_sidebar_header():
     st.sidebar.markdown(
@@ -751,110 +578,94 @@ def render_sidebar_header():
 
 # --- MODULES ---
 
-def module_historical_analysis(json_dir):
+def module_historical_analysis(source_path):
     """
     Módulo de Análisis Histórico Completo (2018-2025).
     Análisis ejecutivo con KPIs avanzados y reporte descargable.
+    Los filtros y agregaciones se resuelven en la base SQLite del histórico.
     """
     st.header("📊 Análisis Histórico Ejecutivo (2018 - Presente)")
     st.markdown("---")
 
     # Load Data
     with st.spinner("Cargando base de datos histórica..."):
-        df = load_historical_data_json(json_dir)
+        store = load_historical_store(source_path, get_path_version(source_path))
         
-    if df.empty:
-        st.warning("No se encontraron datos históricos procesados en JSON.")
+    if store is None or store.is_empty():
+        st.warning("No se encontraron datos históricos procesados.")
         return
-        
-    # Global Normalization
-    df = normalize_data(df)
 
     # --- SIDEBAR FILTERS ---
+    profile_lap("Filtros")
     st.sidebar.subheader("🔍 Filtros de Análisis")
     
     # 1. Year Filter
-    if 'AÑO_DATA' in df.columns:
-        available_years = sorted([y for y in df['AÑO_DATA'].unique() if y != 9999])
-        selected_years = st.sidebar.multiselect(
-            "Seleccionar Años", 
-            options=available_years,
-            default=available_years
-        )
-    else:
-        selected_years = []
+    available_years = [y for y in store.values('AÑO_DATA') if y != 9999]
+    selected_years = st.sidebar.multiselect(
+        "Seleccionar Años", 
+        options=available_years,
+        default=available_years
+    )
     
     # 2. Therapy Type Filter
-    if 'TIPO_TERAPIA' in df.columns:
-        available_therapies = sorted([t for t in df['TIPO_TERAPIA'].unique() if pd.notna(t)])
-        selected_therapies = st.sidebar.multiselect(
-            "Tipo de Terapia",
-            options=available_therapies,
-            default=available_therapies
-        )
-    else:
-        selected_therapies = []
+    available_therapies = store.values('TIPO_TERAPIA')
+    selected_therapies = st.sidebar.multiselect(
+        "Tipo de Terapia",
+        options=available_therapies,
+        default=available_therapies
+    )
     
     # 3. EPS Filter
-    if 'EPS' in df.columns:
-        available_eps = sorted([e for e in df['EPS'].unique() if pd.notna(e)])
-        selected_eps = st.sidebar.multiselect(
-            "EPS",
-            options=available_eps,
-            default=available_eps
-        )
-    else:
-        selected_eps = []
+    available_eps = store.values('EPS')
+    selected_eps = st.sidebar.multiselect(
+        "EPS",
+        options=available_eps,
+        default=available_eps
+    )
 
     # --- FILTERING LOGIC ---
-    mask = pd.Series([True]*len(df))
-    
-    if selected_years and 'AÑO_DATA' in df.columns:
-        mask = mask & df['AÑO_DATA'].isin(selected_years)
-        
-    if selected_therapies and 'TIPO_TERAPIA' in df.columns:
-        mask = mask & df['TIPO_TERAPIA'].isin(selected_therapies)
-        
-    if selected_eps and 'EPS' in df.columns:
-        mask = mask & df['EPS'].isin(selected_eps)
-        
-    df_filtered = df[mask]
+    # Los filtros se aplican en SQL (índices por año, terapia y EPS); sin filtros activos no hay WHERE
+    filters = {
+        'AÑO_DATA': selected_years,
+        'TIPO_TERAPIA': selected_therapies,
+        'EPS': selected_eps,
+    }
     
     # =========================
     # SECCIÓN 1: KPIs PRINCIPALES (12 INDICADORES)
     # =========================
+    profile_lap("KPIs")
     st.subheader("📈 Indicadores Clave de Desempeño")
     
-    # Calcular métricas
-    total_sesiones = df_filtered['CANTIDAD'].sum() if 'CANTIDAD' in df_filtered.columns else 0
-    total_pacientes = df_filtered['CEDULA'].nunique() if 'CEDULA' in df_filtered.columns else 0
-    total_registros = len(df_filtered)
+    # Calcular métricas (una sola consulta)
+    totals = store.totals(filters, ['Sesiones', 'Pacientes', 'Registros', 'Profesionales',
+                                    'EPS_Atendidas', 'Municipios', 'Tipos_Terapia'])
+    total_sesiones = totals['Sesiones']
+    total_pacientes = totals['Pacientes']
+    total_registros = totals['Registros']
     prom_sesiones_paciente = total_sesiones / total_pacientes if total_pacientes > 0 else 0
     
-    total_profesionales = df_filtered['PROFESIONAL'].nunique() if 'PROFESIONAL' in df_filtered.columns else 0
-    total_eps = df_filtered['EPS'].nunique() if 'EPS' in df_filtered.columns else 0
-    total_municipios = df_filtered['MUNICIPIO'].nunique() if 'MUNICIPIO' in df_filtered.columns else 0
-    total_terapias = df_filtered['TIPO_TERAPIA'].nunique() if 'TIPO_TERAPIA' in df_filtered.columns else 0
+    total_profesionales = totals['Profesionales']
+    total_eps = totals['EPS_Atendidas']
+    total_municipios = totals['Municipios']
+    total_terapias = totals['Tipos_Terapia']
+    
+    # Sesiones, pacientes y profesionales por año (crecimiento y comparación anual)
+    year_stats = store.aggregate(filters, ['Sesiones', 'Pacientes', 'Profesionales'], by='AÑO_DATA', ascending=True)
     
     # Crecimiento año a año
-    if 'AÑO_DATA' in df_filtered.columns and len(selected_years) >= 2:
+    if len(selected_years) >= 2:
         years_sorted = sorted(selected_years)
-        df_year_current = df_filtered[df_filtered['AÑO_DATA'] == years_sorted[-1]]
-        df_year_previous = df_filtered[df_filtered['AÑO_DATA'] == years_sorted[-2]]
-        
-        sesiones_current = df_year_current['CANTIDAD'].sum() if 'CANTIDAD' in df_year_current.columns else 0
-        sesiones_previous = df_year_previous['CANTIDAD'].sum() if 'CANTIDAD' in df_year_previous.columns else 0
+        sesiones_por_anio = year_stats.set_index('AÑO_DATA')['Sesiones']
+        sesiones_current = sesiones_por_anio.get(years_sorted[-1], 0)
+        sesiones_previous = sesiones_por_anio.get(years_sorted[-2], 0)
         
         growth_rate = ((sesiones_current - sesiones_previous) / sesiones_previous * 100) if sesiones_previous > 0 else 0
     else:
         growth_rate = 0
     
     # Tasa de retención (pacientes que aparecen en múltiples años)
-    if 'CEDULA' in df_filtered.columns and 'AÑO_DATA' in df_filtered.columns:
-        patient_years = df_filtered.groupby('CEDULA')['AÑO_DATA'].nunique()
-        retention_rate = (patient_years[patient_years > 1].count() / total_pacientes * 100) if total_pacientes > 0 else 0
-    else:
-        retention_rate = 0
+    retention_rate = (store.returning_patients(filters) / total_pacientes * 100) if total_pacientes > 0 else 0
     
     # Display KPIs en 4 filas de 3 columnas
     col1, col2, col3 = st.columns(3)
@@ -884,45 +695,35 @@ def module_historical_analysis(json_dir):
     # =========================
     # SECCIÓN 2: ANÁLISIS TEMPORAL
     # =========================
+    profile_lap("Tendencias temporales")
     st.subheader("📅 Análisis de Tendencias Temporales")
     
     tab1, tab2, tab3 = st.tabs(["📈 Evolución Mensual", "📊 Comparación Anual", "🔄 Estacionalidad"])
     
     with tab1:
-        if 'FECHA_INICIO' in df_filtered.columns:
-            df_time = df_filtered.dropna(subset=['FECHA_INICIO']).copy()
-            if not df_time.empty:
-                df_time['Periodo'] = df_time['FECHA_INICIO'].dt.to_period('M').astype(str)
-                time_stats = df_time.groupby('Periodo').agg({
-                    'CANTIDAD': 'sum',
-                    'CEDULA': 'nunique'
-                }).reset_index()
-                time_stats.columns = ['Periodo', 'Sesiones', 'Pacientes']
-                
-                fig_time = px.line(
-                    time_stats, 
-                    x='Periodo', 
-                    y=['Sesiones', 'Pacientes'],
-                    title='Evolución Mensual: Sesiones y Pacientes',
-                    markers=True,
-                    template="plotly_white"
-                )
-                fig_time.update_layout(yaxis_title="Cantidad", xaxis_title="Mes")
-                st.plotly_chart(fig_time, use_container_width=True)
+        time_stats = store.aggregate(filters, ['Sesiones', 'Pacientes'], by='PERIODO', ascending=True)
+        if not time_stats.empty:
+            time_stats = time_stats.rename(columns={'PERIODO': 'Periodo'})
+            
+            fig_time = px.line(
+                time_stats, 
+                x='Periodo', 
+                y=['Sesiones', 'Pacientes'],
+                title='Evolución Mensual: Sesiones y Pacientes',
+                markers=True,
+                template="plotly_white"
+            )
+            fig_time.update_layout(yaxis_title="Cantidad", xaxis_title="Mes")
+            st.plotly_chart(fig_time, use_container_width=True)
         else:
             st.info("No hay datos de fecha disponibles.")
     
     with tab2:
-        if 'AÑO_DATA' in df_filtered.columns:
-            year_stats = df_filtered.groupby('AÑO_DATA').agg({
-                'CANTIDAD': 'sum',
-                'CEDULA': 'nunique',
-                'PROFESIONAL': 'nunique'
-            }).reset_index()
-            year_stats.columns = ['Año', 'Sesiones', 'Pacientes', 'Profesionales']
+        if not year_stats.empty:
+            year_table = year_stats.rename(columns={'AÑO_DATA': 'Año'})
             
             fig_year = px.bar(
-                year_stats,
+                year_table,
                 x='Año',
                 y='Sesiones',
                 title='Sesiones Totales por Año',
@@ -935,339 +736,305 @@ def module_historical_analysis(json_dir):
             st.plotly_chart(fig_year, use_container_width=True)
             
             # Tabla de comparación
-            st.dataframe(year_stats, use_container_width=True, hide_index=True)
+            st.dataframe(year_table, use_container_width=True, hide_index=True)
     
     with tab3:
-        if 'FECHA_INICIO' in df_filtered.columns:
-            df_season = df_filtered.dropna(subset=['FECHA_INICIO']).copy()
-            if not df_season.empty:
-                df_season['Mes'] = df_season['FECHA_INICIO'].dt.month
-                season_stats = df_season.groupby('Mes')['CANTIDAD'].sum().reset_index()
-                season_stats['Mes_Nombre'] = season_stats['Mes'].apply(lambda x: ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic'][x-1])
-                
-                fig_season = px.bar(
-                    season_stats,
-                    x='Mes_Nombre',
-                    y='CANTIDAD',
-                    title='Patrón Estacional: Sesiones por Mes del Año',
-                    template="plotly_white",
-                    color='CANTIDAD',
-                    color_continuous_scale='RdYlGn'
-                )
-                st.plotly_chart(fig_season, use_container_width=True)
+        season_stats = store.aggregate(filters, ['Sesiones'], by='MES', ascending=True)
+        if not season_stats.empty:
+            meses_nombres = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+            season_stats = season_stats.assign(Mes_Nombre=[meses_nombres[int(m) - 1] for m in season_stats['MES']])
+            
+            fig_season = px.bar(
+                season_stats,
+                x='Mes_Nombre',
+                y='Sesiones',
+                title='Patrón Estacional: Sesiones por Mes del Año',
+                template="plotly_white",
+                color='Sesiones',
+                color_continuous_scale='RdYlGn'
+            )
+            st.plotly_chart(fig_season, use_container_width=True)
     
     st.markdown("---")
     
     # =========================
     # SECCIÓN 3: ANÁLISIS POR DIMENSIONES
     # =========================
+    profile_lap("Análisis multidimensional")
     st.subheader("🔍 Análisis Multidimensional")
     
     col_left, col_right = st.columns(2)
     
     with col_left:
         st.markdown("#### 🏥 Top 10 EPS por Volumen")
-        if 'EPS' in df_filtered.columns:
-            eps_stats = df_filtered.groupby('EPS').agg({
-                'CANTIDAD': 'sum',
-                'CEDULA': 'nunique'
-            }).reset_index().sort_values('CANTIDAD', ascending=False).head(10)
-            eps_stats.columns = ['EPS', 'Sesiones', 'Pacientes']
-            
-            fig_eps = px.bar(
-                eps_stats,
-                y='EPS',
-                x='Sesiones',
-                orientation='h',
-                title='',
-                template="plotly_white",
-                color='Sesiones',
-                color_continuous_scale='Blues',
-                text='Sesiones'
-            )
-            fig_eps.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-            fig_eps.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig_eps, use_container_width=True)
+        eps_stats = store.aggregate(filters, ['Sesiones', 'Pacientes'], by='EPS', order_by='Sesiones', limit=10)
+        
+        fig_eps = px.bar(
+            eps_stats,
+            y='EPS',
+            x='Sesiones',
+            orientation='h',
+            title='',
+            template="plotly_white",
+            color='Sesiones',
+            color_continuous_scale='Blues',
+            text='Sesiones'
+        )
+        fig_eps.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
+        fig_eps.update_layout(yaxis={'categoryorder':'total ascending'})
+        st.plotly_chart(fig_eps, use_container_width=True)
     
     with col_right:
         st.markdown("#### 🎯 Distribución por Tipo de Terapia")
-        if 'TIPO_TERAPIA' in df_filtered.columns:
-            # Limpieza de datos visual para el gráfico
-            df_chart = df_filtered.copy()
-            df_chart['TIPO_TERAPIA_CLEAN'] = df_chart['TIPO_TERAPIA'].apply(clean_therapy_standard)
-            
-            terapia_stats = df_chart.groupby('TIPO_TERAPIA_CLEAN')['CANTIDAD'].sum().reset_index().sort_values('CANTIDAD', ascending=False)
-            
-            fig_therapy = px.pie(
-                terapia_stats,
-                values='CANTIDAD',
-                names='TIPO_TERAPIA_CLEAN',
-                title='',
-                template="plotly_white",
-                hole=0.4
-            )
-            st.plotly_chart(fig_therapy, use_container_width=True)
+        # Códigos de terapia normalizados (calculados al construir la base)
+        terapia_stats = store.aggregate(filters, ['Sesiones'], by=THERAPY_CODE_COL, order_by='Sesiones')
+        
+        fig_therapy = px.pie(
+            terapia_stats.rename(columns={THERAPY_CODE_COL: 'TIPO_TERAPIA_CLEAN'}),
+            values='Sesiones',
+            names='TIPO_TERAPIA_CLEAN',
+            title='',
+            template="plotly_white",
+            hole=0.4
+        )
+        st.plotly_chart(fig_therapy, use_container_width=True)
     
     # =========================
     # SECCIÓN 4: ANÁLISIS DE PROFESIONALES
     # =========================
+    profile_lap("Profesionales")
     st.markdown("---")
     st.subheader("👨‍⚕️ Desempeño de Profesionales")
     
-    if 'PROFESIONAL' in df_filtered.columns:
-        prof_stats = df_filtered.groupby('PROFESIONAL').agg({
-            'CEDULA': 'nunique',
-            'CANTIDAD': 'sum',
-            'MUNICIPIO': 'nunique'
-        }).reset_index()
-        prof_stats.columns = ['Profesional', 'Pacientes', 'Sesiones', 'Municipios']
-        prof_stats['Prom_Sesiones'] = prof_stats['Sesiones'] / prof_stats['Pacientes']
-        prof_stats = prof_stats.sort_values('Sesiones', ascending=False).head(20)
-        
-        st.dataframe(
-            prof_stats.style.format({
-                'Pacientes': '{:,.0f}',
-                'Sesiones': '{:,.0f}',
-                'Prom_Sesiones': '{:.1f}'
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
+    prof_stats = store.aggregate(filters, ['Pacientes', 'Sesiones', 'Municipios'], by='PROFESIONAL', order_by='Sesiones', limit=20)
+    prof_stats = prof_stats.rename(columns={'PROFESIONAL': 'Profesional'})
+    prof_stats = prof_stats.assign(Prom_Sesiones=prof_stats['Sesiones'] / prof_stats['Pacientes'])
+    
+    st.dataframe(
+        prof_stats.style.format({
+            'Pacientes': '{:,.0f}',
+            'Sesiones': '{:,.0f}',
+            'Prom_Sesiones': '{:.1f}'
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
     
     # =========================
     # SECCIÓN 5: COBERTURA GEOGRÁFICA
     # =========================
+    profile_lap("Cobertura geográfica")
     st.markdown("---")
     st.subheader("🗺️ Cobertura Geográfica Completa")
     
-    if 'MUNICIPIO' in df_filtered.columns:
-        # Calcular estadísticas completas por municipio
-        mun_stats_full = df_filtered.groupby('MUNICIPIO').agg({
-            'CEDULA': 'nunique',
-            'CANTIDAD': 'sum',
-            'PROFESIONAL': 'nunique'
-        }).reset_index().sort_values('CEDULA', ascending=False)
-        mun_stats_full.columns = ['Municipio', 'Pacientes', 'Sesiones', 'Profesionales']
-        
-        # KPIs de cobertura
-        col_geo1, col_geo2, col_geo3 = st.columns(3)
-        col_geo1.metric("🌍 Total Municipios", len(mun_stats_full))
-        col_geo2.metric("🏆 Municipio Principal", mun_stats_full.iloc[0]['Municipio'] if len(mun_stats_full) > 0 else "N/A")
-        col_geo3.metric("👥 Pacientes (Principal)", f"{mun_stats_full.iloc[0]['Pacientes']:,.0f}" if len(mun_stats_full) > 0 else "0")
+    # Estadísticas completas por municipio (resultado compartido: no mutar)
+    mun_stats_full = store.aggregate(filters, ['Pacientes', 'Sesiones', 'Profesionales'], by='MUNICIPIO', order_by='Pacientes')
+    mun_stats_full = mun_stats_full.rename(columns={'MUNICIPIO': 'Municipio'})
+    
+    # KPIs de cobertura
+    col_geo1, col_geo2, col_geo3 = st.columns(3)
+    col_geo1.metric("🌍 Total Municipios", len(mun_stats_full))
+    col_geo2.metric("🏆 Municipio Principal", mun_stats_full.iloc[0]['Municipio'] if len(mun_stats_full) > 0 else "N/A")
+    col_geo3.metric("👥 Pacientes (Principal)", f"{mun_stats_full.iloc[0]['Pacientes']:,.0f}" if len(mun_stats_full) > 0 else "0")
+    
+    st.markdown("---")
+    
+    # Tabs para diferentes vistas
+    tab_chart, tab_list, tab_table = st.tabs(["📊 Top 15 Municipios", "📋 Lista Completa", "📈 Tabla Detallada"])
+    
+    with tab_chart:
+        # Gráfico Top 15
+        mun_top15 = mun_stats_full.head(15)
+        fig_mun = px.bar(
+            mun_top15,
+            x='Municipio',
+            y='Pacientes',
+            title='Top 15 Municipios por Pacientes Atendidos',
+            template="plotly_white",
+            color='Pacientes',
+            color_continuous_scale='Greens',
+            text='Pacientes'
+        )
+        fig_mun.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
+        st.plotly_chart(fig_mun, use_container_width=True)
+    
+    with tab_list:
+        st.markdown("#### 🗺️ Listado Alfabético de Todos los Municipios Atendidos")
+        st.caption(f"Total: {len(mun_stats_full)} municipios")
         
-        st.markdown("---")
+        # Ordenar alfabéticamente
+        mun_sorted = mun_stats_full.sort_values('Municipio')
         
-        # Tabs para diferentes vistas
-        tab_chart, tab_list, tab_table = st.tabs(["📊 Top 15 Municipios", "📋 Lista Completa", "📈 Tabla Detallada"])
+        # Mostrar en columnas para mejor visualización
+        num_cols = 3
+        cols = st.columns(num_cols)
         
-        with tab_chart:
-            # Gráfico Top 15
-            mun_top15 = mun_stats_full.head(15)
-            fig_mun = px.bar(
-                mun_top15,
-                x='Municipio',
-                y='Pacientes',
-                title='Top 15 Municipios por Pacientes Atendidos',
-                template="plotly_white",
-                color='Pacientes',
-                color_continuous_scale='Greens',
-                text='Pacientes'
-            )
-            fig_mun.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-            st.plotly_chart(fig_mun, use_container_width=True)
+        for idx, (municipio, pacientes, sesiones) in enumerate(zip(mun_sorted['Municipio'], mun_sorted['Pacientes'], mun_sorted['Sesiones'])):
+            col_idx = idx % num_cols
+            with cols[col_idx]:
+                st.markdown(f"**{idx+1}. {municipio}**")
+                st.caption(f"👥 {pacientes:,.0f} pacientes | 💉 {sesiones:,.0f} sesiones")
+    
+    with tab_table:
+        st.markdown("#### 📊 Estadísticas Detalladas por Municipio")
         
-        with tab_list:
-            st.markdown("#### 🗺️ Listado Alfabético de Todos los Municipios Atendidos")
-            st.caption(f"Total: {len(mun_stats_full)} municipios")
-            
-            # Ordenar alfabéticamente
-            municipios_sorted = sorted(mun_stats_full['Municipio'].dropna().unique())
-            
-            # Mostrar en columnas para mejor visualización
-            num_cols = 3
-            cols = st.columns(num_cols)
-            
-            for idx, municipio in enumerate(municipios_sorted):
-                col_idx = idx % num_cols
-                with cols[col_idx]:
-                    # Obtener stats del municipio
-                    mun_data = mun_stats_full[mun_stats_full['Municipio'] == municipio].iloc[0]
-                    st.markdown(f"**{idx+1}. {municipio}**")
-                    st.caption(f"👥 {mun_data['Pacientes']:,.0f} pacientes | 💉 {mun_data['Sesiones']:,.0f} sesiones")
+        # Agregar columnas calculadas
+        mun_table = mun_stats_full.assign(**{
+            'Prom_Sesiones_Paciente': mun_stats_full['Sesiones'] / mun_stats_full['Pacientes'],
+            '% del Total': mun_stats_full['Pacientes'] / mun_stats_full['Pacientes'].sum() * 100,
+        })
         
-        with tab_table:
-            st.markdown("#### 📊 Estadísticas Detalladas por Municipio")
-            
-            # Agregar columnas calculadas
-            mun_stats_full['Prom_Sesiones_Paciente'] = mun_stats_full['Sesiones'] / mun_stats_full['Pacientes']
-            mun_stats_full['% del Total'] = (mun_stats_full['Pacientes'] / mun_stats_full['Pacientes'].sum() * 100)
-            
-            st.dataframe(
-                mun_stats_full.style.format({
-                    'Pacientes': '{:,.0f}',
-                    'Sesiones': '{:,.0f}',
-                    'Profesionales': '{:.0f}',
-                    'Prom_Sesiones_Paciente': '{:.1f}',
-                    '% del Total': '{:.2f}%'
-                }),
-                use_container_width=True,
-                hide_index=True,
-                height=400
-            )
+        st.dataframe(
+            mun_table.style.format({
+                'Pacientes': '{:,.0f}',
+                'Sesiones': '{:,.0f}',
+                'Profesionales': '{:.0f}',
+                'Prom_Sesiones_Paciente': '{:.1f}',
+                '% del Total': '{:.2f}%'
+            }),
+            use_container_width=True,
+            hide_index=True,
+            height=400
+        )
     
     # =========================
     # SECCIÓN 6: DEEP DIVE POR AÑO
     # =========================
+    profile_lap("Deep dive")
     st.markdown("---")
     st.subheader("🔍 Análisis Detallado por Año y Mes (Deep Dive)")
     
-    if 'AÑO_DATA' in df.columns:
-        all_years = sorted(df['AÑO_DATA'].unique())
-        c1, c2 = st.columns(2)
-        with c1:
-            selected_dive_year = st.selectbox("Seleccione un año:", options=all_years, index=len(all_years)-1)
-        
-        # Filtrar por año primero para obtener meses disponibles
-        df_year_raw = df[df['AÑO_DATA'] == selected_dive_year].copy()
-        
-        # Procesar meses si hay fechas
-        if 'FECHA_INICIO' in df_year_raw.columns:
-            df_year_raw['Mes_Num'] = df_year_raw['FECHA_INICIO'].dt.month
-            meses_disp = sorted(df_year_raw['Mes_Num'].dropna().unique().astype(int))
-            meses_nombres = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
-            meses_opciones = {m: meses_nombres[m-1] for m in meses_disp}
-            
-            with c2:
-                selected_dive_months = st.multiselect(
-                    "Filtrar por Meses:", 
-                    options=meses_disp, 
-                    default=meses_disp,
-                    format_func=lambda x: meses_opciones.get(x, str(x))
-                )
-            
-            # Corrección del filtro: usar los meses seleccionados
-            if not selected_dive_months:
-                df_year = df_year_raw
-            else:
-                df_year = df_year_raw[df_year_raw['Mes_Num'].isin(selected_dive_months)]
-        else:
-            df_year = df_year_raw
-            st.warning("No se detectaron columnas de fecha para filtrado mensual en este periodo.")
-
-        if not df_year.empty:
-            # Asegurar que Mes_Num sea int para evitar TypeErrors en el mapeo
-            if 'Mes_Num' in df_year.columns:
-                df_year['Mes_Num'] = df_year['Mes_Num'].fillna(0).astype(int)
-            
-            st.info(f"Mostrando detalles para **{selected_dive_year}** ({len(selected_dive_months) if 'selected_dive_months' in locals() else 'todos'} meses seleccionados)")
-            
-            # Sub-KPIs para el periodo seleccionado
-            s1, s2, s3, s4 = st.columns(4)
-            y_sesiones = df_year['CANTIDAD'].sum()
-            y_pacientes = df_year['CEDULA'].nunique()
-            y_profesionales = df_year['PROFESIONAL'].nunique()
-            y_municipios = df_year['MUNICIPIO'].nunique()
-            
-            s1.metric("💉 Sesiones", f"{y_sesiones:,.0f}")
-            s2.metric("👥 Pacientes", f"{y_pacientes:,.0f}")
-            s3.metric("👨‍⚕️ Profesionales", y_profesionales)
-            s4.metric("📍 Municipios", y_municipios)
-            
-            # Visualizaciones
-            tab_dive1, tab_dive2, tab_dive3 = st.tabs(["📈 Tendencia y EPS", "🔎 Diagnóstico y Geografía", "👥 Lista Detallada"])
-            
-            with tab_dive1:
-                d1, d2 = st.columns(2)
-                with d1:
-                    # Evolución mensual (o diaria si es un solo mes)
-                    if 'Mes_Num' in df_year.columns and len(selected_dive_months) == 1:
-                        df_year['Dia'] = df_year['FECHA_INICIO'].dt.day
-                        y_day_stats = df_year.groupby('Dia')['CANTIDAD'].sum().reset_index()
-                        fig_y_time = px.line(y_day_stats, x='Dia', y='CANTIDAD', title=f'Sesiones Diarias: {meses_opciones[selected_dive_months[0]]} {selected_dive_year}', markers=True)
-                    elif 'Mes_Num' in df_year.columns:
-                        y_time_stats = df_year.groupby('Mes_Num')['CANTIDAD'].sum().reset_index()
-                        # Cast to int to be safe against TypeError
-                        meses_list = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
-                        y_time_stats['Nombre_Mes'] = y_time_stats['Mes_Num'].apply(lambda x: meses_list[int(x)-1] if 0 < int(x) <= 12 else "Sin Mes")
-                        fig_y_time = px.line(y_time_stats, x='Nombre_Mes', y='CANTIDAD', title=f'Evolución Mensual en {selected_dive_year}', markers=True)
-                    else:
-                        st.write("Faltan datos temporales para esta gráfica.")
-                    st.plotly_chart(fig_y_time, use_container_width=True)
-                
-                with d2:
-                    if 'EPS' in df_year.columns:
-                        y_eps_stats = df_year.groupby('EPS')['CANTIDAD'].sum().reset_index().sort_values('CANTIDAD', ascending=False).head(10)
-                        fig_y_eps = px.bar(y_eps_stats, x='CANTIDAD', y='EPS', orientation='h', title='Top 10 EPS', color='CANTIDAD', template="plotly_white")
-                        st.plotly_chart(fig_y_eps, use_container_width=True)
-
-            with tab_dive2:
-                g1, g2 = st.columns(2)
-                with g1:
-                    if 'DIAGNOSTICO' in df_year.columns:
-                        y_diag_stats = df_year.groupby('DIAGNOSTICO')['CEDULA'].nunique().reset_index().sort_values('CEDULA', ascending=False).head(10)
-                        y_diag_stats.columns = ['Diagnóstico', 'Pacientes']
-                        fig_y_diag = px.bar(y_diag_stats, x='Pacientes', y='Diagnóstico', orientation='h', title='Top 10 Diagnósticos (Pacientes)', color='Pacientes', color_continuous_scale='Reds')
-                        st.plotly_chart(fig_y_diag, use_container_width=True)
-                
-                with g2:
-                    if 'MUNICIPIO' in df_year.columns:
-                        y_mun_stats = df_year.groupby('MUNICIPIO')['CANTIDAD'].sum().reset_index().sort_values('CANTIDAD', ascending=False).head(10)
-                        fig_y_mun = px.bar(y_mun_stats, x='CANTIDAD', y='MUNICIPIO', orientation='h', title='Top 10 Municipios (Sesiones)', color='CANTIDAD', color_continuous_scale='Purples')
-                        st.plotly_chart(fig_y_mun, use_container_width=True)
-
-            with tab_dive3:
-                # Detalle de Profesionales y Pacientes
-                p_col1, p_col2 = st.columns([1, 1])
-                with p_col1:
-                    st.markdown(f"#### 👨‍⚕️ Profesionales en el Periodo")
-                    y_prof_stats = df_year.groupby('PROFESIONAL').agg({
-                        'CANTIDAD': 'sum',
-                        'CEDULA': 'nunique'
-                    }).reset_index().sort_values('CANTIDAD', ascending=False)
-                    y_prof_stats.columns = ['Profesional', 'Sesiones', 'Pacientes']
-                    st.dataframe(y_prof_stats, use_container_width=True, hide_index=True)
-                
-                with p_col2:
-                    st.markdown(f"#### 👥 Resumen por EPS")
-                    y_eps_detail = df_year.groupby('EPS').agg({
-                        'CEDULA': 'nunique',
-                        'CANTIDAD': 'sum'
-                    }).reset_index().sort_values('CEDULA', ascending=False)
-                    y_eps_detail.columns = ['EPS', 'Pacientes', 'Sesiones']
-                    st.dataframe(y_eps_detail, use_container_width=True, hide_index=True)
-        else:
-            st.warning("No se encontraron datos para la combinación de filtros seleccionada.")
+    _historico_deep_dive(store)
     
     # =========================
     # SECCIÓN 7: REPORTE DESCARGABLE
     # =========================
+    profile_lap("Reporte y datos")
     st.markdown("---")
     st.subheader("📥 Generar Reporte Ejecutivo")
     
-    col_btn1, col_btn2 = st.columns(2)
+    # Preparar datos para el reporte
+    kpi_data = {
+        "Total Sesiones": int(total_sesiones),
+        "Pacientes Únicos": total_pacientes,
+        "Profesionales Activos": total_profesionales,
+        "EPS Atendidas": total_eps,
+        "Municipios Cubiertos": total_municipios,
+        "Crecimiento Anual": f"{growth_rate:.1f}%",
+        "Tasa de Retención": f"{retention_rate:.1f}%"
+    }
+    export_key = filter_fingerprint(store.version, selected_years, selected_therapies, selected_eps)
+    _historico_descargas(store, filters, kpi_data, export_key)
     
+    # --- RAW DATA VIEW ---
+    with st.expander("🔎 Ver Datos Detallados (Tabla Completa)"):
+        st.dataframe(drop_therapy_code(store.rows(filters, limit=1000)), use_container_width=True)
+
+@st.fragment
+def _historico_deep_dive(store):
+    """Deep dive por año/mes: no depende de los filtros del sidebar, se recalcula solo al cambiar su selección."""
+    all_years = store.values('AÑO_DATA')
+    c1, c2 = st.columns(2)
+    with c1:
+        selected_dive_year = st.selectbox("Seleccione un año:", options=all_years, index=len(all_years)-1)
+
+    # Meses con fecha de inicio en el año elegido
+    meses_disp = [int(m) for m in store.values('MES', {'AÑO_DATA': [selected_dive_year]})]
+    meses_nombres = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+    meses_opciones = {m: meses_nombres[m-1] for m in meses_disp}
+
+    with c2:
+        selected_dive_months = st.multiselect(
+            "Filtrar por Meses:", 
+            options=meses_disp, 
+            default=meses_disp,
+            format_func=lambda x: meses_opciones.get(x, str(x))
+        )
+    if not meses_disp:
+        st.warning("No se detectaron columnas de fecha para filtrado mensual en este periodo.")
+
+    # Sin meses seleccionados se muestra el año completo
+    dive_filters = {'AÑO_DATA': [selected_dive_year], 'MES': selected_dive_months}
+    y_totals = store.totals(dive_filters, ['Registros', 'Sesiones', 'Pacientes', 'Profesionales', 'Municipios'])
+
+    if y_totals['Registros'] > 0:
+        st.info(f"Mostrando detalles para **{selected_dive_year}** ({len(selected_dive_months)} meses seleccionados)")
+    
+        # Sub-KPIs para el periodo seleccionado
+        s1, s2, s3, s4 = st.columns(4)
+        s1.metric("💉 Sesiones", f"{y_totals['Sesiones']:,.0f}")
+        s2.metric("👥 Pacientes", f"{y_totals['Pacientes']:,.0f}")
+        s3.metric("👨‍⚕️ Profesionales", y_totals['Profesionales'])
+        s4.metric("📍 Municipios", y_totals['Municipios'])
+    
+        # Visualizaciones
+        tab_dive1, tab_dive2, tab_dive3 = st.tabs(["📈 Tendencia y EPS", "🔎 Diagnóstico y Geografía", "👥 Lista Detallada"])
+    
+        with tab_dive1:
+            d1, d2 = st.columns(2)
+            with d1:
+                # Evolución mensual (o diaria si es un solo mes)
+                if len(selected_dive_months) == 1:
+                    y_day_stats = store.aggregate(dive_filters, ['Sesiones'], by='DIA', ascending=True).rename(columns={'DIA': 'Dia'})
+                    fig_y_time = px.line(y_day_stats, x='Dia', y='Sesiones', title=f'Sesiones Diarias: {meses_opciones[selected_dive_months[0]]} {selected_dive_year}', markers=True)
+                else:
+                    y_time_stats = store.aggregate(dive_filters, ['Sesiones'], by='MES', ascending=True)
+                    y_time_stats = y_time_stats.assign(Nombre_Mes=[meses_nombres[int(m)-1] for m in y_time_stats['MES']])
+                    fig_y_time = px.line(y_time_stats, x='Nombre_Mes', y='Sesiones', title=f'Evolución Mensual en {selected_dive_year}', markers=True)
+                st.plotly_chart(fig_y_time, use_container_width=True)
+        
+            with d2:
+                y_eps_stats = store.aggregate(dive_filters, ['Sesiones'], by='EPS', order_by='Sesiones', limit=10)
+                fig_y_eps = px.bar(y_eps_stats, x='Sesiones', y='EPS', orientation='h', title='Top 10 EPS', color='Sesiones', template="plotly_white")
+                # Orden de mayor a menor
+                fig_y_eps.update_layout(yaxis={'categoryorder': 'total ascending'})
+                st.plotly_chart(fig_y_eps, use_container_width=True)
+
+        with tab_dive2:
+            g1, g2 = st.columns(2)
+            with g1:
+                y_diag_stats = store.aggregate(dive_filters, ['Pacientes'], by='DIAGNOSTICO', order_by='Pacientes', limit=10)
+                y_diag_stats = y_diag_stats.rename(columns={'DIAGNOSTICO': 'Diagnóstico'})
+                fig_y_diag = px.bar(y_diag_stats, x='Pacientes', y='Diagnóstico', orientation='h', title='Top 10 Diagnósticos (Pacientes)', color='Pacientes', color_continuous_scale='Reds')
+                st.plotly_chart(fig_y_diag, use_container_width=True)
+        
+            with g2:
+                y_mun_stats = store.aggregate(dive_filters, ['Sesiones'], by='MUNICIPIO', order_by='Sesiones', limit=10)
+                fig_y_mun = px.bar(y_mun_stats, x='Sesiones', y='MUNICIPIO', orientation='h', title='Top 10 Municipios (Sesiones)', color='Sesiones', color_continuous_scale='Purples')
+                st.plotly_chart(fig_y_mun, use_container_width=True)
+
+        with tab_dive3:
+            # Detalle de Profesionales y Pacientes
+            p_col1, p_col2 = st.columns([1, 1])
+            with p_col1:
+                st.markdown(f"#### 👨‍⚕️ Profesionales en el Periodo")
+                y_prof_stats = store.aggregate(dive_filters, ['Sesiones', 'Pacientes'], by='PROFESIONAL', order_by='Sesiones')
+                y_prof_stats = y_prof_stats.rename(columns={'PROFESIONAL': 'Profesional'})
+                st.dataframe(y_prof_stats, use_container_width=True, hide_index=True)
+        
+            with p_col2:
+                st.markdown(f"#### 👥 Resumen por EPS")
+                y_eps_detail = store.aggregate(dive_filters, ['Pacientes', 'Sesiones'], by='EPS', order_by='Pacientes')
+                st.dataframe(y_eps_detail, use_container_width=True, hide_index=True)
+    else:
+        st.warning("No se encontraron datos para la combinación de filtros seleccionada.")
+
+@st.fragment
+def _historico_descargas(store, filters, kpi_data, export_key):
+    col_btn1, col_btn2 = st.columns(2)
+
     with col_btn1:
         if st.button("📄 Descargar Reporte PDF Completo", type="primary", use_container_width=True):
             with st.spinner("Generando reporte ejecutivo profesional..."):
-                # Preparar datos para el reporte
-                kpi_data = {
-                    "Total Sesiones": int(total_sesiones),
-                    "Pacientes Únicos": total_pacientes,
-                    "Profesionales Activos": total_profesionales,
-                    "EPS Atendidas": total_eps,
-                    "Municipios Cubiertos": total_municipios,
-                    "Crecimiento Anual": f"{growth_rate:.1f}%",
-                    "Tasa de Retención": f"{retention_rate:.1f}%"
-                }
-                
-                # Renombrar columnas para compatibilidad con PDF existente
-                df_pdf = df_filtered.rename(columns={
+                # Filas filtradas desde la base; columnas renombradas para el PDF existente
+                df_pdf = store.rows(filters).rename(columns={
                     'NOMBRES': 'NOMBRE',
                     'TIPO_TERAPIA': 'TIPO DE TERAPIAS',
                 })
-                
+            
+                from src.utils.reportes_utils import create_historical_report_pdf
                 pdf_bytes = create_historical_report_pdf(df_pdf)
-                
+            
                 if pdf_bytes:
                     st.download_button(
                         "⬇️ Descargar Reporte Histórico PDF",
@@ -1276,41 +1043,35 @@ def module_historical_analysis(json_dir):
                         mime="application/pdf",
                         use_container_width=True
                     )
-    
+
     with col_btn2:
-        # Exportar datos filtrados a CSV
-        csv = df_filtered.to_csv(index=False).encode('utf-8-sig')
-        st.download_button(
-            "📊 Exportar Datos a CSV",
-            data=csv,
-            file_name=f"Datos_Historicos_{datetime.now().strftime('%Y%m%d')}.csv",
-            mime="text/csv",
-            use_container_width=True
+        # Exportar datos filtrados (se consultan solo al pedir la descarga; cacheado por filtros)
+        render_export_download(
+            lambda: drop_therapy_code(store.rows(filters)), export_key,
+            file_stem=f"Datos_Historicos_{datetime.now().strftime('%Y%m%d')}",
+            key="hist_export", label="📊 Exportar Datos", encoding='utf-8-sig'
         )
-    
-    # --- RAW DATA VIEW ---
-    with st.expander("🔎 Ver Datos Detallados (Tabla Completa)"):
-        st.dataframe(df_filtered.head(1000), use_container_width=True)
 
-def module_dashboard(df):
+@st.fragment
+def module_dashboard(data_index):
+    df = data_index.df
     st.markdown("## 📊 Dashboard Analítico")
     st.markdown("Resumen general del estado de la operación.")
     
     # Context Filters for Dashboard
     with st.expander("🔎 Filtros de Visualización", expanded=False):
         c1, c2 = st.columns(2)
-        mun_opt = ['Todos'] + sorted([x for x in df['MUNICIPIO'].unique() if pd.notna(x)], key=str) if 'MUNICIPIO' in df.columns else ['Todos']
+        mun_opt = ['Todos'] + data_index.values('MUNICIPIO')
         sel_mun = c1.selectbox("Filtrar por Municipio", mun_opt)
         
-        eps_opt = ['Todas'] + sorted([x for x in df['EPS'].unique() if pd.notna(x)], key=str) if 'EPS' in df.columns else ['Todas']
+        eps_opt = ['Todas'] + data_index.values('EPS')
         sel_eps = c2.selectbox("Filtrar por EPS", eps_opt)
         
-    # Apply local filters
-    df_view = df.copy()
-    if sel_mun != 'Todos':
-        df_view = df_view[df_view['MUNICIPIO'] == sel_mun]
-    if sel_eps != 'Todas':
-        df_view = df_view[df_view['EPS'] == sel_eps]
+    # Apply local filters (vista por índice; sin filtros es el mismo DataFrame, sin copia)
+    df_view = data_index.take({
+        'MUNICIPIO': [sel_mun] if sel_mun != 'Todos' else [],
+        'EPS': [sel_eps] if sel_eps != 'Todas' else [],
+    })
         
     # KPIs
     st.markdown("### Métricas Clave")
@@ -1343,14 +1104,9 @@ def module_dashboard(df):
     with c_chart2:
         st.subheader("Tipos de Terapia")
         if 'TIPO DE TERAPIAS' in df_view.columns:
-            # Normalizar datos para evitar duplicados
-            df_therapy_chart = df_view.copy()
-            # Normalizar datos para evitar duplicados
-            df_therapy_chart = df_view.copy()
-            # df_therapy_chart['TIPO DE TERAPIAS'] = df_therapy_chart['TIPO DE TERAPIAS'].astype(str).str.strip().str.upper()
-            df_therapy_chart['TIPO DE TERAPIAS'] = df_therapy_chart['TIPO DE TERAPIAS'].apply(clean_therapy_standard)
-            
-            therapy_data = df_therapy_chart['TIPO DE TERAPIAS'].value_counts().reset_index()
+            # Códigos normalizados para evitar duplicados (sin copiar df_view)
+            therapy_data = get_therapy_codes(df_view, 'TIPO DE TERAPIAS').value_counts()
+            therapy_data = therapy_data[therapy_data > 0].reset_index()
             therapy_data.columns = ['Tipo', 'Cantidad']
             fig_pie = px.pie(therapy_data, values='Cantidad', names='Tipo', hole=0.5, color_discrete_sequence=px.colors.qualitative.Pastel)
             st.plotly_chart(fig_pie, use_container_width=True)
@@ -1372,7 +1128,8 @@ def module_dashboard(df):
             mime="application/pdf"
         )
 
-def module_rutas(df):
+def module_rutas(data_index):
+    df = data_index.df
     st.markdown("## 🚚 Gestión de Rutas y Logística")
     st.markdown("Generación de hojas de ruta detalladas para los profesionales.")
     
@@ -1382,142 +1139,143 @@ def module_rutas(df):
 
     tab1, tab2 = st.tabs(["👤 Generación Individual", "📦 Generación Masiva (ZIP)"])
     
-    profs_available = sorted([p for p in df['PROFESIONAL'].unique() if pd.notna(p)], key=str)
+    profs_available = data_index.values('PROFESIONAL')
     
     with tab1:
-        # Selection Column
-        c_sel, c_view = st.columns([1, 3])
+        _rutas_individual(data_index, profs_available)
+
+    with tab2:
+        _rutas_masivas(df, profs_available)
+
+@st.fragment
+def _rutas_individual(data_index, profs_available):
+    from src.utils.rutas_utils import create_route_pdf
+
+    # Selection Column
+    c_sel, c_view = st.columns([1, 3])
+    
+    with c_sel:
+        st.markdown("### Seleccionar")
+        selected_prof = st.selectbox("Profesional:", profs_available)
         
-        with c_sel:
-            st.markdown("### Seleccionar")
-            selected_prof = st.selectbox("Profesional:", profs_available)
+        if selected_prof:
+            # 1. Full dataframe for this professional (including pending dates)
+            # Filas del profesional por posiciones precalculadas: sin recorrer la columna ni copiar
+            df_prof_full = data_index.df.iloc[data_index.positions('PROFESIONAL', selected_prof)]
             
-            if selected_prof:
-                # 1. Full dataframe for this professional (including pending dates)
-                df_prof_full = df[df['PROFESIONAL'] == selected_prof].copy()
-                
-                # 2. Filtered dataframe for Metrics (Active only)
-                # Filtrar solo pacientes con vigencia activa
-                df_prof = df_prof_full.copy()
-                if 'FECHA DE INGRESO' in df_prof.columns:
-                    df_prof = df_prof[
-                        (df_prof['FECHA DE INGRESO'].notna()) & 
-                        (df_prof['FECHA DE INGRESO'].astype(str).str.strip() != '') &
-                        (df_prof['FECHA DE INGRESO'].astype(str).str.lower() != 'nan')
-                    ]
+            # 2. Filtered dataframe for Metrics (Active only)
+            # Filtrar solo pacientes con vigencia activa
+            df_prof = df_prof_full
+            if 'FECHA DE INGRESO' in df_prof.columns:
+                df_prof = df_prof[
+                    (df_prof['FECHA DE INGRESO'].notna()) & 
+                    (df_prof['FECHA DE INGRESO'].astype(str).str.strip() != '') &
+                    (df_prof['FECHA DE INGRESO'].astype(str).str.lower() != 'nan')
+                ]
+            
+            # Metric 1: Total Patients (solo activos)
+            st.metric("Pacientes Activos", len(df_prof))
+            
+            # Metric 2: Total Sesiones
+            sessions = df_prof['CANTIDAD'].sum() if 'CANTIDAD' in df_prof.columns else 0
+            st.metric("Total Sesiones (Activas)", int(sessions))
+            
+            st.divider()
+            
+            if len(df_prof_full) > 0:
+                st.info("Descargue la hoja de ruta (Incluye Eventos Pendientes).")
                 
-                # Metric 1: Total Patients (solo activos)
-                st.metric("Pacientes Activos", len(df_prof))
+                # Pre-generate PDF using FULL data
+                pdf_bytes = create_route_pdf(df_prof_full, selected_prof)
                 
-                # Metric 2: Total Sesiones
-                sessions = df_prof['CANTIDAD'].sum() if 'CANTIDAD' in df_prof.columns else 0
-                st.metric("Total Sesiones (Activas)", int(sessions))
+                st.download_button(
+                    label=f"⬇️ Descargar Ruta PDF",
+                    data=pdf_bytes,
+                    file_name=f"Ruta_{selected_prof.replace(' ', '_')}.pdf",
+                    mime="application/pdf",
+                    type="primary",
+                    use_container_width=True
+                )
+            else:
+                st.warning("⚠️ Este profesional no tiene pacientes activos (con fecha de inicio).")
+
+    with c_view:
+        if selected_prof:
+            # Usar el mismo df_prof filtrado (activos del profesional)
+            df_prof_filtered = df_prof
+            
+            st.markdown(f"### 📊 Estadísticas: {selected_prof}")
+            
+            if len(df_prof_filtered) == 0:
+                st.info("No hay pacientes activos para mostrar estadísticas.")
+            else:
+                # Charts
+                row1_1, row1_2 = st.columns(2)
                 
-                st.divider()
+                with row1_1:
+                    st.markdown("**Distribución por EPS**")
+                    if 'EPS' in df_prof_filtered.columns:
+                        eps_counts = df_prof_filtered['EPS'].value_counts().reset_index()
+                        eps_counts.columns = ['EPS', 'Pacientes']
+                        fig_eps = px.pie(eps_counts, values='Pacientes', names='EPS', hole=0.4)
+                        fig_eps.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=250)
+                        st.plotly_chart(fig_eps, use_container_width=True)
+                        
+                with row1_2:
+                    st.markdown("**Tipos de Usuario**")
+                    if 'TIPO DE USUARIO' in df_prof_filtered.columns:
+                        type_counts = df_prof_filtered['TIPO DE USUARIO'].value_counts().reset_index()
+                        type_counts.columns = ['Tipo', 'Pacientes']
+                        fig_type = px.bar(type_counts, x='Tipo', y='Pacientes', color='Tipo')
+                        fig_type.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=250, showlegend=False)
+                        st.plotly_chart(fig_type, use_container_width=True)
                 
-                if len(df_prof_full) > 0:
-                    st.info("Descargue la hoja de ruta (Incluye Eventos Pendientes).")
-                    
-                    # Pre-generate PDF using FULL data
-                    pdf_bytes = create_route_pdf(df_prof_full, selected_prof)
-                    
+                st.markdown("**Detalle de Pacientes Activos**")
+                st.dataframe(
+                    df_prof_filtered[['NOMBRE', 'APELLIDOS', 'MUNICIPIO', 'EPS', 'TIPO DE USUARIO', 'CANTIDAD']], 
+                    use_container_width=True, 
+                    hide_index=True
+                )
+
+@st.fragment
+def _rutas_masivas(df, profs_available):
+    from src.utils.rutas_utils import generate_all_routes_zip
+
+    st.warning("⚠️ Esta acción generará un archivo ZIP conteniendo un PDF individual para CADA profesional activo.")
+    col_zip1, col_zip2 = st.columns([2, 1])
+    with col_zip1:
+        st.metric("Total Profesionales a Procesar", len(profs_available))
+    
+    with col_zip2:
+        st.write("") # Spacer
+        if st.button("🚀 Generar ZIP Completo"):
+            with st.spinner("Procesando rutas... por favor espere."):
+                zip_bytes = generate_all_routes_zip(df)
+                if zip_bytes:
+                    st.balloons()
+                    st.success("¡Paquete de rutas listo!")
                     st.download_button(
-                        label=f"⬇️ Descargar Ruta PDF",
-                        data=pdf_bytes,
-                        file_name=f"Ruta_{selected_prof.replace(' ', '_')}.pdf",
-                        mime="application/pdf",
-                        type="primary",
-                        use_container_width=True
+                        "📥 Descargar ZIP Rutas",
+                        data=zip_bytes,
+                        file_name=f"Rutas_Completas_{datetime.now().strftime('%Y%m%d')}.zip",
+                        mime="application/zip",
+                        type="primary"
                     )
                 else:
-                    st.warning("⚠️ Este profesional no tiene pacientes activos (con fecha de inicio).")
-
-        with c_view:
-            if selected_prof:
-                # Usar el mismo df_prof filtrado
-                df_prof_filtered = df[df['PROFESIONAL'] == selected_prof].copy()
-                
-                # Aplicar el mismo filtro de vigencia
-                if 'FECHA DE INGRESO' in df_prof_filtered.columns:
-                    df_prof_filtered = df_prof_filtered[
-                        (df_prof_filtered['FECHA DE INGRESO'].notna()) & 
-                        (df_prof_filtered['FECHA DE INGRESO'].astype(str).str.strip() != '') &
-                        (df_prof_filtered['FECHA DE INGRESO'].astype(str).str.lower() != 'nan')
-                    ]
-                
-                st.markdown(f"### 📊 Estadísticas: {selected_prof}")
-                
-                if len(df_prof_filtered) == 0:
-                    st.info("No hay pacientes activos para mostrar estadísticas.")
-                else:
-                    # Charts
-                    row1_1, row1_2 = st.columns(2)
-                    
-                    with row1_1:
-                        st.markdown("**Distribución por EPS**")
-                        if 'EPS' in df_prof_filtered.columns:
-                            eps_counts = df_prof_filtered['EPS'].value_counts().reset_index()
-                            eps_counts.columns = ['EPS', 'Pacientes']
-                            fig_eps = px.pie(eps_counts, values='Pacientes', names='EPS', hole=0.4)
-                            fig_eps.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=250)
-                            st.plotly_chart(fig_eps, use_container_width=True)
-                            
-                    with row1_2:
-                        st.markdown("**Tipos de Usuario**")
-                        if 'TIPO DE USUARIO' in df_prof_filtered.columns:
-                            type_counts = df_prof_filtered['TIPO DE USUARIO'].value_counts().reset_index()
-                            type_counts.columns = ['Tipo', 'Pacientes']
-                            fig_type = px.bar(type_counts, x='Tipo', y='Pacientes', color='Tipo')
-                            fig_type.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=250, showlegend=False)
-                            st.plotly_chart(fig_type, use_container_width=True)
-                    
-                    st.markdown("**Detalle de Pacientes Activos**")
-                    st.dataframe(
-                        df_prof_filtered[['NOMBRE', 'APELLIDOS', 'MUNICIPIO', 'EPS', 'TIPO DE USUARIO', 'CANTIDAD']], 
-                        use_container_width=True, 
-                        hide_index=True
-                    )
+                    st.error("Error al generar el ZIP.")
 
-    with tab2:
-        st.warning("⚠️ Esta acción generará un archivo ZIP conteniendo un PDF individual para CADA profesional activo.")
-        col_zip1, col_zip2 = st.columns([2, 1])
-        with col_zip1:
-            st.metric("Total Profesionales a Procesar", len(profs_available))
-        
-        with col_zip2:
-            st.write("") # Spacer
-            if st.button("🚀 Generar ZIP Completo"):
-                with st.spinner("Procesando rutas... por favor espere."):
-                    zip_bytes = generate_all_routes_zip(df)
-                    if zip_bytes:
-                        st.balloons()
-                        st.success("¡Paquete de rutas listo!")
-                        st.download_button(
-                            "📥 Descargar ZIP Rutas",
-                            data=zip_bytes,
-                            file_name=f"Rutas_Completas_{datetime.now().strftime('%Y%m%d')}.zip",
-                            mime="application/zip",
-                            type="primary"
-                        )
-                    else:
-                        st.error("Error al generar el ZIP.")
-
-def module_pending_events(df):
+def module_pending_events(data_index):
     st.markdown("## ⏳ Eventos Pendientes de Autorización")
     st.markdown("Pacientes sin fecha de inicio - En espera de autorización de EPS.")
     
-    if 'FECHA DE INGRESO' not in df.columns:
+    if 'FECHA DE INGRESO' not in data_index.df.columns:
         st.warning("No se encontró la columna 'FECHA DE INGRESO' en los datos.")
         return
     
-    # Filtrar pacientes SIN fecha de inicio (eventos pendientes)
-    df_pending = df[
-        (df['FECHA DE INGRESO'].isna()) | 
-        (df['FECHA DE INGRESO'].astype(str).str.strip() == '') |
-        (df['FECHA DE INGRESO'].astype(str).str.lower() == 'nan')
-    ].copy()
+    # Backlog de pacientes SIN fecha de inicio (precalculado por versión de los datos)
+    backlog = prepare_pending_backlog(data_index.version, data_index.df)
     
-    if len(df_pending) == 0:
+    if backlog.total == 0:
         st.success("✅ No hay eventos pendientes. Todos los pacientes tienen autorización.")
         return
     
@@ -1525,15 +1283,10 @@ def module_pending_events(df):
     st.markdown("### Resumen")
     c1, c2, c3, c4 = st.columns(4)
     
-    total_pending = len(df_pending)
-    pending_eps = df_pending['EPS'].nunique() if 'EPS' in df_pending.columns else 0
-    pending_profs = df_pending['PROFESIONAL'].nunique() if 'PROFESIONAL' in df_pending.columns else 0
-    pending_sessions = df_pending['CANTIDAD'].sum() if 'CANTIDAD' in df_pending.columns else 0
-    
-    c1.metric("Total Pendientes", total_pending)
-    c2.metric("EPS Involucradas", pending_eps)
-    c3.metric("Profesionales Afectados", pending_profs)
-    c4.metric("Sesiones en Espera", int(pending_sessions))
+    c1.metric("Total Pendientes", backlog.total)
+    c2.metric("EPS Involucradas", backlog.n_eps)
+    c3.metric("Profesionales Afectados", backlog.n_professionals)
+    c4.metric("Sesiones en Espera", int(backlog.sessions))
     
     st.markdown("---")
     
@@ -1541,60 +1294,13 @@ def module_pending_events(df):
     tab1, tab2, tab3 = st.tabs(["📋 Lista Completa", "🏥 Por EPS", "👨‍⚕️ Por Profesional"])
     
     with tab1:
-        st.markdown("#### Todos los Eventos Pendientes")
-        
-        # Filters
-        col_f1, col_f2 = st.columns(2)
-        with col_f1:
-            eps_filter = st.multiselect(
-                "Filtrar por EPS:",
-                options=sorted(df_pending['EPS'].unique()) if 'EPS' in df_pending.columns else [],
-                key="pending_eps_filter"
-            )
-        with col_f2:
-            prof_filter = st.multiselect(
-                "Filtrar por Profesional:",
-                options=sorted(df_pending['PROFESIONAL'].unique()) if 'PROFESIONAL' in df_pending.columns else [],
-                key="pending_prof_filter"
-            )
-        
-        # Apply filters
-        df_display = df_pending.copy()
-        if eps_filter:
-            df_display = df_display[df_display['EPS'].isin(eps_filter)]
-        if prof_filter:
-            df_display = df_display[df_display['PROFESIONAL'].isin(prof_filter)]
-        
-        # Display table
-        display_cols = ['NOMBRE', 'APELLIDOS', 'TIPO DE TERAPIAS', 'EPS', 'PROFESIONAL', 'TIPO DE USUARIO', 'MUNICIPIO', 'CANTIDAD']
-        available_cols = [col for col in display_cols if col in df_display.columns]
-        
-        st.dataframe(
-            df_display[available_cols],
-            use_container_width=True,
-            hide_index=True
-        )
-        
-        # Download CSV
-        csv = df_display.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            "⬇️ Descargar Lista (CSV)",
-            csv,
-            "eventos_pendientes.csv",
-            "text/csv"
-        )
+        _pendientes_lista(backlog)
     
     with tab2:
         st.markdown("#### Agrupado por EPS")
         
-        if 'EPS' in df_pending.columns:
-            eps_summary = df_pending.groupby('EPS').agg({
-                'NOMBRE': 'count',
-                'CANTIDAD': 'sum'
-            }).reset_index()
-            eps_summary.columns = ['EPS', 'Pacientes', 'Sesiones']
-            eps_summary = eps_summary.sort_values('Pacientes', ascending=False)
-            
+        eps_summary = backlog.by_eps
+        if eps_summary is not None:
             # Chart
             fig = px.bar(
                 eps_summary,
@@ -1612,14 +1318,8 @@ def module_pending_events(df):
     with tab3:
         st.markdown("#### Agrupado por Profesional")
         
-        if 'PROFESIONAL' in df_pending.columns:
-            prof_summary = df_pending.groupby('PROFESIONAL').agg({
-                'NOMBRE': 'count',
-                'CANTIDAD': 'sum'
-            }).reset_index()
-            prof_summary.columns = ['Profesional', 'Pacientes', 'Sesiones']
-            prof_summary = prof_summary.sort_values('Pacientes', ascending=False)
-            
+        prof_summary = backlog.by_professional
+        if prof_summary is not None:
             # Chart
             fig = px.bar(
                 prof_summary,
@@ -1635,7 +1335,47 @@ def module_pending_events(df):
             # Table
             st.dataframe(prof_summary, use_container_width=True, hide_index=True)
 
-def module_data_explorer(df):
+@st.fragment
+def _pendientes_lista(backlog):
+    st.markdown("#### Todos los Eventos Pendientes")
+    
+    # Filters
+    col_f1, col_f2 = st.columns(2)
+    with col_f1:
+        eps_filter = st.multiselect(
+            "Filtrar por EPS:",
+            options=backlog.index.values('EPS'),
+            key="pending_eps_filter"
+        )
+    with col_f2:
+        prof_filter = st.multiselect(
+            "Filtrar por Profesional:",
+            options=backlog.index.values('PROFESIONAL'),
+            key="pending_prof_filter"
+        )
+    
+    # Apply filters (posiciones precalculadas del backlog)
+    df_display = backlog.take(eps_filter, prof_filter)
+    
+    # Display table
+    display_cols = ['NOMBRE', 'APELLIDOS', 'TIPO DE TERAPIAS', 'EPS', 'PROFESIONAL', 'TIPO DE USUARIO', 'MUNICIPIO', 'CANTIDAD']
+    available_cols = [col for col in display_cols if col in df_display.columns]
+    
+    st.dataframe(
+        df_display[available_cols],
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    # Download (bajo demanda, cacheado por filtros)
+    export_key = filter_fingerprint(backlog.version, 'pendientes', sorted(eps_filter), sorted(prof_filter))
+    render_export_download(lambda: drop_therapy_code(df_display), export_key, "eventos_pendientes", key="pending_export", label="⬇️ Descargar Lista")
+
+@st.fragment
+def module_data_explorer(data_index):
+    from src.utils.rutas_utils import create_municipality_report_pdf, create_general_professionals_report_pdf
+
+    df = data_index.df
     st.markdown("## 🔎 Explorador de Datos y Reportes")
     st.markdown("Consulta la base de datos completa y genera reportes específicos.")
     
@@ -1644,49 +1384,86 @@ def module_data_explorer(df):
         st.markdown("#### Filtros")
         c1, c2, c3, c4 = st.columns(4)
         
-        mun_opt = ['Todos'] + sorted([x for x in df['MUNICIPIO'].unique() if pd.notna(x)], key=str) if 'MUNICIPIO' in df.columns else ['Todos']
+        mun_opt = ['Todos'] + data_index.values('MUNICIPIO')
         sel_mun = c1.selectbox("Municipio", mun_opt, key="de_mun")
         
-        eps_opt = ['Todas'] + sorted([x for x in df['EPS'].unique() if pd.notna(x)], key=str) if 'EPS' in df.columns else ['Todas']
+        eps_opt = ['Todas'] + data_index.values('EPS')
         sel_eps = c2.selectbox("EPS", eps_opt, key="de_eps")
         
-        type_opt = sorted([x for x in df['TIPO DE USUARIO'].unique() if pd.notna(x)], key=str) if 'TIPO DE USUARIO' in df.columns else []
+        type_opt = data_index.values('TIPO DE USUARIO')
         sel_type = c3.multiselect("Tipo Usuario", type_opt, key="de_type")
 
-        # Filter Logic
-        df_filtered = df.copy()
-        if sel_mun != 'Todos':
-            df_filtered = df_filtered[df_filtered['MUNICIPIO'] == sel_mun]
-        if sel_eps != 'Todas':
-            df_filtered = df_filtered[df_filtered['EPS'] == sel_eps]
-        if sel_type:
-            df_filtered = df_filtered[df_filtered['TIPO DE USUARIO'].isin(sel_type)]
+        selections = {
+            'MUNICIPIO': [sel_mun] if sel_mun != 'Todos' else [],
+            'EPS': [sel_eps] if sel_eps != 'Todas' else [],
+            'TIPO DE USUARIO': sel_type,
+        }
+
+        # Búsqueda y orden (se resuelven en el servidor)
+        c_search, c_sort, c_dir, c_size = st.columns([3, 2, 1, 1])
+        search = c_search.text_input("Buscar", key="de_search", placeholder="Nombre, documento, diagnóstico...")
+        # THERAPY_CODE es interna (gráficos y reportes): no se muestra ni se exporta
+        display_columns = [c for c in df.columns if c != THERAPY_CODE_COL]
+        sort_opt = ['(Orden original)'] + display_columns
+        sort_by = c_sort.selectbox("Ordenar por", sort_opt, key="de_sort")
+        sort_by = None if sort_by == sort_opt[0] else sort_by
+        descending = c_dir.toggle("Descendente", key="de_desc")
+        page_size = c_size.selectbox("Filas por página", [25, 50, 100, 250], index=1, key="de_page_size")
+
+        # Filter Logic: intersección de posiciones precalculadas + búsqueda + orden (memorizado)
+        positions = data_index.query(selections, search=search, sort_by=sort_by, ascending=not descending)
+        total_rows = len(positions)
             
-        c4.metric("Registros", len(df_filtered))
+        c4.metric("Registros", total_rows)
 
     st.markdown("---")
     
-    # Table
-    st.dataframe(df_filtered, use_container_width=True, height=400)
+    # Table: solo se envía al navegador la página visible
+    n_pages = max(1, -(-total_rows // page_size))
+    query_key = (repr(sorted(selections.items())), search, sort_by, descending, page_size)
+    if st.session_state.get('de_page_query') != query_key:
+        # Cambió la consulta: volver a la primera página
+        st.session_state['de_page_query'] = query_key
+        st.session_state['de_page'] = 1
+    st.session_state['de_page'] = min(st.session_state.get('de_page', 1), n_pages)
+
+    start = (st.session_state['de_page'] - 1) * page_size
+    st.dataframe(df.iloc[positions[start:start + page_size]][display_columns], use_container_width=True, height=400)
+
+    c_info, c_page = st.columns([3, 1])
+    if total_rows:
+        c_info.caption(f"Mostrando {start + 1:,}–{min(start + page_size, total_rows):,} de {total_rows:,} registros")
+    else:
+        c_info.caption("Sin registros para los filtros seleccionados.")
+    c_page.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, step=1, key="de_page")
+
+    # Resultado completo (filtros + búsqueda + orden) para las descargas
+    if total_rows == len(df) and sort_by is None:
+        df_filtered = df
+    else:
+        df_filtered = df.iloc[positions]
     
     # Downloads Section
     st.subheader("📂 Centro de Descargas")
     
     c_down1, c_down2, c_down3, c_down4 = st.columns(4)
     
+    # Huella de la consulta: las exportaciones se cachean por versión de datos + filtros
+    export_key = filter_fingerprint(data_index.version, sorted(selections.items()), search, sort_by, descending)
+
     with c_down1:
-        st.markdown("**1. Datos Filtrados (CSV)**")
-        st.caption("Descarga la tabla visible arriba en formato Excel/CSV.")
-        csv = df_filtered.to_csv(index=False).encode('utf-8')
-        st.download_button("⬇️ Descargar CSV", csv, "data_filtrada.csv", "text/csv")
+        st.markdown("**1. Datos Filtrados**")
+        st.caption("Descarga la tabla visible arriba (CSV, CSV comprimido o Excel).")
+        render_export_download(lambda: drop_therapy_code(df_filtered), export_key, "data_filtrada", key="de_export", label="⬇️ Descargar Datos")
         
     with c_down2:
         st.markdown("**2. Reporte de Facturación**")
         st.caption("Agrupado por EPS y Tipo de Servicio.")
         if 'EPS' in df_filtered.columns and 'CANTIDAD' in df_filtered.columns and 'TIPO DE TERAPIAS' in df_filtered.columns:
-            billing_df = df_filtered.groupby(['EPS', 'TIPO DE TERAPIAS'])['CANTIDAD'].sum().reset_index()
-            csv_bill = billing_df.to_csv(index=False).encode('utf-8')
-            st.download_button("⬇️ Descargar Facturación", csv_bill, "facturacion.csv", "text/csv")
+            if st.button("Preparar Facturación", key="de_bill_prep", use_container_width=True):
+                billing_df = df_filtered.groupby(['EPS', 'TIPO DE TERAPIAS'])['CANTIDAD'].sum().reset_index()
+                csv_bill = export_cached(filter_fingerprint('facturacion', export_key), 'CSV', billing_df)
+                st.download_button("⬇️ Descargar Facturación", csv_bill, "facturacion.csv", "text/csv", key="de_bill_dl")
         else:
             st.warning("Faltan columnas para facturación.")
 
@@ -1739,6 +1516,7 @@ def main():
         - 📊 **Dashboard Analítico:** Estadísticas y visión general.
         - 🚚 **Gestión de Rutas:** Generación de hojas de ruta (Individual/Masiva).
         - 🔎 **Explorador de Datos:** Consultas detalladas y reportes.
+        - 👥 **Profesionales:** Directorio, búsqueda y carga por profesional.
         """)
         return
 
@@ -1746,40 +1524,102 @@ def main():
     with st.sidebar:
         with st.spinner("Cargando datos..."):
             try:
-                df = load_data(sheet_input)
+                with profile_section("Carga de datos"):
+                    data_index = load_prepared_data(sheet_input)
             except Exception as e:
                 st.error(f"Error: {e}")
                 return
+    df = data_index.df
 
     if df.empty:
         st.error(f"No se pudieron cargar datos de: '{sheet_input}'")
         return
-        
-    # Global Normalization
-    df = normalize_data(df)
-        
-    # Preprocessing
-    if 'CANTIDAD' in df.columns:
-        df['CANTIDAD'] = pd.to_numeric(df['CANTIDAD'], errors='coerce').fillna(0)
 
     # Sidebar Navigation using Radio for clear tabs
     st.sidebar.markdown("---")
-    options = ["Dashboard Analítico", "Gestión de Rutas", "Eventos Pendientes", "Explorador de Datos", "Análisis Histórico"]
+    options = ["Dashboard Analítico", "Gestión de Rutas", "Eventos Pendientes", "Explorador de Datos", "Profesionales", "Análisis Histórico"]
     selection = st.sidebar.radio("Ir a:", options, label_visibility="collapsed")
     
     st.sidebar.info(f"📁 Archivo: {sheet_input[:20]}...")
+    render_data_age(sheet_input)
 
     # Routing
-    if selection == "Dashboard Analítico":
-        module_dashboard(df)
-    elif selection == "Gestión de Rutas":
-        module_rutas(df)
-    elif selection == "Eventos Pendientes":
-        module_pending_events(df)
-    elif selection == "Explorador de Datos":
-        module_data_explorer(df)
-    elif selection == "Análisis Histórico":
-        module_historical_analysis('data/processed/trazabilidad_LIMPIA.json')
+    with profile_section(f"Módulo: {selection}"):
+        if selection == "Dashboard Analítico":
+            module_dashboard(data_index)
+        elif selection == "Gestión de Rutas":
+            module_rutas(data_index)
+        elif selection == "Eventos Pendientes":
+            module_pending_events(data_index)
+        elif selection == "Explorador de Datos":
+            module_data_explorer(data_index)
+        elif selection == "Profesionales":
+            from src.components.profesionales_component import render_professionals_tab
+            render_professionals_tab(data_index.df, data_index.version)
+        elif selection == "Análisis Histórico":
+            module_historical_analysis(HISTORICAL_SOURCE_PATH)
+
+# --- PROFILING ---
+
+# Estado de los controles de perfilado (se leen antes de correr main)
+PROFILING_KEY = 'profiling_on'
+PROFILING_ENGINE_KEY = 'profiling_engine'
+PROFILING_DUMP_KEY = 'profiling_dump'
+
+def _request_profile_dump():
+    """Callback: perfila con cProfile/pyinstrument el rerun que dispara el botón."""
+    st.session_state[PROFILING_DUMP_KEY] = st.session_state.get(PROFILING_ENGINE_KEY, 'cProfile')
+
+def render_profiling_controls(forced):
+    with st.sidebar.expander("🛠️ Diagnóstico", expanded=False):
+        enabled = st.toggle(
+            "⏱️ Perfilado por sección",
+            value=forced,
+            key=PROFILING_KEY,
+            disabled=forced,
+            help="Muestra al final de la página el tiempo de carga, módulos, gráficos y PDFs de cada rerun."
+        )
+        if enabled or forced:
+            st.selectbox("Perfilador", available_profilers(), key=PROFILING_ENGINE_KEY)
+            st.button("Perfilar un rerun completo", key="profiling_run", on_click=_request_profile_dump,
+                      use_container_width=True)
+
+def render_profiling_panel(profiler):
+    with st.expander(f"⏱️ Perfilado del rerun: {profiler.total * 1000:,.0f} ms", expanded=True):
+        st.dataframe(profiler.breakdown(), hide_index=True, use_container_width=True)
+        st.caption(
+            "Los cargadores cacheados miden el acierto de caché o la construcción completa. "
+            "Los fragmentos que se recargan solos (filtros locales, descargas) no se perfilan."
+        )
+        report = profiler.report
+        if report:
+            st.code(report['text'], language=None)
+            if report.get('data'):
+                st.download_button(
+                    f"⬇️ Descargar {report['file_name']}",
+                    data=report['data'],
+                    file_name=report['file_name'],
+                    mime=report['mime'],
+                    key="profiling_dl"
+                )
+
+def run():
+    """
+    main() con perfilado opcional: por variable de entorno (DASHBOARD_PROFILE=1)
+    o desde el sidebar (🛠️ Diagnóstico). Los controles se dibujan al final del
+    sidebar, pero su estado se lee antes para perfilar este mismo rerun.
+    """
+    forced = profiling_forced()
+    enabled = forced or st.session_state.get(PROFILING_KEY, False)
+    engine = st.session_state.pop(PROFILING_DUMP_KEY, None)
+
+    try:
+        with profile_rerun(enabled, engine) as profiler:
+            main()
+    finally:
+        render_profiling_controls(forced)
+    if profiler is not None:
+        render_profiling_panel(profiler)
 
 if __name__ == "__main__":
-    main()
+    run()
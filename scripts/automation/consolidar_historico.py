@@ -1,75 +1,68 @@
-import pandas as pd
-import sqlite3
+"""
+Consolida el histórico limpio (data/processed/trazabilidad_LIMPIA.json) en la
+base SQLite que usa el módulo de Análisis Histórico: tabla tipada con índices
+por año, EPS, municipio, profesional, cédula y terapia (ver historico_utils.py).
+
+El dashboard reconstruye la base por sí solo cuando el JSON cambia; este script
+permite hacerlo de antemano (p. ej. tras limpiar_datos_maestro.py) y exportar
+además un CSV para Excel.
+
+Uso (desde la raíz del proyecto):
+    python scripts/automation/consolidar_historico.py
+    python scripts/automation/consolidar_historico.py --origen data/processed/trazabilidad_LIMPIA.json --sin-csv
+"""
+import argparse
 import os
-from trazabilidad_utils import scan_trazabilidades
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.historico_utils import HISTORICAL_DB_PATH, write_historical_db
+from src.utils.trazabilidad_utils import get_path_version, read_historical_data_json
+
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--origen', default=os.path.join('data', 'processed', 'trazabilidad_LIMPIA.json'),
+                        help="JSON limpio o carpeta de JSON del histórico")
+    parser.add_argument('--db', default=HISTORICAL_DB_PATH)
+    parser.add_argument('--csv', default=os.path.join('data', 'processed', 'trazabilidad_historica_consolidada.csv'))
+    parser.add_argument('--sin-csv', action='store_true', help="No exportar el CSV")
+    args = parser.parse_args()
+
     print("Iniciando consolidación de trazabilidades...")
-    base_path = os.path.join("DATA", "TRAZABILIDADES")
-    
-    # 1. Obtener datos consolidados usando la lógica existente
-    # Nota: scan_trazabilidades ya maneja la recursividad y normalización de columnas
-    try:
-        df = scan_trazabilidades(base_path)
-    except Exception as e:
-        print(f"Error al escanear los archivos: {e}")
-        return
+    inicio = time.perf_counter()
 
+    # 1. Cargar el histórico limpio (misma lectura que el dashboard)
+    df = read_historical_data_json(args.origen)
     if df.empty:
-        print("No se encontraron registros para consolidar.")
+        print(f"No se encontraron registros para consolidar en {args.origen}.")
         return
 
-    print(f"Se han procesado {len(df)} registros.")
+    print(f"Se han procesado {len(df):,} registros.")
 
-    # 2. Exportar a CSV (Para Excel)
-    csv_path = os.path.join("DATA", "trazabilidad_historica_consolidada.csv")
-    print(f"Guardando CSV en: {csv_path}")
-    try:
-        # Usamos utf-8-sig para que Excel abra correctamente los caracteres latinos
-        df.to_csv(csv_path, index=False, encoding='utf-8-sig', sep=';')
-        print("CSV guardado exitosamente.")
-    except Exception as e:
-        print(f"Error guardando CSV: {e}")
+    # 2. Exportar a SQLite (Para el Sistema/Dashboard)
+    print(f"Guardando Base de Datos en: {args.db}")
+    write_historical_db(df, args.db, source=args.origen, source_version=get_path_version(args.origen))
+    print("Base de datos creada exitosamente.")
 
-    # 3. Exportar a SQLite (Para el Sistema/Dashboard)
-    db_path = os.path.join("DATA", "trazabilidad.db")
-    print(f"Guardando Base de Datos en: {db_path}")
-    try:
-        conn = sqlite3.connect(db_path)
-        # Convertir fechas a string para SQLite (manejo robusto)
-        df_sql = df.copy()
-        
-        # 1. Convertir explícitamente columnas conocidas de fecha
-        date_cols = ['FECHA_INICIO', 'FECHA_EGRESO']
-        for col in date_cols:
-            if col in df_sql.columns:
-                df_sql[col] = df_sql[col].astype(str)
-
-        # 2. Convertir cualquier otra columna datetime detectada
-        for col in df_sql.columns:
-            if pd.api.types.is_datetime64_any_dtype(df_sql[col]):
-               df_sql[col] = df_sql[col].astype(str)
-            # También verificar objetos que podrían ser timestamps
-            elif df_sql[col].dtype == 'object':
-               try:
-                   # Intentar convertir una muestra
-                   if not df_sql[col].empty and isinstance(df_sql[col].iloc[0], (pd.Timestamp, datetime.datetime)):
-                       df_sql[col] = df_sql[col].astype(str)
-               except:
-                   pass
-            
-        # Reemplazamos la tabla si existe
-        df_sql.to_sql('trazabilidad', conn, if_exists='replace', index=False)
-        conn.close()
-        print("Base de datos creada exitosamente.")
-    except Exception as e:
-        print(f"Error guardando DB: {e}")
+    # 3. Exportar a CSV (Para Excel)
+    if not args.sin_csv:
+        print(f"Guardando CSV en: {args.csv}")
+        try:
+            # Usamos utf-8-sig para que Excel abra correctamente los caracteres latinos
+            df.to_csv(args.csv, index=False, encoding='utf-8-sig', sep=';')
+            print("CSV guardado exitosamente.")
+        except Exception as e:
+            print(f"Error guardando CSV: {e}")
 
     print("\nProceso finalizado.")
     print("-" * 30)
-    print(f"Total Registros: {len(df)}")
-    print(f"Ubicación CSV: {os.path.abspath(csv_path)}")
-    print(f"Ubicación DB: {os.path.abspath(db_path)}")
+    print(f"Total Registros: {len(df):,}")
+    print(f"Ubicación DB: {os.path.abspath(args.db)}")
+    print(f"Tiempo: {time.perf_counter() - inicio:.1f} s")
+
 
 if __name__ == "__main__":
     main()
@@ -2,12 +2,22 @@
 Script de consolidación de datos de profesionales
 Combina información de Google Sheets y contacts.csv
 """
+import os
+import sys
 import json
 import csv
 import re
-from google_sheets_client import GoogleSheetsClient
 from difflib import SequenceMatcher
 
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, RAIZ)
+
+from src.core.google_sheets_client import get_shared_client
+from src.utils.normalizacion_utils import ALIAS_PATH, get_alias_resolver
+
+# Tabla de alias del proyecto, sin depender de la carpeta desde la que se ejecuta
+ALIAS_FILE = os.path.join(RAIZ, ALIAS_PATH)
+
 def limpiar_telefono(telefono):
     """Limpia y normaliza números de teléfono"""
     if not telefono:
@@ -34,10 +44,20 @@ def normalizar_nombre(nombre):
         nombre = nombre.replace(old, new)
     return nombre
 
+def nombre_canonico(nombre):
+    """Resuelve el nombre con la tabla de alias de profesionales (data/reference/alias_profesionales.json)"""
+    if not nombre:
+        return ""
+    return get_alias_resolver(ALIAS_FILE).resolve(str(nombre).strip().upper())
+
 def similitud_nombres(nombre1, nombre2):
-    """Calcula similitud entre dos nombres (0-1)"""
-    n1 = normalizar_nombre(nombre1)
-    n2 = normalizar_nombre(nombre2)
+    """Calcula similitud entre dos nombres (0-1); dos alias del mismo profesional valen 1"""
+    c1 = nombre_canonico(nombre1)
+    c2 = nombre_canonico(nombre2)
+    if c1 and c1 == c2:
+        return 1.0
+    n1 = normalizar_nombre(c1)
+    n2 = normalizar_nombre(c2)
     return SequenceMatcher(None, n1, n2).ratio()
 
 def cargar_contacts_csv(filepath):
@@ -79,7 +99,7 @@ def consolidar_datos():
     
     # 1. Cargar datos de Google Sheets
     print("\n[1/4] Conectando a Google Sheets...")
-    client = GoogleSheetsClient('credentials.json')
+    client = get_shared_client('credentials.json')
     data_raw = client.get_sheet_data(SPREADSHEET_URL)
     
     if not data_raw or len(data_raw) < 3:
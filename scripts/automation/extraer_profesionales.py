@@ -2,7 +2,7 @@
 Script mejorado para extraer, limpiar y ordenar información de profesionales desde Google Sheets
 """
 import json
-from google_sheets_client import GoogleSheetsClient
+from google_sheets_client import get_shared_client
 
 def extraer_y_ordenar_profesionales():
     """
@@ -13,7 +13,7 @@ def extraer_y_ordenar_profesionales():
     
     # Inicializar cliente
     print("Conectando a Google Sheets...")
-    client = GoogleSheetsClient('credentials.json')
+    client = get_shared_client('credentials.json')
     
     # Obtener datos de la primera hoja
     print("Extrayendo datos...")
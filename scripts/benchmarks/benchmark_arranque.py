@@ -0,0 +1,88 @@
+"""
+Benchmark de arranque del dashboard: tiempo de importación de dashboard.py
+medido con `python -X importtime` en un proceso limpio.
+
+Reporta el tiempo acumulado de importación y los módulos más pesados, y
+falla (código de salida 1) si se supera el umbral indicado.
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmarks/benchmark_arranque.py --repeat 5 --top 15
+    python scripts/benchmarks/benchmark_arranque.py --max-ms 2500
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Módulos que no deben cargarse al arrancar (solo al generar un PDF o abrir su módulo)
+MODULOS_DIFERIDOS = ['matplotlib', 'seaborn', 'fpdf', 'PIL', 'src.utils.reportes_utils', 'src.utils.rutas_utils']
+
+LINEA_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def medir_importacion(modulo):
+    """
+    Importa `modulo` en un proceso nuevo.
+
+    Returns:
+        tuple: (acumulado_us del módulo, {nombre: acumulado_us} de sus importaciones
+        directas, conjunto de todos los módulos cargados).
+    """
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{resultado.stderr[-2000:]}")
+
+    # importtime imprime cada módulo al terminar de cargarlo: los hijos (nivel 1)
+    # aparecen antes que su padre (nivel 0)
+    hijos, cargados = {}, set()
+    for linea in resultado.stderr.splitlines():
+        m = LINEA_IMPORTTIME.match(linea)
+        if not m:
+            continue
+        _, acumulado, sangria, nombre = m.groups()
+        cargados.add(nombre)
+        nivel = len(sangria) // 2
+        if nivel == 1:
+            hijos[nombre] = int(acumulado)
+        elif nivel == 0:
+            if nombre == modulo:
+                return int(acumulado), hijos, cargados
+            hijos = {}
+    raise RuntimeError(f"No se encontró '{modulo}' en la salida de -X importtime")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modulo', default='dashboard')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="Importaciones directas más pesadas a mostrar")
+    parser.add_argument('--max-ms', type=float, default=None, help="Umbral de tiempo total (ms)")
+    args = parser.parse_args()
+
+    # La primera corrida calienta la caché de bytecode y del sistema de archivos
+    medir_importacion(args.modulo)
+    corridas = [medir_importacion(args.modulo) for _ in range(args.repeat)]
+    total_us, hijos, cargados = min(corridas, key=lambda c: c[0])
+    total_ms = total_us / 1000
+
+    print(f"Importación de '{args.modulo}' (mejor de {args.repeat}): {total_ms:.0f} ms")
+    print("\nImportaciones directas más pesadas:")
+    for nombre, acumulado in sorted(hijos.items(), key=lambda x: -x[1])[:args.top]:
+        print(f"  {acumulado / 1000:8.1f} ms  {nombre}")
+
+    diferidos = [m for m in MODULOS_DIFERIDOS if m in cargados]
+    print(f"\nMódulos diferidos cargados al arrancar: {', '.join(diferidos) if diferidos else 'ninguno'}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"FALLA: {total_ms:.0f} ms supera el umbral de {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
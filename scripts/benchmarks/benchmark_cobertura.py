@@ -0,0 +1,49 @@
+"""
+Benchmark de escalamiento del informe de cobertura por municipio
+(create_municipality_report_pdf) sobre datos sintéticos de tamaño creciente.
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmarks/benchmark_cobertura.py
+    python scripts/benchmarks/benchmark_cobertura.py --sizes 10000,50000,100000 --profesionales 300
+    python scripts/benchmarks/benchmark_cobertura.py --max-s 1.0
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datos_sinteticos import generar_trazabilidad
+from src.utils.rutas_utils import create_municipality_report_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10000,25000,50000,100000', help="Tamaños (filas) separados por coma")
+    parser.add_argument('--profesionales', type=int, default=80)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-s', type=float, default=None, help="Umbral de tiempo (s) para el tamaño mayor")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    print(f"{'Filas':>10} {'Tiempo (s)':>11} {'Filas/s':>12} {'PDF (KB)':>9}")
+    tiempo = 0.0
+    for n in sizes:
+        df = generar_trazabilidad(n, n_profesionales=args.profesionales)
+        tiempos = []
+        for _ in range(args.repeat):
+            inicio = time.perf_counter()
+            pdf_bytes = create_municipality_report_pdf(df)
+            tiempos.append(time.perf_counter() - inicio)
+        tiempo = min(tiempos)
+        print(f"{n:>10,} {tiempo:>11.3f} {n / tiempo:>12,.0f} {len(pdf_bytes) / 1024:>9.0f}")
+
+    if args.max_s is not None and tiempo > args.max_s:
+        print(f"FALLA: {tiempo:.2f} s supera el umbral de {args.max_s:.2f} s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
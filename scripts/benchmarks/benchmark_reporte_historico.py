@@ -0,0 +1,61 @@
+"""
+Benchmark de create_historical_report_pdf: tiempo de generación y memoria pico.
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmarks/benchmark_reporte_historico.py --rows 100000 --repeat 3
+    python scripts/benchmarks/benchmark_reporte_historico.py --rows 100000 --serial
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import matplotlib
+matplotlib.use('Agg')
+
+from datos_sinteticos import generar_trazabilidad
+from src.utils.reportes_utils import create_historical_report_pdf
+
+
+def medir(df, repeat, parallel=True):
+    # Corrida de calentamiento: arranca el pool de procesos (costo único por servidor)
+    create_historical_report_pdf(df, parallel_charts=parallel)
+
+    # El tiempo se mide sin tracemalloc (lo ralentiza); la memoria en una corrida aparte
+    tiempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        pdf_bytes = create_historical_report_pdf(df, parallel_charts=parallel)
+        tiempos.append(time.perf_counter() - inicio)
+
+    # En modo paralelo solo mide el proceso principal (los gráficos se generan en los workers)
+    tracemalloc.start()
+    create_historical_report_pdf(df, parallel_charts=parallel)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(tiempos), pico, len(pdf_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--serial', action='store_true', help="Renderiza los gráficos en el proceso principal")
+    args = parser.parse_args()
+
+    df = generar_trazabilidad(args.rows)
+    tiempo, pico, tamano = medir(df, args.repeat, parallel=not args.serial)
+
+    print(f"Filas: {args.rows:,}")
+    print(f"Gráficos: {'secuencial' if args.serial else 'paralelo (pool de procesos)'}")
+    print(f"Tiempo (mejor de {args.repeat}): {tiempo:.2f} s")
+    print(f"Memoria pico (tracemalloc): {pico / 1024 / 1024:.1f} MB")
+    print(f"Tamaño del PDF: {tamano / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
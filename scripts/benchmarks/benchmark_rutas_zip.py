@@ -0,0 +1,52 @@
+"""
+Benchmark de generación de hojas de ruta: ZIP masivo (un PDF por profesional)
+y hoja individual del profesional con más pacientes.
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmarks/benchmark_rutas_zip.py --rows 20000 --repeat 3
+    python scripts/benchmarks/benchmark_rutas_zip.py --rows 20000 --profesionales 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datos_sinteticos import generar_trazabilidad
+from src.utils.rutas_utils import create_route_pdf, generate_all_routes_zip
+
+
+def mejor_tiempo(fn, repeat):
+    tiempos, resultado = [], None
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--profesionales', type=int, default=80)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = generar_trazabilidad(args.rows, n_profesionales=args.profesionales)
+
+    t_zip, zip_bytes = mejor_tiempo(lambda: generate_all_routes_zip(df), args.repeat)
+
+    prof = df['PROFESIONAL'].value_counts().index[0]
+    df_prof = df[df['PROFESIONAL'] == prof]
+    t_one, pdf_bytes = mejor_tiempo(lambda: create_route_pdf(df_prof, prof), args.repeat)
+
+    print(f"Filas: {args.rows:,} | Profesionales: {df['PROFESIONAL'].nunique()}")
+    print(f"ZIP masivo (mejor de {args.repeat}): {t_zip:.2f} s ({len(zip_bytes) / 1024:.0f} KB, "
+          f"{args.rows / t_zip:,.0f} tarjetas/s)")
+    print(f"Hoja individual ({len(df_prof):,} pacientes): {t_one * 1000:.0f} ms ({len(pdf_bytes) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Generador de datos sintéticos con el esquema de trazabilidad
+(mismas columnas que usa el dashboard), para benchmarks sin datos reales de pacientes.
+"""
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+EPS = ['NUEVA EPS', 'SALUD TOTAL', 'COOSALUD', 'MUTUAL SER', 'SANITAS', 'FAMISANAR', 'SURA', 'COMFACOR']
+MUNICIPIOS = ['MONTERIA', 'CERETE', 'LORICA', 'SAHAGUN', 'TIERRALTA', 'PLANETA RICA',
+              'CIENAGA DE ORO', 'SAN PELAYO', 'MONTELIBANO', 'CHINU', 'AYAPEL', 'MOÑITOS']
+TERAPIAS = ['TF', 'TL', 'TO', 'PS', 'FISIOTERAPIA', 'FONOAUDIOLOGIA', '01. TL', '2-TF',
+            'TERAPIA OCUPACIONAL', 'PSICOLOGIA', 'EDUCACION ESPECIAL', '1']
+TIPOS_USUARIO = ['EVENTO', 'CRONICO', 'PALIATIVO']
+
+
+def generar_trazabilidad(n_rows, n_profesionales=80, n_pacientes=None, seed=42):
+    """
+    Genera un DataFrame con columnas del Sheet de ingresos y del histórico
+    (AÑO_DATA, CEDULA, CANTIDAD, PROFESIONAL, MUNICIPIO, EPS, TIPO DE TERAPIAS, ...).
+    """
+    rng = np.random.default_rng(seed)
+    n_pacientes = n_pacientes or max(1, n_rows // 3)
+    profesionales = np.array([f"PROFESIONAL {i:03d}" for i in range(n_profesionales)])
+    fechas = pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 365 * 8, n_rows), unit='D')
+    fecha_ingreso = pd.Series(fechas.strftime('%d/%m/%Y'))
+    # ~5% sin fecha de ingreso (eventos pendientes de autorización)
+    fecha_ingreso[rng.random(n_rows) < 0.05] = ''
+
+    return pd.DataFrame({
+        'NOMBRE': rng.choice(['ANA', 'LUIS', 'MARIA', 'JOSE', 'CARMEN', 'PEDRO'], n_rows),
+        'APELLIDOS': rng.choice(['PEREZ', 'GOMEZ', 'DIAZ', 'LOPEZ', 'MARTINEZ'], n_rows),
+        'TIPO DE DOCUMENTO': rng.choice(['CC', 'TI', 'RC'], n_rows),
+        'NUMERO': rng.integers(1_000_000, 1_000_000 + n_pacientes, n_rows).astype(str),
+        'CEDULA': rng.integers(1_000_000, 1_000_000 + n_pacientes, n_rows).astype(str),
+        'EPS': rng.choice(EPS, n_rows),
+        'MUNICIPIO': rng.choice(MUNICIPIOS, n_rows),
+        'DIRECCION': [f"CALLE {i % 120} # {i % 45}-{i % 90}" for i in range(n_rows)],
+        'TELEFONO': rng.integers(3_000_000_000, 3_999_999_999, n_rows).astype(str),
+        'TIPO DE TERAPIAS': rng.choice(TERAPIAS, n_rows),
+        'CANTIDAD': rng.integers(1, 30, n_rows),
+        'PROFESIONAL': rng.choice(profesionales, n_rows),
+        'TIPO DE USUARIO': rng.choice(TIPOS_USUARIO, n_rows),
+        'DIAGNOSTICO': rng.choice(['F840', 'G809', 'R620', 'F801', 'Q909'], n_rows),
+        'FECHA DE INGRESO': fecha_ingreso,
+        'FECHA DE EGRESO': '',
+        'FECHA_INICIO': fechas,
+        'AÑO_DATA': fechas.year,
+    })
+
+
+# Variantes "sucias" como llegan en los Excel originales (para los normalizadores de limpieza)
+EPS_SUCIAS = {
+    'NUEVA EPS': ['NUEVA EPS', 'Nueva Eps', 'NUEVA E.P.S', 'NUEVAEPS'],
+    'SALUD TOTAL': ['SALUD TOTAL', 'Salud Total EPS', 'SALUDTOTAL'],
+    'COOSALUD': ['COOSALUD', 'Coosalud EPS-S', 'COOSALUD EPS'],
+    'MUTUAL SER': ['MUTUAL SER', 'Mutual Ser', 'MUTUALSER'],
+    'SANITAS': ['SANITAS', 'Sanitas EPS'],
+    'FAMISANAR': ['FAMISANAR', 'Famisanar'],
+    'SURA': ['SURA', 'EPS SURA', 'Sura'],
+    'COMFACOR': ['COMFACOR', 'Comfacor'],
+}
+MUNICIPIOS_SUCIOS = {
+    'MONTERIA': ['MONTERIA', 'Montería', 'MOTERIA', 'monteria '],
+    'CERETE': ['CERETE', 'Cereté'],
+    'LORICA': ['LORICA', 'Santa Cruz de Lorica'],
+    'SAHAGUN': ['SAHAGUN', 'Sahagún'],
+    'TIERRALTA': ['TIERRALTA', 'TIERRALA'],
+    'PLANETA RICA': ['PLANETA RICA', 'Planeta Rica'],
+    'CIENAGA DE ORO': ['CIENAGA DE ORO', 'CIENEGA DE ORO', 'Ciénaga de Oro'],
+    'SAN PELAYO': ['SAN PELAYO'],
+    'MONTELIBANO': ['MONTELIBANO', 'Montelíbano'],
+    'CHINU': ['CHINU', 'Chinú'],
+    'AYAPEL': ['AYAPEL'],
+    'MOÑITOS': ['MOÑITOS', 'MONITOS', 'MOÑITO'],
+}
+
+
+def ensuciar(valores, variantes, rng):
+    """Reemplaza cada valor canónico por una de sus variantes al azar."""
+    valores = np.asarray(valores, dtype=object)
+    salida = valores.copy()
+    for canonico, opciones in variantes.items():
+        mask = valores == canonico
+        salida[mask] = rng.choice(opciones, int(mask.sum()))
+    return salida
+
+
+def generar_registros_historicos(n_rows, n_profesionales=80, seed=42):
+    """
+    Registros con el esquema de los JSON intermedios (salida de convert_excel_to_json,
+    entrada de load_historical_data_json y de los scripts de limpieza), con
+    valores sucios en EPS, municipio y sesiones.
+    """
+    rng = np.random.default_rng(seed + 1)
+    df = generar_trazabilidad(n_rows, n_profesionales=n_profesionales, seed=seed)
+    sesiones = df['CANTIDAD'].astype(str).to_numpy(dtype=object)
+    con_texto = rng.random(n_rows) < 0.1
+    sesiones[con_texto] = [f"{s} SESIONES" for s in sesiones[con_texto]]
+
+    registros = pd.DataFrame({
+        'nombres': df['NOMBRE'],
+        'apellidos': df['APELLIDOS'],
+        'tipo_id': df['TIPO DE DOCUMENTO'],
+        'numero_id': df['CEDULA'],
+        'eps': ensuciar(df['EPS'], EPS_SUCIAS, rng),
+        'diagnostico': df['DIAGNOSTICO'],
+        'municipio': ensuciar(df['MUNICIPIO'], MUNICIPIOS_SUCIOS, rng),
+        'direccion': df['DIRECCION'],
+        'telefono': df['TELEFONO'],
+        'fecha_ingreso': df['FECHA_INICIO'].dt.strftime('%Y-%m-%dT00:00:00'),
+        'fecha_egreso': None,
+        'profesional': df['PROFESIONAL'],
+        'observaciones': None,
+        'sesiones': sesiones,
+        'tipo_terapia': df['TIPO DE TERAPIAS'],
+        'year': df['AÑO_DATA'],
+    })
+    return registros
+
+
+def escribir_json_historico(directorio, n_rows, n_archivos=12, seed=42):
+    """
+    Escribe `n_archivos` JSON con el formato de convert_excel_to_json
+    ({source_file, year_folder, summary, data}) repartiendo `n_rows` registros.
+    Devuelve la lista de rutas escritas.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    registros = generar_registros_historicos(n_rows, seed=seed)
+    rutas = []
+    for i, parte in enumerate(np.array_split(np.arange(n_rows), n_archivos)):
+        bloque = registros.iloc[parte]
+        year = int(bloque['year'].iloc[0]) if len(bloque) else 2024
+        datos = bloque.drop(columns='year').astype(object).where(bloque.drop(columns='year').notna(), None)
+        ruta = os.path.join(directorio, f"TRAZABILIDAD_{i + 1:02d}_{year}.json")
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source_file': f"TRAZABILIDAD_{i + 1:02d}.xlsx",
+                'year_folder': str(year),
+                'summary': {'total_records': len(bloque)},
+                'data': datos.to_dict(orient='records'),
+            }, f, ensure_ascii=False)
+        rutas.append(ruta)
+    return rutas
+
+
+MESES = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 'JULIO', 'AGOSTO',
+         'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
+HOJAS = ['MONTERIA', 'MPIOS', 'NEP MTR', 'PERMANENTES', 'EPIDEMIOLOGIA', 'NEP MPIOS']
+
+# Variantes de encabezado por columna, como aparecen en los libros de distintos años
+# (todas reconocidas por COLUMN_MAPPING de convert_excel_to_json)
+ENCABEZADOS = {
+    'apellidos': ['APELLIDOS', 'APELLIDO'],
+    'nombres': ['NOMBRES', 'NOMBRE'],
+    'tipo_id': ['TIPO DE DOCUMENTO', 'TIPO ID', 'TIPO DE ID'],
+    'numero_id': ['NUMERO', 'NUMERO ID', 'NUMERO DE ID'],
+    'eps': ['EPS'],
+    'diagnostico': ['DIAGNOSTICO'],
+    'municipio': ['MUNICIPIO', 'MUNICIPO DE ATENCION'],
+    'direccion': ['DIRECCION', 'DIRECCION DE ATENCION'],
+    'telefono': ['TELEFONO'],
+    'fecha_ingreso': ['FECHA DE INGRESO', 'FECHA DE ENTREGA', 'FECHA DE INICIO'],
+    'fecha_egreso': ['FECHA DE EGRESO', 'FECHA EGRESO'],
+    'profesional': ['TERAPEUTA ENCARGADO', 'PROFESIONAL', 'TERAPEUTA ENTREGADO'],
+    'observaciones': ['OBSERVACIONES', 'OBSERVACION', 'OBSERVACIONES AL PROCESO'],
+    'sesiones': ['SESIONES', 'CANTIDAD', '# TERAPIAS', 'SESIONES DE TERAPIAS'],
+    'tipo_terapia': ['TIPO DE TERAPIAS', 'TIPO DE TERAPIA'],
+}
+# Columnas de datos del paciente: en las filas de continuación vienen vacías (celdas combinadas)
+COLUMNAS_PACIENTE = ['apellidos', 'nombres', 'tipo_id', 'numero_id', 'eps', 'diagnostico',
+                     'municipio', 'direccion', 'telefono']
+
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+
+def _variante_encabezado(nombre, rng):
+    """Encabezado con mayúsculas/espacios irregulares (el conversor los normaliza)."""
+    r = rng.random()
+    if r < 0.15:
+        return nombre.title()
+    if r < 0.25:
+        return f" {nombre} "
+    return nombre
+
+
+def _fechas_excel(fechas, rng):
+    """Mezcla de formatos de fecha: serial de Excel, fecha real y texto dd/mm/aaaa (~5% vacías)."""
+    fechas = pd.to_datetime(pd.Series(fechas), errors='coerce')
+    salida = np.empty(len(fechas), dtype=object)
+    formato = rng.random(len(fechas))
+    serial = formato < 0.4
+    texto = formato >= 0.8
+    salida[serial] = (fechas[serial] - EXCEL_EPOCH).dt.days.to_numpy()
+    salida[~serial & ~texto] = list(fechas[~serial & ~texto].dt.to_pydatetime())
+    salida[texto] = fechas[texto].dt.strftime('%d/%m/%Y').to_numpy()
+    salida[rng.random(len(fechas)) < 0.05] = None
+    return salida
+
+
+def _hoja_trazabilidad(registros, nombre_hoja, titulo, rng):
+    """
+    Filas (sin encabezado de pandas) de una hoja como las de los libros originales:
+    filas de título antes del encabezado, encabezados con variantes, bloques de
+    paciente con celdas combinadas vacías, y fila TOTAL al final.
+    """
+    n = len(registros)
+    columnas = list(ENCABEZADOS)
+    encabezado = [_variante_encabezado(rng.choice(ENCABEZADOS[c]), rng) for c in columnas]
+    datos = registros[columnas].astype(object).to_numpy()
+    datos[:, columnas.index('fecha_ingreso')] = _fechas_excel(registros['fecha_ingreso'], rng)
+
+    # ~35% de filas continúan el paciente anterior (otra terapia): datos del paciente vacíos
+    continua = rng.random(n) < 0.35
+    continua[:1] = False
+    for col in COLUMNAS_PACIENTE:
+        datos[continua, columnas.index(col)] = None
+    # En parte de esas filas también se combinó el terapeuta
+    datos[continua & (rng.random(n) < 0.3), columnas.index('profesional')] = None
+
+    numerada = rng.random() < 0.5
+    if numerada:
+        encabezado = ['#'] + encabezado
+        consecutivo = np.where(continua, None, np.cumsum(~continua)).astype(object)
+        datos = np.column_stack([consecutivo, datos])
+
+    ancho = len(encabezado)
+    titulos = [[titulo] + [None] * (ancho - 1), [nombre_hoja] + [None] * (ancho - 1), [None] * ancho]
+    offset = titulos[:int(rng.integers(0, 4))]
+
+    sesiones = pd.to_numeric(registros['sesiones'].astype(str).str.extract(r'(\d+)')[0], errors='coerce').sum()
+    total = [None] * ancho
+    total[columnas.index('nombres') + numerada] = 'TOTAL'
+    total[columnas.index('sesiones') + numerada] = int(sesiones)
+
+    filas = offset + [encabezado] + datos.tolist() + [[None] * ancho, total]
+    return pd.DataFrame(filas)
+
+
+def escribir_excel_trazabilidad(ruta, n_rows, seed=42, n_hojas=4, titulo='INGRESOS TERAPIAS', hoja_horario=True,
+                                anio=None, mes=None):
+    """
+    Escribe un libro de trazabilidad mensual con la forma de los originales de
+    data/raw/TRAZABILIDADES: `n_rows` filas de terapia repartidas en `n_hojas` hojas,
+    cada una con filas de título antes del encabezado, variantes de nombres de
+    columna, celdas de paciente vacías (combinadas, para ffill), EPS/municipios
+    con grafías sucias, fechas como serial de Excel/fecha/texto y fila TOTAL.
+    Con `hoja_horario` agrega una hoja sin tabla de pacientes (como 'HORARIO').
+    Con `anio` y `mes` las fechas de ingreso caen dentro de ese mes, como en el
+    libro real del periodo; sin ellos cubren 2018-2025.
+    """
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    rng = np.random.default_rng(seed + 2)
+    registros = generar_registros_historicos(n_rows, seed=seed)
+    if anio is not None and mes is not None:
+        inicio = pd.Timestamp(year=anio, month=mes, day=1)
+        fechas = inicio + pd.to_timedelta(rng.integers(0, inicio.days_in_month, n_rows), unit='D')
+        registros['fecha_ingreso'] = fechas.strftime('%Y-%m-%dT00:00:00')
+        registros['year'] = anio
+    hojas = HOJAS[:max(1, min(n_hojas, len(HOJAS)))]
+
+    with pd.ExcelWriter(ruta, engine='openpyxl') as writer:
+        for nombre_hoja, parte in zip(hojas, np.array_split(np.arange(n_rows), len(hojas))):
+            hoja = _hoja_trazabilidad(registros.iloc[parte], nombre_hoja, titulo, rng)
+            hoja.to_excel(writer, sheet_name=nombre_hoja, header=False, index=False)
+        if hoja_horario:
+            pd.DataFrame([['HORARIO DE ATENCION', None], ['LUNES A VIERNES', '7:00 - 17:00'],
+                          ['SABADOS', '7:00 - 12:00']]).to_excel(writer, sheet_name='HORARIO', header=False, index=False)
+    return ruta
@@ -0,0 +1,58 @@
+"""
+Genera un árbol de libros de trazabilidad sintéticos con la estructura de
+data/raw/TRAZABILIDADES (<año>/<NN> INGRESOS TERAPIAS <MES> <AÑO>.xlsx), para
+probar el ETL a 10-100x el volumen real sin usar datos de pacientes.
+
+Cada libro tiene varias hojas con filas de título antes del encabezado,
+variantes de nombres de columna, celdas combinadas vacías, grafías sucias de
+EPS/municipio, fechas como serial de Excel y fila TOTAL (ver
+escribir_excel_trazabilidad en datos_sinteticos.py). Las fechas de ingreso de
+cada libro caen dentro del mes y año de su nombre.
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmarks/generar_trazabilidades.py --salida /tmp/etl/data/raw/TRAZABILIDADES
+    python scripts/benchmarks/generar_trazabilidades.py --anios 2023,2024 --meses 12 --filas-por-mes 50000
+
+convert_excel_to_json.py lee rutas relativas (data/raw/TRAZABILIDADES), así que
+para procesar el árbol generado se ejecuta desde el directorio que lo contiene:
+    cd /tmp/etl && python /ruta/al/proyecto/scripts/automation/convert_excel_to_json.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datos_sinteticos import MESES, escribir_excel_trazabilidad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--salida', default=os.path.join('data', 'raw', 'TRAZABILIDADES_SINTETICAS'))
+    parser.add_argument('--anios', default='2024', help="Años separados por coma")
+    parser.add_argument('--meses', type=int, default=12, help="Meses por año (desde enero)")
+    parser.add_argument('--filas-por-mes', type=int, default=5000)
+    parser.add_argument('--hojas', type=int, default=4, help="Hojas de pacientes por libro")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    anios = [int(a) for a in args.anios.split(',')]
+    inicio = time.perf_counter()
+    total_filas = 0
+    for anio in anios:
+        for mes in range(1, min(args.meses, 12) + 1):
+            nombre = f"{mes:02d} INGRESOS TERAPIAS {MESES[mes - 1]} {anio}.xlsx"
+            ruta = os.path.join(args.salida, str(anio), nombre)
+            escribir_excel_trazabilidad(ruta, args.filas_por_mes, seed=args.seed + anio * 100 + mes,
+                                        n_hojas=args.hojas, titulo=f"INGRESOS TERAPIAS {MESES[mes - 1]} {anio}",
+                                        anio=anio, mes=mes)
+            total_filas += args.filas_por_mes
+            print(f"  {os.path.relpath(ruta, args.salida)} ({os.path.getsize(ruta) / 1024:,.0f} KB)")
+
+    print(f"\n{len(anios) * min(args.meses, 12)} libros, {total_filas:,} filas en {args.salida} "
+          f"({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
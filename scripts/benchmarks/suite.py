@@ -0,0 +1,259 @@
+"""
+Suite de benchmarks del ETL, los cargadores y los generadores de reportes,
+sobre datos sintéticos con el esquema de trazabilidad (10k / 100k / 1M filas).
+
+Cada caso prepara sus datos fuera de la medición y reporta el mejor tiempo de
+`--repeat` corridas. Los resultados se comparan contra una línea base guardada
+(baselines.json): la suite falla (código de salida 1) si algún caso supera
+`--umbral` veces su línea base. Las líneas base dependen de la máquina: se
+regeneran con `--guardar-baseline` al cambiar de equipo o tras una mejora.
+
+Uso (desde la raíz del proyecto):
+    python scripts/benchmarks/suite.py
+    python scripts/benchmarks/suite.py --sizes 10000,100000,1000000 --casos normalize_data,carga_historica
+    python scripts/benchmarks/suite.py --guardar-baseline
+    python scripts/benchmarks/suite.py --umbral 1.3
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'scripts', 'automation'))
+sys.path.insert(0, os.path.join(RAIZ, 'scripts', 'cleanup'))
+
+import pandas as pd
+
+from datos_sinteticos import (
+    generar_trazabilidad, generar_registros_historicos, escribir_json_historico, escribir_excel_trazabilidad
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Diferencias menores a esto no cuentan como regresión (ruido de medición en casos rápidos)
+MIN_REGRESION_S = 0.05
+
+
+@contextmanager
+def directorio_actual(path):
+    anterior = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+# --- CASOS ---
+# Cada caso: preparar(n, tmp) -> contexto; correr(contexto). `max_filas` limita los
+# tamaños en los que tiene sentido (p. ej. Excel o el ZIP masivo a 1M filas).
+
+def preparar_excel(n, tmp):
+    escribir_excel_trazabilidad(os.path.join(tmp, 'data', 'raw', 'TRAZABILIDADES', '2024', '01 INGRESOS TERAPIAS ENERO 2024.xlsx'), n,
+                                anio=2024, mes=1)
+    return tmp
+
+def correr_excel(tmp):
+    import convert_excel_to_json
+    with directorio_actual(tmp):
+        convert_excel_to_json.process_files()
+
+
+def preparar_carga_historica(n, tmp):
+    directorio = os.path.join(tmp, 'json')
+    escribir_json_historico(directorio, n)
+    return directorio
+
+def correr_carga_historica(directorio):
+    from src.utils.trazabilidad_utils import read_historical_data_json
+    # Sin la caché de Streamlit: se mide la carga completa
+    read_historical_data_json(directorio)
+
+
+def preparar_normalize(n, tmp):
+    return generar_trazabilidad(n)
+
+def correr_normalize(df):
+    from src.utils.normalizacion_utils import normalize_data
+    normalize_data(df)
+
+
+def preparar_limpieza(n, tmp):
+    return generar_registros_historicos(n)
+
+def correr_limpieza(df):
+    # Mismos normalizadores y forma de aplicarlos que limpiar_datos_maestro.py
+    from limpiar_datos_maestro import (
+        normalizar_eps_inteligente, normalizar_municipio_inteligente, limpiar_sesiones, limpiar_texto
+    )
+    df['eps'].apply(normalizar_eps_inteligente)
+    df['municipio'].apply(normalizar_municipio_inteligente)
+    df['sesiones'].apply(limpiar_sesiones)
+    for col in ['nombres', 'apellidos', 'direccion', 'telefono', 'profesional', 'diagnostico', 'tipo_terapia']:
+        df[col].apply(limpiar_texto)
+
+
+def preparar_ruta(n, tmp):
+    df = generar_trazabilidad(n)
+    prof = df['PROFESIONAL'].value_counts().index[0]
+    return df[df['PROFESIONAL'] == prof], prof
+
+def correr_ruta(contexto):
+    from src.utils.rutas_utils import create_route_pdf
+    df_prof, prof = contexto
+    create_route_pdf(df_prof, prof)
+
+
+def preparar_zip(n, tmp):
+    return generar_trazabilidad(n)
+
+def correr_zip(df):
+    from src.utils.rutas_utils import generate_all_routes_zip
+    generate_all_routes_zip(df)
+
+
+def preparar_agregaciones(n, tmp):
+    df = generar_trazabilidad(n).rename(columns={'TIPO DE TERAPIAS': 'TIPO_TERAPIA'})
+    return df
+
+def correr_agregaciones(df):
+    # Índice de filtros del módulo histórico + agregaciones de sus KPIs y gráficos
+    from src.utils.filtros_utils import FilterIndex
+    from src.utils.terapias_utils import get_therapy_codes
+    index = FilterIndex(df, ['AÑO_DATA', 'TIPO_TERAPIA', 'EPS'])
+    years = index.values('AÑO_DATA')
+    df_f = index.take({'AÑO_DATA': years[-3:], 'EPS': index.values('EPS')[:5]})
+    df_f.groupby('AÑO_DATA').agg({'CEDULA': 'nunique', 'CANTIDAD': 'sum', 'PROFESIONAL': 'nunique', 'MUNICIPIO': 'nunique'})
+    therapy = get_therapy_codes(df_f, 'TIPO_TERAPIA')
+    df_f['CANTIDAD'].groupby([df_f['AÑO_DATA'], therapy], observed=True).sum().unstack(fill_value=0)
+    df_f.groupby('MUNICIPIO').agg({'CEDULA': 'nunique', 'CANTIDAD': 'sum', 'PROFESIONAL': 'nunique'})
+    df_f.groupby('EPS')['CEDULA'].nunique()
+
+
+def preparar_consultas_sqlite(n, tmp):
+    from src.utils.historico_utils import write_historical_db
+    from src.utils.terapias_utils import add_therapy_code
+    # Con THERAPY_CODE, como el histórico real (read_historical_data_json la agrega)
+    df = add_therapy_code(generar_trazabilidad(n).rename(columns={'TIPO DE TERAPIAS': 'TIPO_TERAPIA'}), 'TIPO_TERAPIA')
+    return write_historical_db(df, os.path.join(tmp, 'trazabilidad.db'))
+
+def correr_consultas_sqlite(db_path):
+    # Mismas consultas que el módulo histórico, en un store nuevo (sin resultados memorizados)
+    from src.utils.historico_utils import HistoricalStore
+    store = HistoricalStore(db_path)
+    years = store.values('AÑO_DATA')
+    filters = {'AÑO_DATA': years[-3:], 'EPS': store.values('EPS')[:5]}
+    store.totals(filters, ['Sesiones', 'Pacientes', 'Registros', 'Profesionales', 'EPS_Atendidas', 'Municipios'])
+    store.aggregate(filters, ['Sesiones', 'Pacientes', 'Profesionales'], by='AÑO_DATA')
+    store.aggregate(filters, ['Sesiones', 'Pacientes'], by='PERIODO')
+    store.aggregate(filters, ['Sesiones'], by='THERAPY_CODE')
+    store.aggregate(filters, ['Pacientes', 'Sesiones', 'Profesionales'], by='MUNICIPIO', order_by='Pacientes')
+    store.returning_patients(filters)
+
+
+CASOS = {
+    'convert_excel_to_json': dict(preparar=preparar_excel, correr=correr_excel, max_filas=100_000),
+    'carga_historica': dict(preparar=preparar_carga_historica, correr=correr_carga_historica),
+    'normalize_data': dict(preparar=preparar_normalize, correr=correr_normalize),
+    'normalizadores_limpieza': dict(preparar=preparar_limpieza, correr=correr_limpieza),
+    'create_route_pdf': dict(preparar=preparar_ruta, correr=correr_ruta),
+    'generate_all_routes_zip': dict(preparar=preparar_zip, correr=correr_zip, max_filas=100_000),
+    'agregaciones_historicas': dict(preparar=preparar_agregaciones, correr=correr_agregaciones),
+    'consultas_historicas_db': dict(preparar=preparar_consultas_sqlite, correr=correr_consultas_sqlite),
+}
+
+
+def medir(caso, n, repeat):
+    tmp = tempfile.mkdtemp(prefix='bench_')
+    try:
+        contexto = caso['preparar'](n, tmp)
+        tiempos = []
+        for _ in range(repeat):
+            inicio = time.perf_counter()
+            caso['correr'](contexto)
+            tiempos.append(time.perf_counter() - inicio)
+        return min(tiempos)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def cargar_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f).get('resultados', {})
+
+
+def guardar_baselines(resultados):
+    # Se conservan las líneas base de casos/tamaños no ejecutados en esta corrida
+    todos = {**cargar_baselines(), **resultados}
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({
+            'generado': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'maquina': platform.platform(),
+            'resultados': dict(sorted(todos.items())),
+        }, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000', help="Tamaños (filas) separados por coma, p. ej. 10000,100000,1000000")
+    parser.add_argument('--casos', default=','.join(CASOS), help="Casos a ejecutar, separados por coma")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--umbral', type=float, default=1.5, help="Regresión: tiempo > umbral x línea base")
+    parser.add_argument('--guardar-baseline', action='store_true', help="Guarda los tiempos de esta corrida como línea base")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    nombres = [c.strip() for c in args.casos.split(',') if c.strip()]
+    desconocidos = [c for c in nombres if c not in CASOS]
+    if desconocidos:
+        parser.error(f"Casos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(CASOS)}")
+
+    baselines = {} if args.guardar_baseline else cargar_baselines()
+    resultados, regresiones = {}, []
+
+    print(f"{'Caso':<26} {'Filas':>10} {'Tiempo (s)':>11} {'Base (s)':>9} {'Ratio':>6}")
+    for nombre in nombres:
+        caso = CASOS[nombre]
+        for n in sizes:
+            if n > caso.get('max_filas', n):
+                print(f"{nombre:<26} {n:>10,} {'omitido':>11}")
+                continue
+            clave = f"{nombre}@{n}"
+            tiempo = medir(caso, n, args.repeat)
+            resultados[clave] = round(tiempo, 4)
+
+            base = baselines.get(clave)
+            if base:
+                ratio = tiempo / base
+                marca = ''
+                if ratio > args.umbral and tiempo - base > MIN_REGRESION_S:
+                    regresiones.append((clave, tiempo, base, ratio))
+                    marca = '  <-- REGRESIÓN'
+                print(f"{nombre:<26} {n:>10,} {tiempo:>11.3f} {base:>9.3f} {ratio:>6.2f}{marca}")
+            else:
+                print(f"{nombre:<26} {n:>10,} {tiempo:>11.3f} {'-':>9} {'-':>6}")
+
+    if args.guardar_baseline:
+        guardar_baselines(resultados)
+        print(f"\nLínea base guardada en {os.path.relpath(BASELINE_PATH, RAIZ)}")
+    elif regresiones:
+        print(f"\nFALLA: {len(regresiones)} caso(s) superan {args.umbral:.2f}x su línea base")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,20 @@
+import os
+import sys
 import pandas as pd
-import re
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.normalizacion_utils import (
+    ALIAS_PATH, ProfessionalAliasResolver, load_professional_aliases, normalize_data
+)
 
 def verify_global_normalization():
     print("Starting verification of normalization logic...")
     data = {
         'PROFESIONAL': [
-            'YERIS APONTE', 
-            'YERIS APONTE VEREDA', 
-            'YERIS APONTE VEREDAS', 
+            'YERIS APONTE',
+            'YERIS APONTE VEREDA',
+            'YERIS APONTE VEREDAS',
             'Dr Yeris',
             'dr. yeris',
             'Dr. Yeris Aponte',
@@ -17,42 +24,59 @@ def verify_global_normalization():
         'VALOR': [1, 2, 3, 4, 5, 6, 7, 8]
     }
     df = pd.DataFrame(data)
-    
+
     print("Original values:")
     print(df['PROFESIONAL'].tolist())
-    
-    # Simulate the normalization function
-    if 'PROFESIONAL' in df.columns:
-        # Standardize strings
-        df['PROFESIONAL'] = df['PROFESIONAL'].astype(str).str.strip().str.upper()
-        
-        # Yeris Aponte unification
-        # Catch: "YERIS APONTE", "YERIS APONTE VEREDAS", "DR YERIS"
-        # Using a regex that handles "DR." with optional dot and space
-        regex_pattern = r'(YERIS\s+APONTE|DR\.?\s*YERIS)'
-        print(f"Applying regex: {regex_pattern}")
-        
-        mask_yeris = df['PROFESIONAL'].str.contains(regex_pattern, regex=True, na=False)
-        df.loc[mask_yeris, 'PROFESIONAL'] = 'YERIS APONTE'
-    
+
+    # Tabla de alias del proyecto (data/reference/alias_profesionales.json)
+    aliases = load_professional_aliases(os.path.join(os.path.dirname(__file__), '..', ALIAS_PATH))
+    print(f"Alias table: {aliases}")
+    resolver = ProfessionalAliasResolver(aliases)
+
+    df_norm = normalize_data(df, resolver=resolver)
+
     print("\nNormalized values:")
-    print(df['PROFESIONAL'].value_counts())
-    
+    print(df_norm['PROFESIONAL'].value_counts())
+
     # Assertions
-    yeris_count = len(df[df['PROFESIONAL'] == 'YERIS APONTE'])
+    ok = True
+    yeris_count = len(df_norm[df_norm['PROFESIONAL'] == 'YERIS APONTE'])
     print(f"\nCount of 'YERIS APONTE': {yeris_count}")
-    
-    expected_yeris_count = 6 # All except 'Otro Doc'
-    # 'Yeris    Aponte' becomes 'YERIS    APONTE', might not match simple space regex if we don't normalize spaces first.
-    # checking my regex: YERIS\s+APONTE matches one or more whitespace.
-    
-    if yeris_count >= 6:
+
+    expected_yeris_count = 7 # All except 'Otro Doc'
+    if yeris_count == expected_yeris_count:
         print("✅ SUCCESS: logic captured variations.")
     else:
+        ok = False
         print("❌ FAILURE: logic missed some variations.")
         # Debug missed
         print("Missed items that should be Yeris:")
-        print(df[df['PROFESIONAL'] != 'YERIS APONTE'])
+        print(df_norm[df_norm['PROFESIONAL'] != 'YERIS APONTE'])
+
+    if df['PROFESIONAL'].tolist() == data['PROFESIONAL']:
+        print("✅ SUCCESS: original DataFrame was not modified.")
+    else:
+        ok = False
+        print("❌ FAILURE: normalize_data modified its input.")
+
+    # Varios canónicos en la misma pasada
+    resolver_multi = ProfessionalAliasResolver({
+        'YERIS APONTE': [r'YERIS\s+APONTE', r'DR\.?\s*YERIS'],
+        'ANA PEREZ': [r'ANA\s+(MARIA\s+)?PEREZ', r'FT\.?\s*ANA\s+P\b'],
+    })
+    casos = {
+        'ANA MARIA PEREZ': 'ANA PEREZ',
+        'FT ANA P': 'ANA PEREZ',
+        'DR YERIS': 'YERIS APONTE',
+        'ANA GOMEZ': 'ANA GOMEZ',
+    }
+    for original, esperado in casos.items():
+        obtenido = resolver_multi.resolve(original)
+        status = "✅" if obtenido == esperado else "❌"
+        ok = ok and obtenido == esperado
+        print(f"{status} {original!r} -> {obtenido!r} (expected {esperado!r})")
+
+    return ok
 
 if __name__ == "__main__":
-    verify_global_normalization()
+    sys.exit(0 if verify_global_normalization() else 1)
@@ -0,0 +1,43 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.rutas_utils import is_valid_date, prepare_route_cards
+
+def verify_route_cards():
+    print("Starting verification of route card preparation...")
+    ok = True
+
+    casos = {
+        'con fecha de ingreso': pd.DataFrame({
+            'NOMBRE': ['ANA', 'LUIS', 'SOFIA', 'JUAN'],
+            'FECHA DE INGRESO': ['2024-01-05', '', None, 'nan'],
+            'CANTIDAD': ['10', '5', 'x', '8'],
+        }),
+        # Sin la columna: cada fila daba row.get('FECHA DE INGRESO') -> None -> activo
+        'sin fecha de ingreso': pd.DataFrame({
+            'NOMBRE': ['ANA', 'LUIS'],
+            'CANTIDAD': ['4', '6'],
+        }),
+    }
+
+    for nombre, df in casos.items():
+        cards = prepare_route_cards(df)
+        # Referencia: evaluación fila a fila como la generaba la hoja de ruta original
+        esperado = [not is_valid_date(row.get('FECHA DE INGRESO')) for _, row in df.iterrows()]
+        obtenido = cards['pending'].tolist()
+        status = "✅" if obtenido == esperado else "❌"
+        ok = ok and obtenido == esperado
+        print(f"{status} {nombre}: pending={obtenido} (expected {esperado})")
+
+        sesiones = pd.to_numeric(df['CANTIDAD'], errors='coerce').fillna(0).tolist()
+        if cards['sessions'].tolist() != sesiones:
+            ok = False
+            print(f"❌ {nombre}: sessions={cards['sessions'].tolist()} (expected {sesiones})")
+
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_route_cards() else 1)
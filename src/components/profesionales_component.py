@@ -6,17 +6,41 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import json
 
-def load_consolidated_professionals():
-    """Carga los datos consolidados de profesionales"""
+from src.utils.profesionales_utils import (
+    PROFESSIONALS_PATH, ProfessionalsStore, ProfessionalWorkload, read_professionals
+)
+from src.utils.trazabilidad_utils import get_path_version
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _load_professionals_store(path, data_version):
+    """Directorio e índice de búsqueda, construidos una vez por versión del archivo."""
+    return ProfessionalsStore(read_professionals(path), version=f"{path}|{data_version}")
+
+def load_professionals_store(path=PROFESSIONALS_PATH):
+    """Directorio de profesionales consolidados con su índice de búsqueda (cacheado)."""
     try:
-        with open('data/reference/profesionales_consolidados.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return pd.DataFrame(data)
+        return _load_professionals_store(path, get_path_version(path))
     except Exception as e:
         st.error(f"Error cargando datos de profesionales: {e}")
-        return pd.DataFrame()
+        return ProfessionalsStore(pd.DataFrame())
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _load_professional_workload(directory_version, patients_version, _store, _df_patients):
+    """Cruce directorio <-> pacientes, una vez por versión de ambos."""
+    return ProfessionalWorkload(_store.df, _df_patients)
+
+def load_professional_workload(store, df_patients, patients_version):
+    """
+    Carga por profesional (pacientes, sesiones, EPS, municipios) del directorio,
+    calculada una vez por versión del directorio y de los pacientes
+    (`patients_version`, p. ej. `data_index.version`).
+    """
+    return _load_professional_workload(store.version, patients_version, store, df_patients)
+
+def load_consolidated_professionals():
+    """Carga los datos consolidados de profesionales"""
+    return load_professionals_store().df
 
 def create_professional_card(prof_data):
     """Crea una tarjeta visual para un profesional"""
@@ -27,6 +51,8 @@ def create_professional_card(prof_data):
     municipio = prof_data.get('MUNICIPIO', 'N/A')
     vinculacion = prof_data.get('VINCULACION', 'N/A')
     tarifa = prof_data.get('TARIFA', 'N/A')
+    pacientes = prof_data.get('PACIENTES', 'N/A')
+    sesiones = prof_data.get('SESIONES', 'N/A')
     
     # Crear HTML para la tarjeta
     card_html = f"""
@@ -46,6 +72,8 @@ def create_professional_card(prof_data):
             <div><strong>📍 Municipio:</strong> {municipio}</div>
             <div><strong>💼 Vinculación:</strong> {vinculacion}</div>
             <div><strong>💰 Tarifa:</strong> {tarifa}</div>
+            <div><strong>🧑‍🤝‍🧑 Pacientes:</strong> {pacientes}</div>
+            <div><strong>🗓️ Sesiones:</strong> {sesiones}</div>
         </div>
     </div>
     """
@@ -113,12 +141,18 @@ def create_professional_report_pdf(prof_data, patient_data):
         pdf.cell(20, 7, 'Sesiones', 1)
         pdf.ln()
         
-        # Table rows
-        for _, row in patient_data.head(20).iterrows():  # Limit to 20 patients
-            nombre_pac = f"{row.get('NOMBRE', '')} {row.get('APELLIDOS', '')}"[:35]
-            mun = str(row.get('MUNICIPIO', ''))[:20]
-            tipo = str(row.get('TIPO DE TERAPIAS', ''))[:15]
-            cant = str(row.get('CANTIDAD', ''))
+        # Table rows (Limit to 20 patients)
+        first = patient_data.head(20)
+        def column(col):
+            return first[col].tolist() if col in first.columns else [''] * len(first)
+        
+        for nombre, apellidos, mun, tipo, cant in zip(
+            column('NOMBRE'), column('APELLIDOS'), column('MUNICIPIO'), column('TIPO DE TERAPIAS'), column('CANTIDAD')
+        ):
+            nombre_pac = f"{nombre} {apellidos}"[:35]
+            mun = str(mun)[:20]
+            tipo = str(tipo)[:15]
+            cant = str(cant)
             
             pdf.cell(80, 7, nombre_pac, 1)
             pdf.cell(40, 7, mun, 1)
@@ -128,20 +162,31 @@ def create_professional_report_pdf(prof_data, patient_data):
     
     return pdf.output(dest='S').encode('latin-1', 'replace')
 
-def render_professionals_tab(df_patients):
-    """Renderiza la pestaña completa de profesionales"""
+def render_professionals_tab(df_patients, patients_version):
+    """
+    Renderiza la pestaña completa de profesionales.
+    `patients_version` identifica los datos de pacientes (p. ej. `data_index.version`)
+    para reutilizar el cruce directorio <-> pacientes entre reruns.
+    """
     st.header("👥 Gestión de Profesionales")
     
-    # Load consolidated data
-    df_profs = load_consolidated_professionals()
+    # Load consolidated data (cacheado, con índice de búsqueda)
+    store = load_professionals_store()
+    df_profs = store.df
     
     if df_profs.empty:
         st.warning("No se encontraron datos de profesionales consolidados.")
         st.info("Ejecuta el script `consolidar_profesionales.py` primero para generar los datos.")
         return
     
+    # Directorio con la carga de cada profesional (cruce precalculado con los pacientes)
+    workload = None
+    if df_patients is not None and not df_patients.empty:
+        workload = load_professional_workload(store, df_patients, patients_version)
+    df_directory = workload.table if workload is not None else df_profs
+    
     # Remove internal fields for display
-    display_cols = [col for col in df_profs.columns if not col.startswith('_')]
+    display_cols = [col for col in df_directory.columns if not col.startswith('_')]
     
     # KPIs
     st.subheader("📊 Resumen General")
@@ -203,20 +248,13 @@ def render_professionals_tab(df_patients):
     
     with col_filter:
         if 'MUNICIPIO' in df_profs.columns:
-            municipios = ['Todos'] + sorted(df_profs['MUNICIPIO'].dropna().unique().tolist())
+            municipios = ['Todos'] + store.filter_index.values('MUNICIPIO')
             selected_mun = st.selectbox("Filtrar por municipio", municipios)
     
-    # Apply filters
-    df_filtered = df_profs.copy()
-    
-    if search_term:
-        mask = df_filtered[display_cols].astype(str).apply(
-            lambda x: x.str.contains(search_term, case=False, na=False)
-        ).any(axis=1)
-        df_filtered = df_filtered[mask]
-    
-    if 'MUNICIPIO' in df_profs.columns and selected_mun != 'Todos':
-        df_filtered = df_filtered[df_filtered['MUNICIPIO'] == selected_mun]
+    # Apply filters: índice de tokens (prefijos de nombre, cédula, teléfono, municipio)
+    mun_filter = selected_mun if 'MUNICIPIO' in df_profs.columns and selected_mun != 'Todos' else None
+    positions = store.positions(search_term, mun_filter)
+    df_filtered = df_directory if positions is None else df_directory.iloc[positions]
     
     st.caption(f"Mostrando {len(df_filtered)} de {len(df_profs)} profesionales")
     
@@ -291,17 +329,20 @@ def render_professionals_tab(df_patients):
                     st.write(f"**Tarifa:** {prof_data.get('TARIFA', 'N/A')}")
                     st.write(f"**Dirección:** {prof_data.get('DIRECCION', 'N/A')}")
                 
-                # Get patient data for this professional
-                if df_patients is not None and not df_patients.empty and 'PROFESIONAL' in df_patients.columns:
-                    patient_data = df_patients[df_patients['PROFESIONAL'] == selected_prof_name]
+                # Get patient data for this professional (posiciones precalculadas en el cruce)
+                if workload is not None and 'PROFESIONAL' in df_patients.columns:
+                    patient_data = workload.patients(selected_prof_name)
                     
                     if not patient_data.empty:
                         st.markdown("---")
                         st.markdown("### 📊 Estadísticas de Pacientes")
                         
                         col_stat1, col_stat2, col_stat3 = st.columns(3)
-                        col_stat1.metric("Pacientes Asignados", len(patient_data))
-                        col_stat2.metric("Total Sesiones", int(patient_data['CANTIDAD'].sum()) if 'CANTIDAD' in patient_data.columns else 0)
+                        col_stat1.metric("Pacientes Asignados", int(prof_data.get('PACIENTES', len(patient_data))))
+                        col_stat2.metric("Total Sesiones", int(prof_data.get('SESIONES', 0)))
+                        col_stat3.metric("Municipios Atendidos", len([m for m in str(prof_data.get('MUNICIPIOS ATENDIDOS', '')).split(', ') if m]))
+                        if prof_data.get('EPS ATENDIDAS'):
+                            st.caption(f"EPS: {prof_data.get('EPS ATENDIDAS')}")
                         
                         # Generate PDF report
                         st.markdown("---")
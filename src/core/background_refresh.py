@@ -0,0 +1,97 @@
+"""
+Refresco en segundo plano (stale-while-revalidate) para datos remotos.
+Sirve siempre el último snapshot válido y, cuando vence, lanza la descarga
+en un hilo aparte; el nuevo snapshot reemplaza al anterior de forma atómica.
+"""
+import threading
+import time
+from datetime import datetime
+
+# Espera mínima entre reintentos cuando el refresco falla
+RETRY_AFTER_ERROR = 60
+
+
+class BackgroundRefresher:
+    """
+    Mantiene el último resultado de `fetch` y lo revalida en un hilo de fondo.
+
+    Args:
+        fetch (callable): Función sin argumentos que devuelve (DataFrame, metadatos).
+        ttl (int): Segundos tras los cuales el snapshot se considera viejo.
+        initial (callable): Función opcional que devuelve un snapshot local
+            (DataFrame, metadatos) o (None, None), usada para arrancar al instante.
+    """
+
+    def __init__(self, fetch, ttl=300, initial=None):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stale = False
+        # (df, meta, timestamp de carga): se reemplaza completo, nunca se muta
+        self._snapshot = None
+        self._last_attempt = 0.0
+        self.last_error = None
+
+        if initial is not None:
+            df, meta = initial()
+            if df is not None:
+                meta = meta or {}
+                # Snapshot local: se sirve de inmediato y se revalida en la primera consulta
+                self._snapshot = (df, meta, _parse_timestamp(meta.get('checked_at')))
+                self._stale = True
+
+    def get(self):
+        """
+        Devuelve (DataFrame, metadatos) del último snapshot válido.
+        Solo bloquea si todavía no hay ningún snapshot (primera carga sin caché local).
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._refresh()
+            snapshot = self._snapshot
+            if snapshot is None:
+                raise self.last_error or RuntimeError("No se pudieron cargar los datos.")
+        elif self._stale or time.time() - snapshot[2] > self.ttl:
+            self._start_background_refresh()
+        return snapshot[0], snapshot[1]
+
+    def age_seconds(self):
+        """Segundos desde la última descarga o verificación exitosa (None si no hay datos)."""
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot[2]:
+            return None
+        return time.time() - snapshot[2]
+
+    def is_refreshing(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def _start_background_refresh(self):
+        with self._lock:
+            if self.is_refreshing():
+                return
+            if self.last_error is not None and time.time() - self._last_attempt < RETRY_AFTER_ERROR:
+                return
+            self._thread = threading.Thread(target=self._refresh, daemon=True)
+            self._thread.start()
+
+    def _refresh(self):
+        self._last_attempt = time.time()
+        try:
+            df, meta = self._fetch()
+            # Reemplazo atómico: los lectores ven el snapshot anterior o el nuevo, nunca uno parcial
+            self._snapshot = (df, dict(meta or {}), time.time())
+            self._stale = False
+            self.last_error = None
+        except Exception as e:
+            print(f"Error refrescando datos en segundo plano: {e}")
+            self.last_error = e
+
+
+def _parse_timestamp(value):
+    """Convierte una fecha ISO guardada en los metadatos a timestamp (0.0 si no es válida)."""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
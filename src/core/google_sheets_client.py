@@ -1,6 +1,67 @@
 import gspread
 import os
 import json
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from src.core.sheets_request import call_with_retry, quota_bucket, inflight_requests
+
+# Máximo de peticiones simultáneas a la API por proceso (todas las sesiones de Streamlit)
+MAX_CONCURRENT_REQUESTS = 4
+
+_client_pool = {}
+_client_pool_lock = threading.Lock()
+
+def clean_sheet_headers(headers):
+    """
+    Limpia encabezados para asegurar unicidad y que no estén vacíos.
+    Los vacíos se nombran Column_N y los repetidos reciben sufijo _2, _3...
+    """
+    clean_headers = []
+    header_count = {}
+    
+    for i, h in enumerate(headers):
+        h = str(h).strip()
+        if not h:
+            h = f"Column_{i+1}"
+        
+        if h in header_count:
+            header_count[h] += 1
+            h = f"{h}_{header_count[h]}"
+        else:
+            header_count[h] = 1
+        clean_headers.append(h)
+    
+    return clean_headers
+
+def values_to_dataframe(all_values):
+    """
+    Construye un DataFrame directamente desde la matriz de valores de la hoja.
+    La primera fila son los encabezados (limpiados con clean_sheet_headers); las filas
+    cortas se rellenan con '' y las columnas sobrantes se descartan. Se crea un único
+    bloque 2-D en lugar de un diccionario por fila.
+    """
+    if not all_values:
+        return pd.DataFrame()
+
+    headers = clean_sheet_headers(all_values[0])
+    rows = all_values[1:]
+    n_cols = len(headers)
+
+    if not rows:
+        return pd.DataFrame(columns=headers)
+
+    # Filas irregulares quedan rellenadas con None en la construcción
+    df = pd.DataFrame(rows)
+    if df.shape[1] > n_cols:
+        df = df.iloc[:, :n_cols]
+    elif df.shape[1] < n_cols:
+        df = df.reindex(columns=range(n_cols))
+    if df.isna().values.any():
+        df = df.fillna('')
+    df.columns = headers
+    return df
 
 class GoogleSheetsClient:
     def __init__(self, credentials_path='credentials.json'):
@@ -32,63 +93,102 @@ class GoogleSheetsClient:
         except Exception as e:
             raise Exception(f"Error al autenticar con Google Sheets: {e}")
 
-    def get_sheet_data(self, sheet_name_or_url):
+    def _configure_session(self, max_concurrent):
         """
-        Obtiene todos los registros de una hoja de cálculo.
+        Limita la concurrencia y ajusta el pool de conexiones HTTP de la sesión autenticada.
+        La sesión (requests + google-auth) reutiliza el token OAuth hasta que expira
+        y mantiene las conexiones TLS abiertas (keep-alive) entre peticiones.
+        """
+        self._request_slots = threading.BoundedSemaphore(max_concurrent)
+        # gspread >= 6 guarda la sesión en http_client; en 5.x directamente en el cliente
+        session = getattr(getattr(self.gc, 'http_client', self.gc), 'session', None)
+        if session is not None:
+            adapter = HTTPAdapter(pool_connections=max_concurrent, pool_maxsize=max_concurrent)
+            session.mount('https://', adapter)
+
+    @contextmanager
+    def request_slot(self):
+        """Reserva un cupo de concurrencia para una petición a la API."""
+        slots = getattr(self, '_request_slots', None)
+        if slots is None:
+            yield
+            return
+        with slots:
+            yield
+
+    def call_api(self, func, *args, **kwargs):
+        """
+        Ejecuta una llamada a la API respetando la cuota compartida y el cupo de
+        concurrencia, con reintentos y backoff exponencial ante 429/5xx.
+        """
+        def attempt():
+            quota_bucket.acquire()
+            with self.request_slot():
+                return func(*args, **kwargs)
+        return call_with_retry(attempt)
+
+    def open_spreadsheet(self, sheet_name_or_url):
+        """
+        Abre una hoja de cálculo por URL (si parece una URL) o por nombre.
         
         Args:
             sheet_name_or_url (str): Nombre del archivo en Google Drive o la URL completa.
             
         Returns:
-            list: Lista de diccionarios con los datos de la hoja.
+            gspread.Spreadsheet: Hoja de cálculo abierta (incluye los metadatos de sus pestañas).
         """
-        try:
-            # Intenta abrir por URL primero si parece una URL, si no por nombre
-            if 'docs.google.com' in sheet_name_or_url:
-                sh = self.gc.open_by_url(sheet_name_or_url)
-            else:
-                sh = self.gc.open(sheet_name_or_url)
-            
-            # Selecciona la primera hoja de trabajo por defecto
-            worksheet = sh.sheet1
-            
-            # Obtiene todos los valores crudos para manejar headers duplicados o vacíos manualmente
-            all_values = worksheet.get_all_values()
-            
-            if not all_values:
-                return []
+        if 'docs.google.com' in sheet_name_or_url:
+            return self.gc.open_by_url(sheet_name_or_url)
+        return self.gc.open(sheet_name_or_url)
 
-            # Asumimos que la primera fila son los encabezados
-            headers = all_values[0]
-            rows = all_values[1:]
-            
-            # Limpiar encabezados para asegurar unicidad y que no estén vacíos
-            clean_headers = []
-            header_count = {}
+    def get_last_update_time(self, spreadsheet):
+        """
+        Obtiene la fecha de última modificación del archivo según Drive.
+        Es una consulta de metadatos (unos pocos KB), no descarga las celdas.
+        
+        Args:
+            spreadsheet (gspread.Spreadsheet): Hoja abierta con open_spreadsheet.
             
-            for i, h in enumerate(headers):
-                h = str(h).strip()
-                if not h:
-                    h = f"Column_{i+1}"
-                
-                if h in header_count:
-                    header_count[h] += 1
-                    h = f"{h}_{header_count[h]}"
-                else:
-                    header_count[h] = 1
-                clean_headers.append(h)
+        Returns:
+            str: Fecha ISO de modificación (campo modifiedTime de Drive).
+        """
+        # gspread >= 6 expone el método; en 5.x es una propiedad
+        if hasattr(spreadsheet, 'get_lastUpdateTime'):
+            return spreadsheet.get_lastUpdateTime()
+        return spreadsheet.lastUpdateTime
+
+    def get_sheet_dataframe(self, sheet_name_or_url):
+        """
+        Obtiene la primera hoja como DataFrame (sin pasar por una lista de diccionarios).
+        
+        Args:
+            sheet_name_or_url (str): Nombre del archivo en Google Drive o la URL completa.
             
-            # Construir lista de diccionarios usando los encabezados limpios
-            data = []
-            for row in rows:
-                # Asegurarse de que la fila tenga la misma longitud que los headers
-                # Rellenar con None si faltan columnas, o cortar si sobran (aunque get_all_values suele ser rectangular)
-                row_data = row + [''] * (len(clean_headers) - len(row))
-                record = dict(zip(clean_headers, row_data[:len(clean_headers)]))
-                data.append(record)
+        Returns:
+            pd.DataFrame: Datos de la hoja con encabezados limpios (vacío si la hoja no tiene datos).
+        """
+        def fetch():
+            sh = self.call_api(self.open_spreadsheet, sheet_name_or_url)
             
-            return data
+            # Obtiene todos los valores crudos para manejar headers duplicados o vacíos manualmente
+            all_values = self.call_api(sh.sheet1.get_all_values)
+            return values_to_dataframe(all_values)
+        
+        # Lecturas simultáneas de la misma hoja comparten una sola descarga
+        return inflight_requests.do(('dataframe', sheet_name_or_url), fetch)
+
+    def get_sheet_data(self, sheet_name_or_url):
+        """
+        Obtiene todos los registros de una hoja de cálculo.
+        
+        Args:
+            sheet_name_or_url (str): Nombre del archivo en Google Drive o la URL completa.
             
+        Returns:
+            list: Lista de diccionarios con los datos de la hoja.
+        """
+        try:
+            return self.get_sheet_dataframe(sheet_name_or_url).to_dict('records')
         except gspread.exceptions.SpreadsheetNotFound:
             print(f"Error: No se encontró la hoja de cálculo '{sheet_name_or_url}'.")
             print("Asegúrate de haber compartido la hoja con el email del Service Account.")
@@ -103,3 +203,25 @@ class GoogleSheetsClient:
         except Exception as e:
             print(f"Error al leer datos: {e}")
             return []
+
+def get_shared_client(credentials_path='credentials.json', max_concurrent=MAX_CONCURRENT_REQUESTS):
+    """
+    Devuelve un GoogleSheetsClient compartido por todo el proceso.
+    La primera llamada lee las credenciales y autentica; las siguientes reutilizan
+    el mismo cliente (token OAuth y conexiones HTTP), evitando repetir el handshake.
+    
+    Args:
+        credentials_path (str): Ruta al archivo JSON de credenciales de servicio.
+        max_concurrent (int): Peticiones simultáneas permitidas para este cliente.
+    
+    Returns:
+        GoogleSheetsClient: Cliente autenticado.
+    """
+    key = os.path.abspath(credentials_path)
+    with _client_pool_lock:
+        client = _client_pool.get(key)
+        if client is None:
+            client = GoogleSheetsClient(credentials_path)
+            client._configure_session(max_concurrent)
+            _client_pool[key] = client
+        return client
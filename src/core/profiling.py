@@ -0,0 +1,209 @@
+"""
+Perfilado opcional de un rerun del dashboard: tiempos por sección (cargadores
+cacheados, módulos, gráficos, PDFs) y, a pedido, un volcado de cProfile o
+pyinstrument del rerun completo.
+
+El perfilador activo vive en el hilo del script de Streamlit (uno por sesión).
+Sin perfilador activo, `profile_section`, `profile_lap` y `timed` no hacen nada,
+así que pueden quedarse en el código de producción y en los utils.
+"""
+import io
+import os
+import time
+import cProfile
+import marshal
+import pstats
+import threading
+import importlib.util
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+# Activa el perfilado por sección en todos los reruns (p. ej. DASHBOARD_PROFILE=1)
+PROFILE_ENV_VAR = 'DASHBOARD_PROFILE'
+
+# Funciones listadas en el resumen de cProfile
+PROFILE_TOP_N = 40
+
+_state = threading.local()
+
+
+def profiling_forced():
+    """True si la variable de entorno pide perfilar siempre."""
+    return os.environ.get(PROFILE_ENV_VAR, '').strip().lower() in ('1', 'true', 'si', 'yes', 'on')
+
+
+def available_profilers():
+    """Perfiladores disponibles para volcar un rerun (pyinstrument es opcional)."""
+    profilers = ['cProfile']
+    if importlib.util.find_spec('pyinstrument') is not None:
+        profilers.append('pyinstrument')
+    return profilers
+
+
+class RerunProfiler:
+    """
+    Tiempos de las secciones de un rerun, anidadas.
+
+    Las secciones (`section`) se abren y cierran con un bloque `with`; los tramos
+    (`lap`) marcan el inicio de una parte y se cierran solos al empezar el tramo
+    siguiente o al cerrar la sección que los contiene, para cronometrar un
+    módulo largo por partes sin reindentarlo.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.report = None
+        # [ruta (tupla de etiquetas), segundos]
+        self.records = []
+        # Pila de (índice en records, inicio, es_tramo)
+        self._open = []
+
+    def _start(self, label, lap=False):
+        parent = self.records[self._open[-1][0]][0] if self._open else ()
+        self.records.append([parent + (label,), 0.0])
+        self._open.append((len(self.records) - 1, time.perf_counter(), lap))
+
+    def _stop(self):
+        idx, start, _ = self._open.pop()
+        self.records[idx][1] = time.perf_counter() - start
+
+    @contextmanager
+    def section(self, label):
+        self._start(label)
+        depth = len(self._open)
+        try:
+            yield
+        finally:
+            # Cierra los tramos que quedaron abiertos dentro de la sección
+            while len(self._open) > depth:
+                self._stop()
+            self._stop()
+
+    def lap(self, label):
+        if self._open and self._open[-1][2]:
+            self._stop()
+        self._start(label, lap=True)
+
+    def finish(self):
+        while self._open:
+            self._stop()
+        self.total = time.perf_counter() - self.started
+
+    def breakdown(self):
+        """Tabla por sección (en orden de aparición, sangrada por nivel) con tiempo, llamadas y % del rerun."""
+        totals = {}
+        for path, seconds in self.records:
+            row = totals.setdefault(path, [0.0, 0])
+            row[0] += seconds
+            row[1] += 1
+        total = self.total or sum(s for path, (s, _) in totals.items() if len(path) == 1)
+        return pd.DataFrame([{
+            'Sección': ('\u2003' * (len(path) - 2) + '↳ ' if len(path) > 1 else '') + path[-1],
+            'ms': round(seconds * 1000, 1),
+            'Llamadas': calls,
+            '% del rerun': round(100 * seconds / total, 1) if total else 0.0,
+        } for path, (seconds, calls) in totals.items()], columns=['Sección', 'ms', 'Llamadas', '% del rerun'])
+
+
+def active_profiler():
+    """Perfilador del rerun en curso en este hilo, o None."""
+    return getattr(_state, 'profiler', None)
+
+
+@contextmanager
+def profile_section(label):
+    """Cronometra el bloque como una sección del rerun (no hace nada si no se está perfilando)."""
+    profiler = active_profiler()
+    if profiler is None:
+        yield
+        return
+    with profiler.section(label):
+        yield
+
+
+def profile_lap(label):
+    """Inicia el tramo `label` dentro de la sección actual (no hace nada si no se está perfilando)."""
+    profiler = active_profiler()
+    if profiler is not None:
+        profiler.lap(label)
+
+
+def timed(label=None):
+    """Decorador: cada llamada a la función es una sección del rerun perfilado."""
+    def decorator(fn):
+        name = label or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = active_profiler()
+            if profiler is None:
+                return fn(*args, **kwargs)
+            with profiler.section(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _start_tracer(engine):
+    if engine == 'pyinstrument':
+        from pyinstrument import Profiler
+        tracer = Profiler()
+        tracer.start()
+        return tracer
+    tracer = cProfile.Profile()
+    tracer.enable()
+    return tracer
+
+
+def _stop_tracer(engine, tracer):
+    """Detiene el trazador y devuelve el reporte: texto resumido y archivo descargable."""
+    if engine == 'pyinstrument':
+        tracer.stop()
+        return {
+            'text': tracer.output_text(unicode=True),
+            'data': tracer.output_html().encode('utf-8'),
+            'file_name': 'perfil_rerun.html',
+            'mime': 'text/html',
+        }
+    tracer.disable()
+    stats = pstats.Stats(tracer, stream=io.StringIO())
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+    return {
+        'text': stats.stream.getvalue(),
+        # Mismo contenido que Stats.dump_stats: se abre con pstats o snakeviz
+        'data': marshal.dumps(stats.stats),
+        'file_name': 'perfil_rerun.prof',
+        'mime': 'application/octet-stream',
+    }
+
+
+@contextmanager
+def profile_rerun(enabled=True, engine=None):
+    """
+    Perfila el bloque (un rerun del script): activa el perfilador de secciones
+    en este hilo y, si se indica `engine` ('cProfile' o 'pyinstrument'), traza
+    además todas las llamadas. Entrega el RerunProfiler, o None si `enabled` es False.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = RerunProfiler()
+    _state.profiler = profiler
+    tracer = None
+    if engine:
+        try:
+            tracer = _start_tracer(engine)
+        except ValueError as e:
+            # cProfile admite un solo perfilador activo por proceso (otra sesión perfilando)
+            profiler.report = {'text': f"No se pudo iniciar {engine}: {e}", 'data': None}
+    try:
+        yield profiler
+    finally:
+        if tracer is not None:
+            profiler.report = _stop_tracer(engine, tracer)
+        profiler.finish()
+        _state.profiler = None
@@ -0,0 +1,153 @@
+"""
+Snapshot local de la hoja de ingresos (Google Sheets).
+Guarda la última descarga en SQLite junto con la fecha de modificación de Drive,
+de modo que una recarga solo consulta metadatos y descarga las celdas
+únicamente cuando la hoja realmente cambió.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+from src.core.google_sheets_client import values_to_dataframe
+from src.core.sheets_request import inflight_requests
+
+SNAPSHOT_DIR = os.path.join('data', 'cache')
+
+
+class SheetSnapshotStore:
+    """Almacén SQLite con un archivo por hoja: tabla `meta` y tabla `filas`."""
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR):
+        self.snapshot_dir = snapshot_dir
+
+    def _path(self, sheet_name_or_url):
+        key = hashlib.sha1(sheet_name_or_url.strip().encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f"sheet_{key}.db")
+
+    def load(self, sheet_name_or_url):
+        """
+        Lee el snapshot guardado.
+
+        Returns:
+            tuple: (DataFrame, dict de metadatos) o (None, None) si no existe o está dañado.
+        """
+        path = self._path(sheet_name_or_url)
+        if not os.path.exists(path):
+            return None, None
+        try:
+            conn = sqlite3.connect(path)
+            try:
+                meta = {k: v for k, v in conn.execute('SELECT clave, valor FROM meta')}
+                headers = json.loads(meta['headers'])
+                # Columnas posicionales (c0..cN): SQLite no distingue mayúsculas en nombres de columna
+                df = pd.read_sql('SELECT * FROM filas ORDER BY rowid', conn)
+            finally:
+                conn.close()
+            df.columns = headers
+            return df, meta
+        except Exception as e:
+            print(f"Snapshot local inválido, se descargará de nuevo: {e}")
+            return None, None
+
+    def save(self, sheet_name_or_url, df, meta):
+        """Reemplaza el snapshot con el DataFrame descargado y sus metadatos."""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._path(sheet_name_or_url)
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        headers = list(df.columns)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            # Columnas posicionales (c0..cN); los encabezados reales van en meta
+            df.set_axis([f"c{i}" for i in range(len(headers))], axis=1).to_sql(
+                'filas', conn, index=False, dtype='TEXT'
+            )
+            conn.execute('CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)')
+            meta = dict(meta, headers=json.dumps(headers, ensure_ascii=False))
+            conn.executemany('INSERT INTO meta VALUES (?, ?)', [(k, str(v)) for k, v in meta.items()])
+            conn.commit()
+        finally:
+            conn.close()
+
+        # Reemplazo atómico: un lector nunca ve un snapshot a medio escribir
+        os.replace(tmp_path, path)
+
+    def mark_checked(self, sheet_name_or_url, checked_at):
+        """Registra que la hoja se verificó sin cambios."""
+        conn = sqlite3.connect(self._path(sheet_name_or_url))
+        try:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('checked_at', ?)", (checked_at,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def sync_sheet_data(client, sheet_name_or_url, store=None):
+    """
+    Sincroniza la primera pestaña de la hoja con el snapshot local.
+
+    - Consulta solo la fecha de modificación de Drive y los metadatos de la hoja.
+    - Si no cambió, devuelve el snapshot local sin descargar celdas.
+    - Si cambió (o cambió la pestaña/estructura), descarga la hoja completa y
+      reemplaza el snapshot.
+    - Si la API falla (tras los reintentos) y existe snapshot, devuelve el snapshot.
+    - Llamadas simultáneas para la misma hoja se agrupan en una sola sincronización.
+
+    Args:
+        client (GoogleSheetsClient): Cliente autenticado.
+        sheet_name_or_url (str): Nombre del archivo en Google Drive o la URL completa.
+        store (SheetSnapshotStore): Almacén a usar (por defecto data/cache).
+
+    Returns:
+        tuple: (DataFrame, dict de metadatos del snapshot).
+    """
+    store = store or SheetSnapshotStore()
+    # Varias sesiones refrescando la misma hoja a la vez comparten una sola sincronización
+    key = ('sync', store._path(sheet_name_or_url))
+    return inflight_requests.do(key, lambda: _sync_sheet_data(client, sheet_name_or_url, store))
+
+
+def _sync_sheet_data(client, sheet_name_or_url, store):
+    df_snap, meta = store.load(sheet_name_or_url)
+    now = datetime.now().isoformat(timespec='seconds')
+
+    try:
+        sh = client.call_api(client.open_spreadsheet, sheet_name_or_url)
+        modified_time = client.call_api(client.get_last_update_time, sh)
+        worksheet = sh.sheet1
+        structure = f"{worksheet.id}:{worksheet.col_count}"
+
+        if (df_snap is not None
+                and meta.get('modified_time') == modified_time
+                and meta.get('structure') == structure):
+            store.mark_checked(sheet_name_or_url, now)
+            meta['checked_at'] = now
+            return df_snap, meta
+
+        # Cambió la hoja (o no hay snapshot): descarga completa
+        all_values = client.call_api(worksheet.get_all_values)
+    except Exception as e:
+        if df_snap is not None:
+            print(f"No se pudo verificar la hoja, usando snapshot local: {e}")
+            return df_snap, meta
+        raise
+
+    if not all_values:
+        return pd.DataFrame(), {}
+
+    df = values_to_dataframe(all_values)
+    meta = {
+        'modified_time': modified_time,
+        'structure': structure,
+        'synced_at': now,
+        'checked_at': now,
+        'row_count': len(df),
+    }
+    store.save(sheet_name_or_url, df, meta)
+    return df, meta
@@ -0,0 +1,118 @@
+"""
+Capa de peticiones a la API de Google Sheets/Drive.
+- Reintentos con backoff exponencial (y jitter) ante 429 y errores 5xx.
+- Token bucket compartido por el proceso para respetar la cuota de lectura.
+- Coalescencia: peticiones idénticas simultáneas comparten una sola llamada en curso.
+"""
+import random
+import threading
+import time
+
+import requests
+
+# Cuota de lectura de Sheets: 60 peticiones/minuto por usuario (la cuenta de servicio)
+QUOTA_REQUESTS_PER_SECOND = 1.0
+QUOTA_BURST = 5
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 32.0
+
+
+class TokenBucket:
+    """Limitador token bucket: `rate` fichas por segundo con ráfagas de hasta `capacity`."""
+
+    def __init__(self, rate=QUOTA_REQUESTS_PER_SECOND, capacity=QUOTA_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloquea hasta obtener una ficha."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Ejecuta `fn()` o, si ya hay una ejecución en curso con la misma clave,
+        espera y devuelve su resultado (o relanza su excepción).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+def _status_code(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def is_retryable(error):
+    """True para cuota excedida (429), errores 5xx y fallos de red transitorios."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    return _status_code(error) in RETRY_STATUS_CODES
+
+
+def call_with_retry(func, *args, max_retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY, **kwargs):
+    """
+    Ejecuta `func(*args, **kwargs)` reintentando con backoff exponencial
+    (1s, 2s, 4s... hasta `max_delay`, con jitter) cuando el error es reintentable.
+    Los errores no reintentables, o el último error tras agotar los reintentos, se relanzan.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            print(f"API de Google ocupada ({_status_code(e) or type(e).__name__}), reintentando en {delay:.1f}s...")
+            time.sleep(delay)
+            attempt += 1
+
+
+# Instancias compartidas por todas las sesiones del proceso
+quota_bucket = TokenBucket()
+inflight_requests = SingleFlight()
@@ -1,4 +1,4 @@
-from google_sheets_client import GoogleSheetsClient
+from google_sheets_client import get_shared_client
 import json
 
 def main():
@@ -13,7 +13,7 @@ def main():
     
     try:
         # Inicializar cliente
-        client = GoogleSheetsClient(CREDENTIALS_FILE)
+        client = get_shared_client(CREDENTIALS_FILE)
         
         # SOLICITAR AL USUARIO: Nombre de la hoja o URL
         # Se ha establecido un valor por defecto basado en la solicitud del usuario
@@ -0,0 +1,98 @@
+"""
+Exportación de DataFrames bajo demanda.
+Los archivos se generan solo cuando el usuario los pide, escribiendo por
+bloques (sin armar el texto completo del CSV en memoria) y se cachean por
+la huella de los filtros, de modo que repetir una exportación es inmediato.
+"""
+import gzip
+import hashlib
+import importlib.util
+import tempfile
+
+import streamlit as st
+
+# Filas por bloque al escribir CSV
+CSV_CHUNK_ROWS = 50000
+
+# Archivos más grandes que esto se escriben a disco temporal mientras se generan
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+# Formato -> (extensión, tipo MIME)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV comprimido (.gz)': ('csv.gz', 'application/gzip'),
+    'Excel (.xlsx)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'Parquet': ('parquet', 'application/octet-stream'),
+}
+
+
+def available_formats():
+    """Formatos disponibles en este entorno (Excel requiere openpyxl y Parquet pyarrow, ambos opcionales)."""
+    formats = ['CSV', 'CSV comprimido (.gz)']
+    if importlib.util.find_spec('openpyxl') is not None:
+        formats.append('Excel (.xlsx)')
+    if importlib.util.find_spec('pyarrow') is not None:
+        formats.append('Parquet')
+    return formats
+
+
+def filter_fingerprint(*parts):
+    """Huella estable de una consulta (versión de datos, filtros, búsqueda, orden...)."""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def iter_csv_chunks(df, encoding='utf-8', chunk_rows=CSV_CHUNK_ROWS):
+    """Genera el CSV de `df` por bloques de `chunk_rows` filas (bytes ya codificados)."""
+    # La marca BOM de utf-8-sig va solo al inicio del archivo, no en cada bloque
+    chunk_encoding = 'utf-8' if encoding == 'utf-8-sig' else encoding
+    if encoding == 'utf-8-sig':
+        yield '\ufeff'.encode('utf-8')
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=(start == 0)).encode(chunk_encoding, 'replace')
+
+
+def write_export(df, fmt, fileobj, encoding='utf-8'):
+    """Escribe `df` en `fileobj` (binario) en el formato indicado."""
+    if fmt == 'CSV':
+        for chunk in iter_csv_chunks(df, encoding):
+            fileobj.write(chunk)
+    elif fmt == 'CSV comprimido (.gz)':
+        with gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=6) as gz:
+            for chunk in iter_csv_chunks(df, encoding):
+                gz.write(chunk)
+    elif fmt == 'Excel (.xlsx)':
+        df.to_excel(fileobj, index=False, engine='openpyxl')
+    elif fmt == 'Parquet':
+        df.to_parquet(fileobj, index=False)
+    else:
+        raise ValueError(f"Formato de exportación no soportado: {fmt}")
+
+
+def export_dataframe(df, fmt='CSV', encoding='utf-8'):
+    """Genera el archivo completo y devuelve sus bytes."""
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as tmp:
+        write_export(df, fmt, tmp, encoding)
+        tmp.seek(0)
+        return tmp.read()
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def export_cached(fingerprint, fmt, _rows, encoding='utf-8'):
+    """
+    `export_dataframe` memorizado por huella de filtros y formato.
+    `_rows` (DataFrame o función sin argumentos que lo devuelve) no se hashea:
+    la huella debe identificar de forma única su contenido. Si es una función,
+    solo se llama cuando la huella no está en caché.
+    """
+    df = _rows() if callable(_rows) else _rows
+    return export_dataframe(df, fmt, encoding)
+
+
+def export_filename(stem, fmt):
+    ext, _ = EXPORT_FORMATS[fmt]
+    return f"{stem}.{ext}"
+
+
+def export_mime(fmt):
+    return EXPORT_FORMATS[fmt][1]
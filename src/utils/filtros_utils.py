@@ -0,0 +1,212 @@
+"""
+Índices de filtrado en memoria para los módulos del dashboard.
+Se construyen una vez por versión de los datos y permiten filtrar por
+valores de varias columnas intersectando posiciones de fila precalculadas,
+sin recorrer columnas completas ni copiar el DataFrame en cada rerun.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Selecciones recientes cuyo resultado (posiciones) se reutiliza
+MAX_CACHED_SELECTIONS = 64
+
+
+class FilterIndex:
+    """
+    Índice por valor para un conjunto de columnas de un DataFrame.
+
+    Para cada columna guarda los códigos de cada fila (pd.factorize, -1 para
+    nulos) y, por valor, las posiciones de fila ordenadas. Una selección
+    {columna: valores} se resuelve partiendo de la columna más selectiva y
+    descartando candidatos con las demás, en O(filas candidatas).
+
+    El índice y el DataFrame se comparten entre sesiones: no deben mutarse.
+    `version` identifica los datos indexados (p. ej. para cachear exportaciones).
+    """
+
+    def __init__(self, df, columns, version=None):
+        self.df = df
+        self.version = version
+        self.n_rows = len(df)
+        self.columns = [c for c in columns if c in df.columns]
+        self._codes = {}
+        self._code_of = {}
+        self._uniques = {}
+        self._order = {}
+        self._bounds = {}
+        self._has_na = {}
+        for col in self.columns:
+            try:
+                codes, uniques = pd.factorize(df[col], sort=True)
+            except TypeError:
+                # Tipos mezclados (p. ej. números y textos): orden por representación de texto
+                codes, uniques = pd.factorize(df[col].astype(str).where(df[col].notna()), sort=True)
+            codes = codes.astype(np.int32, copy=False)
+            # Posiciones agrupadas por código: order[bounds[c]:bounds[c+1]] son las filas del código c
+            order = np.argsort(codes, kind='stable').astype(np.int32, copy=False)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            n_na = int((codes < 0).sum())
+            self._codes[col] = codes
+            self._uniques[col] = uniques
+            self._code_of[col] = {v: i for i, v in enumerate(uniques)}
+            self._order[col] = order[n_na:]
+            self._bounds[col] = np.concatenate(([0], np.cumsum(counts)))
+            self._has_na[col] = n_na > 0
+        self._search_text = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def values(self, col):
+        """Valores distintos no nulos de `col`, ordenados."""
+        return list(self._uniques[col]) if col in self._uniques else []
+
+    def positions(self, col, value):
+        """Posiciones (ordenadas) de las filas con `col == value`."""
+        code = self._code_of.get(col, {}).get(value)
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        bounds = self._bounds[col]
+        return self._order[col][bounds[code]:bounds[code + 1]]
+
+    def count(self, col, value):
+        code = self._code_of.get(col, {}).get(value)
+        if code is None:
+            return 0
+        bounds = self._bounds[col]
+        return int(bounds[code + 1] - bounds[code])
+
+    def select(self, selections):
+        """
+        Posiciones de las filas que cumplen todas las selecciones.
+
+        Args:
+            selections (dict): columna -> valores permitidos. Una lista vacía
+                (o una columna no indexada) no filtra, igual que en los módulos.
+
+        Returns:
+            np.ndarray | None: posiciones ordenadas, o None si ningún filtro
+            restringe filas (todas las filas cumplen).
+        """
+        key = self._selection_key(selections)
+        return self._memoized(('select', key), lambda: self._select(key))
+
+    def _selection_key(self, selections):
+        return tuple(sorted(
+            (col, frozenset(vals)) for col, vals in selections.items()
+            if col in self._codes and vals
+        ))
+
+    def _memoized(self, key, compute):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        result = compute()
+
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > MAX_CACHED_SELECTIONS:
+                self._cache.popitem(last=False)
+        return result
+
+    def _select(self, key):
+        filters = []
+        for col, vals in key:
+            codes = sorted({self._code_of[col][v] for v in vals if v in self._code_of[col]})
+            if len(codes) == len(self._uniques[col]) and not self._has_na[col]:
+                continue  # Selección completa sin nulos: no descarta filas
+            bounds = self._bounds[col]
+            n_selected = int(sum(bounds[c + 1] - bounds[c] for c in codes))
+            filters.append((n_selected, col, codes))
+
+        if not filters:
+            return None
+
+        # Columna más selectiva primero
+        filters.sort(key=lambda f: f[0])
+        n_selected, col, codes = filters[0]
+        if n_selected == 0:
+            return np.empty(0, dtype=np.int32)
+
+        if n_selected > self.n_rows // 8:
+            # Selección amplia: bitmap por tabla de búsqueda sobre los códigos de todas las filas
+            mask = self._lookup(col, codes)[self._codes[col]]
+            for _, col, codes in filters[1:]:
+                mask &= self._lookup(col, codes)[self._codes[col]]
+            return np.flatnonzero(mask).astype(np.int32, copy=False)
+
+        # Selección estrecha: sus posiciones son los candidatos iniciales
+        bounds, order = self._bounds[col], self._order[col]
+        candidates = np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in codes]))
+
+        # El resto de columnas solo se evalúa sobre los candidatos
+        for _, col, codes in filters[1:]:
+            candidates = candidates[self._lookup(col, codes)[self._codes[col][candidates]]]
+        return candidates
+
+    def _lookup(self, col, codes):
+        """Tabla código -> seleccionado; la última posición cubre el código -1 (nulos)."""
+        lookup = np.zeros(len(self._uniques[col]) + 1, dtype=bool)
+        lookup[codes] = True
+        return lookup
+
+    def query(self, selections, search='', sort_by=None, ascending=True):
+        """
+        Posiciones de las filas que cumplen filtros y búsqueda, en el orden pedido.
+        El resultado se memoriza: cambiar de página solo recorta este arreglo.
+
+        Args:
+            selections (dict): filtros por columna (ver `select`).
+            search (str): texto a buscar en cualquier columna de texto (sin distinguir mayúsculas).
+            sort_by (str): columna de orden (None conserva el orden original).
+            ascending (bool): sentido del orden; los nulos van siempre al final.
+
+        Returns:
+            np.ndarray: posiciones de fila.
+        """
+        search = (search or '').strip().upper()
+        if sort_by not in self.df.columns:
+            sort_by = None
+        key = ('query', self._selection_key(selections), search, sort_by, ascending)
+        return self._memoized(key, lambda: self._query(selections, search, sort_by, ascending))
+
+    def _query(self, selections, search, sort_by, ascending):
+        positions = self.select(selections)
+        if positions is None:
+            positions = np.arange(self.n_rows, dtype=np.int32)
+
+        if search:
+            matches = pd.Series(self._get_search_text()[positions]).str.contains(search, regex=False, na=False)
+            positions = positions[matches.to_numpy()]
+
+        if sort_by is not None and len(positions) > 1:
+            values = self.df[sort_by].iloc[positions].reset_index(drop=True)
+            try:
+                ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last')
+            except TypeError:
+                ordered = values.sort_values(ascending=ascending, kind='stable', na_position='last', key=lambda v: v.astype(str))
+            positions = positions[ordered.index.to_numpy()]
+        return positions
+
+    def _get_search_text(self):
+        """Texto de búsqueda por fila (columnas de texto unidas, en mayúsculas); se arma en la primera búsqueda."""
+        with self._lock:
+            if self._search_text is None:
+                text_cols = [c for c in self.df.columns
+                             if pd.api.types.is_object_dtype(self.df[c]) or pd.api.types.is_string_dtype(self.df[c])]
+                text = pd.Series('', index=self.df.index, dtype=object)
+                for col in text_cols:
+                    text = text + ' | ' + self.df[col].fillna('').astype(str)
+                self._search_text = text.str.upper().to_numpy(dtype=object)
+            return self._search_text
+
+    def take(self, selections):
+        """DataFrame filtrado; sin filtros activos devuelve el DataFrame original (sin copia)."""
+        positions = self.select(selections)
+        if positions is None:
+            return self.df
+        return self.df.iloc[positions]
@@ -0,0 +1,335 @@
+"""
+Almacén SQLite del histórico de trazabilidad y capa de consultas.
+La tabla se escribe tipada (fechas ISO, enteros, reales) e indexada por año,
+EPS, municipio, profesional, cédula y tipo de terapia; el módulo histórico
+pide a la base los filtros y las agregaciones (KPIs, series, rankings) en vez
+de cargar todas las filas en memoria.
+"""
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.terapias_utils import THERAPY_CODE_COL
+
+HISTORICAL_DB_PATH = os.path.join('data', 'processed', 'trazabilidad.db')
+HISTORICAL_TABLE = 'trazabilidad'
+
+# Esquema tipado: columnas del DataFrame de load_historical_data_json + derivadas de la fecha
+HISTORICAL_SCHEMA = [
+    ('NOMBRES', 'TEXT'),
+    ('APELLIDOS', 'TEXT'),
+    ('TIPO_ID', 'TEXT'),
+    ('CEDULA', 'TEXT'),
+    ('EPS', 'TEXT'),
+    ('MUNICIPIO', 'TEXT'),
+    ('DIRECCION', 'TEXT'),
+    ('TELEFONO', 'TEXT'),
+    ('DIAGNOSTICO', 'TEXT'),
+    ('PROFESIONAL', 'TEXT'),
+    ('TIPO_TERAPIA', 'TEXT'),
+    (THERAPY_CODE_COL, 'TEXT'),
+    ('CANTIDAD', 'REAL'),
+    ('FECHA_INICIO', 'TEXT'),   # ISO 8601 (AAAA-MM-DD)
+    ('FECHA_EGRESO', 'TEXT'),
+    ('AÑO_DATA', 'INTEGER'),
+    ('MES', 'INTEGER'),         # mes de FECHA_INICIO
+    ('PERIODO', 'TEXT'),        # AAAA-MM de FECHA_INICIO
+    ('OBSERVACIONES', 'TEXT'),
+    ('ORIGEN_ARCHIVO', 'TEXT'),
+    ('ORIGEN_HOJA', 'TEXT'),
+]
+SCHEMA_COLUMNS = [c for c, _ in HISTORICAL_SCHEMA]
+
+# Columnas derivadas solo para agrupar en SQL (no se devuelven en `rows`)
+DERIVED_COLUMNS = ['MES', 'PERIODO']
+
+HISTORICAL_INDEXES = {
+    'idx_anio': ['AÑO_DATA'],
+    'idx_eps': ['EPS'],
+    'idx_municipio': ['MUNICIPIO'],
+    'idx_profesional': ['PROFESIONAL'],
+    'idx_cedula': ['CEDULA'],
+    'idx_terapia': ['TIPO_TERAPIA'],
+}
+
+# Métricas de las agregaciones: columna de salida -> expresión SQL
+METRICS = {
+    'Registros': 'COUNT(*)',
+    'Sesiones': 'COALESCE(SUM("CANTIDAD"), 0)',
+    'Pacientes': 'COUNT(DISTINCT "CEDULA")',
+    'Profesionales': 'COUNT(DISTINCT "PROFESIONAL")',
+    'Municipios': 'COUNT(DISTINCT "MUNICIPIO")',
+    'EPS_Atendidas': 'COUNT(DISTINCT "EPS")',
+    'Tipos_Terapia': 'COUNT(DISTINCT "TIPO_TERAPIA")',
+}
+
+# Agrupaciones derivadas (además de las columnas del esquema)
+GROUP_EXPRESSIONS = {
+    'DIA': 'CAST(strftime(\'%d\', "FECHA_INICIO") AS INTEGER)',
+}
+
+# Resultados de consultas recientes que se reutilizan entre reruns
+MAX_CACHED_QUERIES = 256
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _text_values(series):
+    """Texto para la base, calculado una vez por valor distinto: nulos/vacíos -> None, 123.0 -> '123'."""
+    codes, uniques = pd.factorize(series)
+
+    def to_text(value):
+        if isinstance(value, float):
+            if np.isnan(value):
+                return None
+            if value.is_integer():
+                return str(int(value))
+        text = str(value).strip()
+        return text or None
+
+    lookup = np.array([to_text(v) for v in uniques] + [None], dtype=object)
+    return lookup[codes].tolist()
+
+
+def _nullable(values):
+    """Lista de escalares de Python con None en lugar de nulos (sqlite3 no acepta numpy ni pd.NA)."""
+    return [None if pd.isna(v) else v for v in values.astype(object).tolist()]
+
+
+def historical_columns(df):
+    """Valores de cada columna del esquema, ya tipados para SQLite, desde el DataFrame del histórico."""
+    n_rows = len(df)
+    if 'FECHA_INICIO' in df.columns:
+        fechas = pd.to_datetime(df['FECHA_INICIO'], errors='coerce')
+    else:
+        fechas = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+
+    columns = {}
+    for col, sql_type in HISTORICAL_SCHEMA:
+        if col == 'MES':
+            columns[col] = _nullable(fechas.dt.month.astype('Int64'))
+        elif col == 'PERIODO':
+            columns[col] = _nullable(fechas.dt.strftime('%Y-%m'))
+        elif col not in df.columns:
+            columns[col] = [None] * n_rows
+        elif col in ('FECHA_INICIO', 'FECHA_EGRESO'):
+            columns[col] = _nullable(pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d'))
+        elif sql_type == 'REAL':
+            columns[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(float).tolist()
+        elif sql_type == 'INTEGER':
+            columns[col] = _nullable(pd.to_numeric(df[col], errors='coerce').astype('Int64'))
+        else:
+            columns[col] = _text_values(df[col])
+    return columns
+
+
+def write_historical_db(df, db_path=HISTORICAL_DB_PATH, source=None, source_version=None):
+    """
+    Escribe el histórico en una base SQLite nueva (tabla tipada, índices y
+    metadatos de origen) y la publica reemplazando la anterior de forma atómica.
+
+    Args:
+        df (DataFrame): histórico preparado (salida de read_historical_data_json).
+        source (str): ruta del JSON de origen, para saber si la base está al día.
+        source_version: versión del origen (get_path_version) al construir.
+    """
+    directory = os.path.dirname(db_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=directory)
+    os.close(fd)
+
+    columns = historical_columns(df)
+    strict = ' STRICT' if sqlite3.sqlite_version_info >= (3, 37, 0) else ''
+    try:
+        with closing(sqlite3.connect(tmp_path)) as conn:
+            conn.execute('PRAGMA journal_mode=OFF')
+            conn.execute('PRAGMA synchronous=OFF')
+            column_defs = ', '.join(f"{_quote(c)} {t}" for c, t in HISTORICAL_SCHEMA)
+            conn.execute(f"CREATE TABLE {HISTORICAL_TABLE} (id INTEGER PRIMARY KEY, {column_defs}){strict}")
+            conn.executemany(
+                f"INSERT INTO {HISTORICAL_TABLE} ({', '.join(_quote(c) for c in SCHEMA_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(SCHEMA_COLUMNS))})",
+                zip(*(columns[c] for c in SCHEMA_COLUMNS))
+            )
+            for name, cols in HISTORICAL_INDEXES.items():
+                conn.execute(f"CREATE INDEX {name} ON {HISTORICAL_TABLE} ({', '.join(_quote(c) for c in cols)})")
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('source', os.path.normpath(source) if source else ''),
+                ('source_version', '' if source_version is None else repr(source_version)),
+                ('built_at', datetime.now().isoformat(timespec='seconds')),
+                ('rows', str(len(df))),
+                # Columnas (y orden) del DataFrame de origen, para que `rows` devuelva las mismas
+                ('columns', json.dumps([c for c in df.columns if c in SCHEMA_COLUMNS], ensure_ascii=False)),
+            ])
+            conn.execute('ANALYZE')
+            conn.commit()
+        os.replace(tmp_path, db_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return db_path
+
+
+def read_db_meta(db_path=HISTORICAL_DB_PATH):
+    """Metadatos de la base (origen, versión, fecha de construcción), o {} si no existe o no es válida."""
+    if not os.path.exists(db_path):
+        return {}
+    try:
+        with closing(sqlite3.connect(Path(db_path).absolute().as_uri() + '?mode=ro', uri=True)) as conn:
+            return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    except sqlite3.Error:
+        return {}
+
+
+def historical_db_is_current(db_path, source, source_version):
+    """True si la base existe y se construyó desde `source` en su versión actual."""
+    meta = read_db_meta(db_path)
+    # Las bases sin lista de columnas (formato anterior) se reconstruyen
+    return ('columns' in meta
+            and meta.get('source') == os.path.normpath(source)
+            and meta.get('source_version') == repr(source_version))
+
+
+class HistoricalStore:
+    """
+    Consultas sobre la base SQLite del histórico.
+
+    Los filtros son {columna: valores} con la semántica de FilterIndex.select:
+    una lista vacía no filtra y una selección completa (en una columna sin
+    nulos) tampoco. Las agregaciones se memorizan por consulta y se comparten
+    entre sesiones: los DataFrames devueltos no deben mutarse.
+    """
+
+    def __init__(self, db_path=HISTORICAL_DB_PATH):
+        self.db_path = db_path
+        self.meta = read_db_meta(db_path)
+        self.version = f"{db_path}|{self.meta.get('built_at', '')}"
+        self._uri = Path(db_path).absolute().as_uri() + '?mode=ro'
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Una conexión de solo lectura por consulta: sqlite3 no comparte conexiones entre hilos
+        return closing(sqlite3.connect(self._uri, uri=True))
+
+    def _read(self, sql, params=(), memoize=True):
+        key = (sql, tuple(params))
+        if memoize:
+            with self._lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    return self._cache[key]
+
+        with self._connect() as conn:
+            result = pd.read_sql_query(sql, conn, params=list(params))
+
+        if memoize:
+            with self._lock:
+                self._cache[key] = result
+                if len(self._cache) > MAX_CACHED_QUERIES:
+                    self._cache.popitem(last=False)
+        return result
+
+    def is_empty(self):
+        return self._read(f"SELECT EXISTS (SELECT 1 FROM {HISTORICAL_TABLE}) AS n")['n'].iloc[0] == 0
+
+    def values(self, col, filters=None):
+        """Valores distintos no nulos de `col` (en las filas filtradas), ordenados."""
+        where, params = self._where(filters, [f"{_quote(col)} IS NOT NULL"])
+        sql = f"SELECT DISTINCT {_quote(col)} AS v FROM {HISTORICAL_TABLE}{where} ORDER BY 1"
+        return self._read(sql, params)['v'].tolist()
+
+    def _has_nulls(self, col):
+        sql = f"SELECT EXISTS (SELECT 1 FROM {HISTORICAL_TABLE} WHERE {_quote(col)} IS NULL) AS n"
+        return bool(self._read(sql)['n'].iloc[0])
+
+    def _where(self, filters, conditions=()):
+        """Cláusula WHERE y parámetros para los filtros (más condiciones SQL fijas)."""
+        clauses, params = list(conditions), []
+        for col, vals in sorted((filters or {}).items()):
+            if col not in SCHEMA_COLUMNS or not vals:
+                continue
+            vals = list(dict.fromkeys(v.item() if isinstance(v, np.generic) else v for v in vals))
+            available = self.values(col)
+            if len(available) == len(set(vals) & set(available)) and not self._has_nulls(col):
+                continue  # Selección completa sin nulos: no descarta filas
+            clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(vals))})")
+            params.extend(vals)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def aggregate(self, filters, metrics, by=None, order_by=None, ascending=False, limit=None):
+        """
+        Métricas (claves de METRICS) sobre las filas filtradas.
+
+        Args:
+            by (str): columna del esquema o clave de GROUP_EXPRESSIONS; None para totales.
+                Como en pandas, las filas con `by` nulo no forman grupo.
+            order_by (str): columna de salida por la que ordenar (por defecto `by`).
+            limit (int): máximo de grupos (p. ej. top 10).
+
+        Returns:
+            DataFrame: una fila por grupo (o una sola fila de totales) con `by` y las métricas.
+        """
+        select = [f"{METRICS[m]} AS {_quote(m)}" for m in metrics]
+        if by is None:
+            where, params = self._where(filters)
+            return self._read(f"SELECT {', '.join(select)} FROM {HISTORICAL_TABLE}{where}", params)
+
+        expr = GROUP_EXPRESSIONS.get(by, _quote(by))
+        where, params = self._where(filters, [f"{expr} IS NOT NULL"])
+        order = _quote(order_by or by)
+        sql = (f"SELECT {expr} AS {_quote(by)}, {', '.join(select)} FROM {HISTORICAL_TABLE}{where} "
+               f"GROUP BY 1 ORDER BY {order} {'ASC' if ascending else 'DESC'}, 1")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._read(sql, params)
+
+    def totals(self, filters, metrics):
+        """Métricas totales de las filas filtradas como dict (0 si no hay filas)."""
+        # Por columna (no .iloc[0]) para que los conteos sigan siendo enteros
+        result = self.aggregate(filters, metrics)
+        return {m: (0 if pd.isna(result[m].iat[0]) else result[m].iat[0].item()) for m in metrics}
+
+    def returning_patients(self, filters):
+        """Pacientes (cédulas) que aparecen en más de un año dentro de las filas filtradas."""
+        where, params = self._where(filters, ['"CEDULA" IS NOT NULL'])
+        sql = (f"SELECT COUNT(*) AS n FROM (SELECT \"CEDULA\" FROM {HISTORICAL_TABLE}{where} "
+               f"GROUP BY \"CEDULA\" HAVING COUNT(DISTINCT \"AÑO_DATA\") > 1)")
+        return int(self._read(sql, params)['n'].iloc[0])
+
+    def rows(self, filters=None, limit=None):
+        """
+        Filas filtradas con las columnas y los tipos del DataFrame de origen
+        (fechas, CANTIDAD, THERAPY_CODE categórico). Solo para exportar o ver
+        detalle: no se memorizan.
+        """
+        where, params = self._where(filters)
+        if 'columns' in self.meta:
+            columns = json.loads(self.meta['columns'])
+        else:
+            columns = [c for c in SCHEMA_COLUMNS if c not in DERIVED_COLUMNS]
+        sql = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {HISTORICAL_TABLE}{where} ORDER BY id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        df = self._read(sql, params, memoize=False)
+        for col in ('FECHA_INICIO', 'FECHA_EGRESO'):
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+        if 'CANTIDAD' in df.columns and df['CANTIDAD'].mod(1).eq(0).all():
+            # Como pd.to_numeric en el origen: enteros si no hay sesiones fraccionarias
+            df['CANTIDAD'] = df['CANTIDAD'].astype('int64')
+        if THERAPY_CODE_COL in df.columns:
+            df[THERAPY_CODE_COL] = df[THERAPY_CODE_COL].astype('category')
+        return df
@@ -0,0 +1,95 @@
+import os
+import re
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.core.profiling import timed
+
+# Tabla de alias: nombre canónico -> lista de patrones (regex sobre el nombre en mayúsculas)
+ALIAS_PATH = os.path.join('data', 'reference', 'alias_profesionales.json')
+
+# Respaldo si la tabla no existe (p. ej. al ejecutar desde otra carpeta)
+DEFAULT_ALIASES = {
+    'YERIS APONTE': [r'YERIS\s+APONTE', r'DR\.?\s*YERIS'],
+}
+
+
+class ProfessionalAliasResolver:
+    """
+    Unifica variantes de nombres de profesionales a su nombre canónico.
+
+    Todos los patrones de la tabla se compilan en una sola expresión regular
+    con un grupo nombrado por canónico, de modo que cada nombre se evalúa en
+    una sola pasada sin importar cuántos alias haya. Si varios alias coinciden,
+    gana la coincidencia más a la izquierda del nombre.
+    """
+
+    def __init__(self, aliases):
+        self.canonicals = list(aliases)
+        groups = [
+            f"(?P<a{i}>{'|'.join(f'(?:{p})' for p in patterns)})"
+            for i, patterns in enumerate(aliases.values()) if patterns
+        ]
+        self._pattern = re.compile('|'.join(groups)) if groups else None
+
+    def resolve(self, name):
+        """Nombre canónico para `name` (ya en mayúsculas y sin espacios extremos), o `name` si no es alias."""
+        if self._pattern is None or not isinstance(name, str):
+            return name
+        m = self._pattern.search(name)
+        if m is None:
+            return name
+        return self.canonicals[int(m.lastgroup[1:])]
+
+    def resolve_series(self, series):
+        """
+        Estandariza (mayúsculas, sin espacios extremos) y resuelve alias de una columna
+        trabajando solo sobre los valores distintos. Devuelve una Serie nueva con el mismo índice.
+        """
+        codes, uniques = pd.factorize(series)
+        resolved = np.array([self.resolve(str(v).strip().upper()) for v in uniques] + [np.nan], dtype=object)
+        # El código -1 (nulos) apunta al NaN agregado al final
+        return pd.Series(resolved[codes], index=series.index, name=series.name)
+
+
+def load_professional_aliases(path=ALIAS_PATH):
+    """Lee la tabla de alias (JSON canónico -> patrones); usa DEFAULT_ALIASES si no existe."""
+    if not os.path.exists(path):
+        return dict(DEFAULT_ALIASES)
+    with open(path, 'r', encoding='utf-8') as f:
+        aliases = json.load(f)
+    return {canonical.strip().upper(): list(patterns) for canonical, patterns in aliases.items()}
+
+
+_resolver_cache = {}
+
+def get_alias_resolver(path=ALIAS_PATH):
+    """Resolver compilado para la tabla en `path`; se recompila solo si el archivo cambió."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    cached = _resolver_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, ProfessionalAliasResolver(load_professional_aliases(path)))
+        _resolver_cache[path] = cached
+    return cached[1]
+
+
+@timed()
+def normalize_data(df, resolver=None):
+    """
+    Normalización global del DataFrame (función pura).
+    - Estandariza los nombres de profesionales (mayúsculas, sin espacios extremos).
+    - Unifica las variantes conocidas según la tabla de alias (data/reference/alias_profesionales.json).
+
+    No modifica `df`: devuelve un DataFrame nuevo que comparte las columnas no
+    tocadas con el original. Se ejecuta una vez por versión de los datos en la
+    ruta de carga; el resultado se comparte entre reruns y no debe mutarse.
+    """
+    if 'PROFESIONAL' not in df.columns:
+        return df
+
+    resolver = resolver or get_alias_resolver()
+
+    # Mayúsculas + unificación de alias: una pasada de la regex combinada por nombre distinto
+    return df.assign(PROFESIONAL=resolver.resolve_series(df['PROFESIONAL']))
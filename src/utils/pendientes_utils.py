@@ -0,0 +1,69 @@
+"""
+Backlog de eventos pendientes de autorización (pacientes sin fecha de ingreso).
+Se construye una vez por versión de los datos, junto al snapshot cargado, y
+responde los KPIs, los resúmenes por EPS/profesional y los filtros de la lista
+sin volver a recorrer ni copiar el DataFrame completo en cada interacción.
+"""
+import numpy as np
+import pandas as pd
+
+from src.utils.filtros_utils import FilterIndex
+
+# Columnas filtrables de la lista de pendientes
+BACKLOG_FILTER_COLUMNS = ['EPS', 'PROFESIONAL']
+
+
+def pending_mask(fecha_ingreso):
+    """
+    Máscara de filas sin fecha de ingreso: nulas, vacías o 'nan'.
+    La comparación de texto se hace una vez por valor distinto, no por fila.
+    """
+    codes, uniques = pd.factorize(fecha_ingreso)
+    text = pd.Series(uniques, dtype=object).astype(str)
+    is_empty = (text.str.strip() == '') | (text.str.lower() == 'nan')
+    # El código -1 (nulos) apunta al True agregado al final
+    lookup = np.append(is_empty.to_numpy(dtype=bool), True)
+    return lookup[codes]
+
+
+class PendingBacklog:
+    """
+    Filas pendientes particionadas por EPS y profesional.
+
+    Attributes:
+        df (DataFrame): solo las filas pendientes (una selección hecha al construir).
+        index (FilterIndex): índice de filtros por EPS / PROFESIONAL sobre `df`.
+        by_eps, by_professional (DataFrame): pacientes y sesiones por grupo,
+            ordenados de mayor a menor.
+
+    Como el resto de los datos cacheados, se comparte entre sesiones: no mutar.
+    """
+
+    def __init__(self, df, version=None):
+        self.version = version
+        self.positions = np.flatnonzero(pending_mask(df['FECHA DE INGRESO'])).astype(np.int32, copy=False)
+        self.df = df.iloc[self.positions]
+        self.index = FilterIndex(self.df, BACKLOG_FILTER_COLUMNS, version=version)
+
+        self.total = len(self.df)
+        self.n_eps = self.df['EPS'].nunique() if 'EPS' in self.df.columns else 0
+        self.n_professionals = self.df['PROFESIONAL'].nunique() if 'PROFESIONAL' in self.df.columns else 0
+        self.sessions = self.df['CANTIDAD'].sum() if 'CANTIDAD' in self.df.columns else 0
+
+        self.by_eps = self._summary('EPS', 'EPS')
+        self.by_professional = self._summary('PROFESIONAL', 'Profesional')
+
+    def _summary(self, col, label):
+        """Pacientes (nombres registrados) y sesiones por valor de `col`."""
+        if col not in self.df.columns or 'NOMBRE' not in self.df.columns or 'CANTIDAD' not in self.df.columns:
+            return None
+        summary = self.df.groupby(col).agg({
+            'NOMBRE': 'count',
+            'CANTIDAD': 'sum'
+        }).reset_index()
+        summary.columns = [label, 'Pacientes', 'Sesiones']
+        return summary.sort_values('Pacientes', ascending=False)
+
+    def take(self, eps=None, professionals=None):
+        """Filas pendientes filtradas por EPS y/o profesional (sin copia si no hay filtros)."""
+        return self.index.take({'EPS': eps or [], 'PROFESIONAL': professionals or []})
@@ -0,0 +1,207 @@
+"""
+Almacén de profesionales consolidados con índice de búsqueda.
+El directorio se carga una vez por versión del archivo y las búsquedas se
+responden con un índice de tokens (búsqueda por prefijo) sobre nombre,
+cédula, teléfono y municipio, sin recorrer la tabla en cada tecla.
+"""
+import os
+import re
+import json
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+from src.utils.filtros_utils import FilterIndex
+from src.utils.normalizacion_utils import get_alias_resolver
+
+PROFESSIONALS_PATH = os.path.join('data', 'reference', 'profesionales_consolidados.json')
+
+# Campos indexados para la búsqueda del directorio
+SEARCH_COLUMNS = ['NOMBRE PROFESIONAL', 'CEDULA', 'TEL CONTACTO', 'MUNICIPIO']
+
+_TOKEN_RE = re.compile(r'[A-Z0-9]+')
+
+
+def search_tokens(value):
+    """Tokens normalizados de un texto: sin tildes, en mayúsculas, solo letras y dígitos."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return _TOKEN_RE.findall(unidecode(str(value)).upper())
+
+
+def _index_tokens(value):
+    """Tokens a indexar: los del texto más los dígitos unidos ('300 123 45' -> '30012345')."""
+    tokens = search_tokens(value)
+    digits = ''.join(t for t in tokens if t.isdigit())
+    if len(tokens) > 1 and digits:
+        tokens.append(digits)
+    return tokens
+
+
+class ProfessionalSearchIndex:
+    """
+    Índice invertido token -> filas, con los tokens ordenados para buscar por prefijo.
+    Una consulta con varios términos devuelve las filas que tienen, para cada
+    término, algún token que empiece por él (en cualquiera de los campos indexados).
+    """
+
+    def __init__(self, df, columns=SEARCH_COLUMNS):
+        postings = defaultdict(list)
+        for col in [c for c in columns if c in df.columns]:
+            codes, uniques = pd.factorize(df[col])
+            tokens_by_code = [_index_tokens(v) for v in uniques]
+            for row, code in enumerate(codes):
+                if code >= 0:
+                    for token in tokens_by_code[code]:
+                        postings[token].append(row)
+        self.tokens = sorted(postings)
+        self._rows = [np.unique(np.array(postings[t], dtype=np.int32)) for t in self.tokens]
+
+    def prefix_rows(self, prefix):
+        """Filas (ordenadas) con algún token que empieza por `prefix`."""
+        lo = bisect_left(self.tokens, prefix)
+        hi = bisect_left(self.tokens, prefix + '\uffff')
+        if lo == hi:
+            return np.empty(0, dtype=np.int32)
+        if hi - lo == 1:
+            return self._rows[lo]
+        return np.unique(np.concatenate(self._rows[lo:hi]))
+
+    def search(self, query):
+        """Posiciones de las filas que cumplen todos los términos, o None si la consulta no tiene términos."""
+        result = None
+        for term in search_tokens(query):
+            rows = self.prefix_rows(term)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+
+
+class ProfessionalsStore:
+    """
+    Directorio de profesionales consolidados listo para consultar: DataFrame,
+    índice de búsqueda y filtro por municipio. Se comparte entre sesiones: no mutar.
+    """
+
+    def __init__(self, df, version=None):
+        self.df = df
+        self.version = version
+        self.search_index = ProfessionalSearchIndex(df)
+        self.filter_index = FilterIndex(df, ['MUNICIPIO'])
+
+    def positions(self, search='', municipio=None):
+        """Posiciones de los profesionales que cumplen búsqueda y municipio, o None si no hay filtros."""
+        positions = self.search_index.search(search)
+        if municipio is not None:
+            in_mun = self.filter_index.positions('MUNICIPIO', municipio)
+            positions = in_mun if positions is None else np.intersect1d(positions, in_mun, assume_unique=True)
+        return positions
+
+    def query(self, search='', municipio=None):
+        """DataFrame filtrado por búsqueda y municipio (sin copia si no hay filtros)."""
+        positions = self.positions(search, municipio)
+        if positions is None:
+            return self.df
+        return self.df.iloc[positions]
+
+
+def read_professionals(path=PROFESSIONALS_PATH):
+    """Lee el JSON de profesionales consolidados (generado por consolidar_profesionales.py)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return pd.DataFrame(data)
+
+
+# Columnas de carga agregadas al directorio
+WORKLOAD_COLUMNS = ['PACIENTES', 'SESIONES', 'EPS ATENDIDAS', 'MUNICIPIOS ATENDIDOS']
+
+
+def professional_key(name, resolver=None):
+    """
+    Clave de cruce de un nombre de profesional: alias resuelto (misma tabla que
+    normalize_data), sin tildes y con un solo espacio entre palabras.
+    """
+    if name is None or (isinstance(name, float) and np.isnan(name)):
+        return None
+    resolver = resolver or get_alias_resolver()
+    tokens = search_tokens(resolver.resolve(str(name).strip().upper()))
+    return ' '.join(tokens) or None
+
+
+def _keys_for(series, resolver):
+    """Claves de cruce de una columna de nombres, calculadas una vez por valor distinto."""
+    codes, uniques = pd.factorize(series)
+    keys = np.array([professional_key(v, resolver) for v in uniques] + [None], dtype=object)
+    return pd.Series(keys[codes], index=series.index)
+
+
+class ProfessionalWorkload:
+    """
+    Cruce directorio de profesionales <-> filas de pacientes, calculado una vez.
+
+    Los pacientes se asocian al profesional por nombre normalizado (las filas
+    de pacientes no traen la cédula del profesional).
+
+    Attributes:
+        table (DataFrame): el directorio (mismo orden e índice) con WORKLOAD_COLUMNS:
+            filas asignadas, sesiones, mezcla de EPS y municipios atendidos.
+    """
+
+    def __init__(self, df_profs, df_patients):
+        resolver = get_alias_resolver()
+        self.df_patients = df_patients
+
+        if df_patients is not None and 'PROFESIONAL' in df_patients.columns:
+            patient_keys = _keys_for(df_patients['PROFESIONAL'], resolver)
+            self._rows = pd.Series(np.arange(len(df_patients)), index=df_patients.index).groupby(patient_keys.values).indices
+            stats = self._aggregate(df_patients, patient_keys)
+        else:
+            self._rows = {}
+            stats = pd.DataFrame(columns=WORKLOAD_COLUMNS)
+
+        if 'NOMBRE PROFESIONAL' in df_profs.columns:
+            self._dir_keys = _keys_for(df_profs['NOMBRE PROFESIONAL'], resolver)
+        else:
+            self._dir_keys = pd.Series(None, index=df_profs.index, dtype=object)
+        joined = stats.reindex(self._dir_keys.values)
+        self.table = df_profs.assign(**{
+            'PACIENTES': joined['PACIENTES'].fillna(0).astype(int).values,
+            'SESIONES': joined['SESIONES'].fillna(0).astype(int).values,
+            'EPS ATENDIDAS': joined['EPS ATENDIDAS'].fillna('').values,
+            'MUNICIPIOS ATENDIDOS': joined['MUNICIPIOS ATENDIDOS'].fillna('').values,
+        })
+
+    @staticmethod
+    def _aggregate(df_patients, patient_keys):
+        """Filas, sesiones, EPS (con conteo) y municipios por clave de profesional."""
+        frame = pd.DataFrame({'KEY': patient_keys.values}, index=df_patients.index)
+        frame['CANTIDAD'] = (pd.to_numeric(df_patients['CANTIDAD'], errors='coerce').fillna(0)
+                             if 'CANTIDAD' in df_patients.columns else 0)
+        stats = frame.groupby('KEY').agg(PACIENTES=('KEY', 'size'), SESIONES=('CANTIDAD', 'sum'))
+
+        stats['EPS ATENDIDAS'] = ''
+        if 'EPS' in df_patients.columns:
+            eps_counts = frame.assign(EPS=df_patients['EPS']).groupby(['KEY', 'EPS']).size()
+            eps_counts = eps_counts.sort_values(ascending=False, kind='stable')
+            stats['EPS ATENDIDAS'] = eps_counts.groupby(level='KEY').agg(
+                lambda s: ', '.join(f"{eps} ({n})" for (_, eps), n in s.items())
+            )
+
+        stats['MUNICIPIOS ATENDIDOS'] = ''
+        if 'MUNICIPIO' in df_patients.columns:
+            municipios = frame.assign(MUNICIPIO=df_patients['MUNICIPIO']).dropna(subset=['MUNICIPIO'])
+            stats['MUNICIPIOS ATENDIDOS'] = municipios.groupby('KEY')['MUNICIPIO'].agg(
+                lambda s: ', '.join(sorted(s.astype(str).unique()))
+            )
+        return stats
+
+    def patients(self, name):
+        """Filas de pacientes asignadas al profesional `name` (cualquier variante de su nombre)."""
+        positions = self._rows.get(professional_key(name))
+        if positions is None or self.df_patients is None:
+            return None if self.df_patients is None else self.df_patients.iloc[0:0]
+        return self.df_patients.iloc[positions]
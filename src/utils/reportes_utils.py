@@ -0,0 +1,353 @@
+"""
+Utilidades de reportes PDF con gráficos de matplotlib.
+Los gráficos se rasterizan en memoria (BytesIO) a la resolución de impresión,
+en paralelo en un pool de procesos, y se insertan en el PDF con FPDF.image.
+"""
+import io
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import matplotlib.pyplot as plt
+from PIL import Image
+from fpdf import FPDF
+
+from src.core.profiling import timed
+from src.utils.terapias_utils import get_therapy_codes
+
+# Resolución efectiva del gráfico una vez impreso en la página
+PRINT_DPI = 200
+
+
+def figure_to_png_bytes(fig, print_width_mm, print_dpi=PRINT_DPI):
+    """
+    Renderiza una figura a PNG en memoria y la cierra siempre (incluso si falla).
+    El DPI se calcula para que la imagen tenga `print_dpi` al imprimirse con
+    `print_width_mm` de ancho, en lugar de un DPI fijo alto.
+    """
+    buffer = io.BytesIO()
+    try:
+        dpi = print_dpi * (print_width_mm / 25.4) / fig.get_figwidth()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight', facecolor='white')
+    finally:
+        plt.close(fig)
+
+    # FPDF 1.7 separa el canal alfa fila por fila con expresiones regulares (muy lento):
+    # se entrega el PNG ya en RGB
+    buffer.seek(0)
+    rgb = io.BytesIO()
+    with Image.open(buffer) as img:
+        img.convert('RGB').save(rgb, format='PNG')
+    return rgb.getvalue()
+
+
+class BasePDF(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 15)
+        self.cell(0, 10, 'Sistema de Gestión Terapéutica', 0, 1, 'C')
+        self.set_font('Arial', 'I', 10)
+        self.cell(0, 10, f'Generado el: {datetime.now().strftime("%Y-%m-%d %H:%M")}', 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+
+    def image_png(self, png_bytes, x=None, y=None, w=0, h=0):
+        """
+        Inserta una imagen PNG desde memoria. FPDF 1.7 solo lee imágenes desde
+        una ruta: se vuelca a un archivo temporal que FPDF.image lee en el acto.
+        """
+        # delete=False: en Windows un NamedTemporaryFile abierto no se puede reabrir
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
+            tmp.write(png_bytes)
+        try:
+            self.image(tmp.name, x, y, w, h, type='PNG')
+        finally:
+            os.remove(tmp.name)
+
+# ==================== GRÁFICOS DEL REPORTE HISTÓRICO ====================
+# Funciones de nivel de módulo (serializables) para poder ejecutarlas en otro proceso:
+# reciben solo las tablas agregadas y devuelven el PNG en bytes.
+
+def _chart_volumen_anual(df_yearly):
+    # Gráfico 1: Evolución Pacientes vs Sesiones
+    fig, ax1 = plt.subplots(figsize=(10, 5))
+    
+    color = 'tab:blue'
+    ax1.set_xlabel('Año')
+    ax1.set_ylabel('Pacientes', color=color)
+    ax1.plot(df_yearly['Año'], df_yearly['Pacientes'], color=color, marker='o', linewidth=2, label='Pacientes')
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.grid(True, alpha=0.3)
+    
+    ax2 = ax1.twinx()  
+    color = 'tab:red'
+    ax2.set_ylabel('Sesiones', color=color)  
+    ax2.plot(df_yearly['Año'], df_yearly['Sesiones'], color=color, marker='s', linestyle='--', linewidth=2, label='Sesiones')
+    ax2.tick_params(axis='y', labelcolor=color)
+    
+    plt.title("Evolución de Volumen Operativo")
+    fig.tight_layout()
+    return figure_to_png_bytes(fig, print_width_mm=190)
+
+def _chart_tendencia_terapias(pivot_plot):
+    # Área Plot
+    fig2, ax2 = plt.subplots(figsize=(10, 6))
+    pivot_plot.plot(kind='area', stacked=True, alpha=0.6, ax=ax2)
+    plt.title("Tendencia de Volumen por Tipo de Terapia (Top 5)")
+    plt.ylabel("Número de Sesiones")
+    plt.xlabel("Año")
+    plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    fig2.tight_layout()
+    return figure_to_png_bytes(fig2, print_width_mm=180)
+
+def _chart_evolucion_eps(df_eps_evo):
+    # Line Plot Multiserie
+    fig3, ax3 = plt.subplots(figsize=(10, 6))
+    df_eps_evo.plot(kind='line', marker='o', linewidth=2, ax=ax3)
+    plt.title("Evolución de Pacientes en Top 6 EPS")
+    plt.ylabel("Pacientes Activos")
+    plt.grid(True, alpha=0.3)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig3.tight_layout()
+    return figure_to_png_bytes(fig3, print_width_mm=180)
+
+CHART_RENDERERS = {
+    'volumen_anual': _chart_volumen_anual,
+    'tendencia_terapias': _chart_tendencia_terapias,
+    'evolucion_eps': _chart_evolucion_eps,
+}
+
+_chart_style_applied = False
+
+def apply_chart_style():
+    """Estilo profesional de matplotlib para los reportes (una vez por proceso)."""
+    global _chart_style_applied
+    if _chart_style_applied:
+        return
+    import seaborn as sns
+
+    plt.style.use('ggplot')
+    sns.set_palette("husl")
+    _chart_style_applied = True
+
+def _render_chart(job):
+    name, data = job
+    return name, CHART_RENDERERS[name](data)
+
+_chart_pool = None
+_chart_pool_lock = threading.Lock()
+
+def _get_chart_pool():
+    """Pool de procesos compartido (matplotlib no es thread-safe); se crea una sola vez."""
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            # 'spawn' evita hacer fork de un proceso con hilos (servidor de Streamlit)
+            _chart_pool = ProcessPoolExecutor(
+                max_workers=min(len(CHART_RENDERERS), os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=apply_chart_style
+            )
+        return _chart_pool
+
+@timed()
+def render_charts(jobs, parallel=True):
+    """
+    Renderiza varios gráficos independientes.
+    
+    Args:
+        jobs (dict): nombre del gráfico (clave de CHART_RENDERERS) -> tabla agregada.
+        parallel (bool): Si es True y hay más de un gráfico, usa el pool de procesos.
+    
+    Returns:
+        dict: nombre del gráfico -> PNG en bytes.
+    """
+    global _chart_pool
+    if parallel and len(jobs) > 1 and (os.cpu_count() or 1) > 1:
+        pool = _get_chart_pool()
+        try:
+            return dict(pool.map(_render_chart, jobs.items()))
+        except Exception as e:
+            print(f"Render paralelo no disponible, se usa render secuencial: {e}")
+            with _chart_pool_lock:
+                # Se cierra el pool fallido (sus procesos) antes de descartarlo; si otra
+                # sesión ya lo reemplazó, el nuevo no se toca
+                if _chart_pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    _chart_pool = None
+    apply_chart_style()
+    return dict(_render_chart(job) for job in jobs.items())
+
+@timed()
+def create_historical_report_pdf(df, parallel_charts=True):
+    """
+    Genera un reporte EVOLUTIVO y ANALÍTICO (2018-Presente).
+    Primero calcula todas las tablas agregadas, luego renderiza los gráficos
+    en paralelo y por último arma el PDF.
+    """
+    pdf = BasePDF()
+    
+    # Datos Preparados
+    if 'AÑO_DATA' not in df.columns:
+        return None
+        
+    # Agrupar por año
+    df_yearly = df.groupby('AÑO_DATA').agg({
+        'CEDULA': 'nunique',
+        'CANTIDAD': 'sum',
+        'PROFESIONAL': 'nunique',
+        'MUNICIPIO': 'nunique'
+    }).reset_index().sort_values('AÑO_DATA')
+    df_yearly.columns = ['Año', 'Pacientes', 'Sesiones', 'Profesionales', 'Municipios']
+    chart_jobs = {'volumen_anual': df_yearly}
+    
+    if 'TIPO_TERAPIA' in df.columns or 'TIPO DE TERAPIAS' in df.columns:
+        col_terapia = 'TIPO_TERAPIA' if 'TIPO_TERAPIA' in df.columns else 'TIPO DE TERAPIAS'
+        
+        # Códigos de terapia normalizados (THERAPY_CODE si ya viene calculada)
+        therapy = get_therapy_codes(df, col_terapia).astype(str).rename(col_terapia)
+        
+        # Pivot Table: Año vs Terapia (Cantidad)
+        pivot_srv = df['CANTIDAD'].groupby([df['AÑO_DATA'], therapy]).sum().unstack(fill_value=0)
+        
+        # Filtrar Top 5 Terapias históricas para el gráfico (para no saturar)
+        top_services = df['CANTIDAD'].groupby(therapy).sum().sort_values(ascending=False).head(5).index
+        chart_jobs['tendencia_terapias'] = pivot_srv[top_services]
+    
+    if 'EPS' in df.columns:
+        # Pivot: Año vs EPS (Pacientes), sin EPS nulas
+        df_eps_clean = df[df['EPS'].notna()]
+        
+        # Top 6 EPS históricas
+        top_eps = df_eps_clean['EPS'].value_counts().head(6).index
+        
+        chart_jobs['evolucion_eps'] = df_eps_clean[df_eps_clean['EPS'].isin(top_eps)].groupby(['AÑO_DATA', 'EPS'])['CEDULA'].nunique().unstack(fill_value=0)
+    
+    charts = render_charts(chart_jobs, parallel=parallel_charts)
+
+    # ==================== PÁGINA 1: PORTADA Y RESUMEN ====================
+    pdf.add_page()
+    pdf.ln(30)
+    pdf.set_font("Arial", 'B', 26)
+    pdf.cell(0, 15, "INFORME DE EVOLUCIÓN HISTÓRICA", 0, 1, 'C')
+    pdf.set_font("Arial", '', 14)
+    min_year = df_yearly['Año'].min()
+    max_year = df_yearly['Año'].max()
+    pdf.cell(0, 10, f"Análisis Longitudinal {min_year} - {max_year}", 0, 1, 'C')
+    pdf.ln(10)
+    
+    # Resumen acumulado
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 8, "Cifras Acumuladas del Periodo:", 0, 1, 'C')
+    
+    total_sess_hist = df['CANTIDAD'].sum()
+    unique_pats_hist = df['CEDULA'].nunique()
+    
+    pdf.set_font("Arial", '', 12)
+    pdf.cell(0, 8, f"Total Sesiones Realizadas: {int(total_sess_hist):,}", 0, 1, 'C')
+    pdf.cell(0, 8, f"Total Pacientes Atendidos: {unique_pats_hist:,}", 0, 1, 'C')
+    
+    pdf.ln(30)
+    pdf.set_font("Arial", 'I', 10)
+    pdf.multi_cell(0, 5, "Este documento presenta el análisis detallado del comportamiento operativo a lo largo de los años. Se enfoca en identificar tendencias de crecimiento, patrones estacionales y la evolución de la demanda de servicios terapéuticos.", 0, 'C')
+
+    # ==================== PÁGINA 2: EVOLUCIÓN DEL CRECIMIENTO ====================
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, "1. CURVA DE CRECIMIENTO ANUAL", 0, 1)
+    pdf.ln(5)
+    
+    pdf.image_png(charts['volumen_anual'], x=10, w=190)
+    
+    pdf.ln(5)
+    
+    # Tabla de Datos Anual
+    pdf.set_font("Arial", 'B', 10)
+    pdf.set_fill_color(220, 220, 220)
+    pdf.cell(25, 8, "Año", 1, 0, 'C', 1)
+    pdf.cell(40, 8, "Pacientes", 1, 0, 'C', 1)
+    pdf.cell(40, 8, "Sesiones", 1, 0, 'C', 1)
+    pdf.cell(40, 8, "Profesionales", 1, 0, 'C', 1)
+    pdf.cell(40, 8, "Var. Pacientes", 1, 1, 'C', 1) # Variación Anual
+    
+    pdf.set_font("Arial", '', 10)
+    prev_pats = 0
+    for idx, row in df_yearly.iterrows():
+        year = str(int(row['Año']))
+        pats = int(row['Pacientes'])
+        sess = int(row['Sesiones'])
+        profs = int(row['Profesionales'])
+        
+        # Calcular variación porcentual
+        if prev_pats > 0:
+            var_pct = ((pats - prev_pats) / prev_pats) * 100
+            var_str = f"{var_pct:+.1f}%"
+        else:
+            var_str = "-"
+        prev_pats = pats
+        
+        pdf.cell(25, 7, year, 1, 0, 'C')
+        pdf.cell(40, 7, f"{pats:,}", 1, 0, 'C')
+        pdf.cell(40, 7, f"{sess:,}", 1, 0, 'C')
+        pdf.cell(40, 7, f"{profs}", 1, 0, 'C')
+        pdf.cell(40, 7, var_str, 1, 1, 'C')
+
+    # ==================== PÁGINA 3: EVOLUCIÓN DE SERVICIOS ====================
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, "2. EVOLUCIÓN DE TIPOS DE TERAPIA", 0, 1)
+    pdf.ln(5)
+    pdf.set_font("Arial", '', 10)
+    pdf.multi_cell(0, 5, "Análisis de cómo ha cambiado la composición de las terapias a lo largo de los años.")
+    pdf.ln(5)
+    
+    if 'tendencia_terapias' in charts:
+        pdf.image_png(charts['tendencia_terapias'], x=10, w=180)
+        
+    # ==================== PÁGINA 4: ANÁLISIS POR EPS ====================
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, "3. DINÁMICA DE CLIENTES (EPS)", 0, 1)
+    
+    if 'evolucion_eps' in charts:
+        pdf.image_png(charts['evolucion_eps'], x=10, w=180)
+        
+    # ==================== CONCLUSIONES (Generadas Dinámicamente) ====================
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, "4. CONCLUSIONES ESTRATÉGICAS", 0, 1)
+    pdf.ln(5)
+    pdf.set_font("Arial", '', 11)
+    
+    conclusions = []
+    
+    # 1. Crecimiento Total
+    start_vals = df_yearly.iloc[0]
+    end_vals = df_yearly.iloc[-1]
+    years_diff = end_vals['Año'] - start_vals['Año']
+    if years_diff > 0:
+        growth_pats = ((end_vals['Pacientes'] - start_vals['Pacientes']) / start_vals['Pacientes']) * 100
+        conclusions.append(f"• En el periodo de {int(years_diff)} años, la base de pacientes ha variado un {growth_pats:+.1f}%.")
+    
+    # 2. Año Pico
+    peak_year_row = df_yearly.loc[df_yearly['Sesiones'].idxmax()]
+    conclusions.append(f"• El año {int(peak_year_row['Año'])} registró la mayor actividad histórica con {int(peak_year_row['Sesiones']):,} sesiones.")
+
+    # 3. Diversificación
+    if 'EPS' in df.columns:
+        eps_start = df[df['AÑO_DATA'] == min_year]['EPS'].nunique()
+        eps_end = df[df['AÑO_DATA'] == max_year]['EPS'].nunique()
+        conclusions.append(f"• La cartera de clientes ha pasado de {eps_start} EPS en {min_year} a {eps_end} EPS en {max_year}.")
+
+    for c in conclusions:
+        pdf.multi_cell(0, 8, c.encode('latin-1', 'replace').decode('latin-1'))
+        pdf.ln(2)
+
+    return pdf.output(dest='S').encode('latin-1', 'replace')
@@ -1,29 +1,44 @@
 
+import numpy as np
 import pandas as pd
 from fpdf import FPDF
 from datetime import datetime
 import io
 import zipfile
 
+from src.core.profiling import timed
+
+# Caracteres sin equivalente en latin-1 (fuentes core de FPDF) -> reemplazo
+_TEXT_REPLACEMENTS = str.maketrans({
+    '\u2013': '-',  # en dash
+    '\u2014': '--', # em dash
+    '\u2018': "'",  # left single quote
+    '\u2019': "'",  # right single quote
+    '\u201c': '"',  # left double quote
+    '\u201d': '"',  # right double quote
+    '\u2022': '*',  # bullet
+})
+
 def clean_text(text):
     if not isinstance(text, str):
         return str(text)
-    # Replace common incompatible characters
-    replacements = {
-        '\u2013': '-',  # en dash
-        '\u2014': '--', # em dash
-        '\u2018': "'",  # left single quote
-        '\u2019': "'",  # right single quote
-        '\u201c': '"',  # left double quote
-        '\u201d': '"',  # right double quote
-        '\u2022': '*',  # bullet
-    }
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
+    # Replace common incompatible characters (una sola pasada con la tabla de traducción)
+    text = text.translate(_TEXT_REPLACEMENTS)
     
     # Final fallback: encode to latin-1 replacing errors, then decode back
     return text.encode('latin-1', 'replace').decode('latin-1')
 
+def clean_column(df, col, default=''):
+    """
+    Equivalente a clean_text(str(valor)) para una columna completa, evaluado
+    una sola vez por valor distinto. Si la columna no existe, repite `default`.
+    """
+    if col not in df.columns:
+        return [clean_text(default)] * len(df)
+    codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+    cleaned = np.array([clean_text(str(v)) for v in uniques], dtype=object)
+    return cleaned[codes].tolist()
+
 class RoutePDF(FPDF):
     def header(self):
         self.set_font('Arial', 'B', 15)
@@ -35,32 +50,88 @@ class RoutePDF(FPDF):
         self.set_text_color(0, 0, 0) # Ensure footer is Black
         self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
 
-def create_route_pdf(df_full, professional_name):
+# --- PLANTILLA DE LA TARJETA DE PACIENTE ---
+# Filas de pares etiqueta-valor (campo, o None si el valor depende del estado del paciente);
+# se arma una vez y se reutiliza en todas las tarjetas y documentos.
+ROUTE_CARD_ROWS = [
+    [("EPS:", 'eps'), ("Municipio:", 'mun')],
+    [("Teléfono:", 'phone')],
+    [("Servicio:", 'service'), ("Tipo Usuario:", 'user_type')],
+    [(None, None)],
+]
+
+PENDING_NOTICE = clean_text(
+    "[!] PACIENTES PENDIENTES: Estos usuarios están por llegar. Solo deben iniciarse cuando se envíe la confirmación. "
+    "Si se trabajan antes, la empresa NO se hace responsable de las sesiones en caso de que no lleguen."
+)
+
+def is_valid_date(val):
+    s = str(val).strip().lower()
+    return s and s != 'nan' and s != 'nat' and s != ''
+
+def prepare_route_cards(df_full):
+    """
+    Datos de las tarjetas de ruta para todas las filas de `df_full`, calculados
+    por columnas completas (saneamiento de texto por valor distinto).
+
+    Returns:
+        dict: listas por campo ya saneadas, más 'pending' (sin fecha de ingreso)
+        y 'sessions' (CANTIDAD numérica, 0 si falta), alineadas con las filas.
+    """
+    n = len(df_full)
+    nombre = clean_column(df_full, 'NOMBRE')
+    apellidos = clean_column(df_full, 'APELLIDOS')
+    tipo_terapia = clean_column(df_full, 'TIPO DE TERAPIAS')
+    cant = clean_column(df_full, 'CANTIDAD')
+
+    if 'FECHA DE INGRESO' in df_full.columns:
+        codes, uniques = pd.factorize(df_full['FECHA DE INGRESO'], use_na_sentinel=False)
+        valid = np.array([bool(is_valid_date(v)) for v in uniques], dtype=bool)
+        pending = ~valid[codes]
+    else:
+        # Sin la columna, row.get() devolvía None ('none' es una fecha "válida"): todos activos
+        pending = np.zeros(n, dtype=bool)
+
+    if 'CANTIDAD' in df_full.columns:
+        sessions = pd.to_numeric(df_full['CANTIDAD'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    else:
+        sessions = np.zeros(n)
+
+    return {
+        'name': [f"{a} {b}" for a, b in zip(nombre, apellidos)],
+        'address': clean_column(df_full, 'DIRECCION'),
+        'mun': clean_column(df_full, 'MUNICIPIO'),
+        'phone': clean_column(df_full, 'TELEFONO'),
+        'service': [f"{t} ({c} ses.)" for t, c in zip(tipo_terapia, cant)],
+        'doc_type': clean_column(df_full, 'TIPO DE DOCUMENTO', 'Type'),
+        'doc_num': clean_column(df_full, 'NUMERO'),
+        'user_type': clean_column(df_full, 'TIPO DE USUARIO'),
+        'eps': clean_column(df_full, 'EPS'),
+        'diagnosis': clean_column(df_full, 'DIAGNOSTICO'),
+        'f_ingreso': clean_column(df_full, 'FECHA DE INGRESO'),
+        'f_egreso': clean_column(df_full, 'FECHA DE EGRESO'),
+        'pending': pending,
+        'sessions': sessions,
+    }
+
+def render_route_pdf(cards, positions, professional_name):
+    """Hoja de ruta de un profesional a partir de las tarjetas preparadas (filas en `positions`)."""
     # Switch to Portrait for a document/list feel
     pdf = RoutePDF(orientation='P') 
     pdf.add_page()
     
-    # --- HELPER: Identify Valid Date ---
-    def is_valid_date(val):
-        s = str(val).strip().lower()
-        return s and s != 'nan' and s != 'nat' and s != ''
-    
     # --- DATA SPLIT ---
-    active_rows = []
-    pending_rows = []
-    
-    for idx, row in df_full.iterrows():
-        if is_valid_date(row.get('FECHA DE INGRESO')):
-            active_rows.append(row)
-        else:
-            pending_rows.append(row)
+    positions = np.asarray(positions)
+    is_pending = cards['pending'][positions]
+    active_rows = positions[~is_pending]
+    pending_rows = positions[is_pending]
             
     # Calculate Stats
     n_active = len(active_rows)
-    s_active = sum([float(r.get('CANTIDAD', 0)) for r in active_rows if pd.notna(r.get('CANTIDAD'))])
+    s_active = cards['sessions'][active_rows].sum()
     
     n_pending = len(pending_rows)
-    s_pending = sum([float(r.get('CANTIDAD', 0)) for r in pending_rows if pd.notna(r.get('CANTIDAD'))])
+    s_pending = cards['sessions'][pending_rows].sum()
 
     # Title
     pdf.set_font("Arial", 'B', 16)
@@ -82,76 +153,62 @@ def create_route_pdf(df_full, professional_name):
     pdf.set_text_color(0, 0, 0) # Reset to Black
     pdf.ln(5)
     
+    # Métodos usados por cada tarjeta, resueltos una vez por documento
+    cell, multi_cell, set_font = pdf.cell, pdf.multi_cell, pdf.set_font
+
+    # Helper to print label-value pairs
+    def print_field(label, value, end_line=False, w_label=35):
+        set_font("Arial", 'B', 10)
+        cell(w_label, 6, label, 0, 0)
+        set_font("Arial", '', 10)
+        val_str = value if value else "N/A"
+        if end_line:
+            cell(0, 6, val_str, 0, 1)
+        else:
+            cell(60, 6, val_str, 0, 0)
+
     # --- RENDER CARD FUNCTION ---
-    def render_patient_card(row, is_pending=False):
-        # Extract Data
-        name = clean_text(f"{row.get('NOMBRE', '')} {row.get('APELLIDOS', '')}")
-        address = clean_text(str(row.get('DIRECCION', '')))
-        mun = clean_text(str(row.get('MUNICIPIO', '')))
-        phone = clean_text(str(row.get('TELEFONO', '')))
-        tipo_terapia = clean_text(str(row.get('TIPO DE TERAPIAS', '')))
-        cant = clean_text(str(row.get('CANTIDAD', '')))
-        doc_type = clean_text(str(row.get('TIPO DE DOCUMENTO', 'Type')))
-        doc_num = clean_text(str(row.get('NUMERO', '')))
-        user_type = clean_text(str(row.get('TIPO DE USUARIO', '')))
-        eps = clean_text(str(row.get('EPS', '')))
-        diagnosis = clean_text(str(row.get('DIAGNOSTICO', '')))
-        f_ingreso = clean_text(str(row.get('FECHA DE INGRESO', '')))
-        f_egreso = clean_text(str(row.get('FECHA DE EGRESO', '')))
+    def render_patient_card(i, is_pending=False):
+        name = cards['name'][i]
+        doc_label = f"{name} ({cards['doc_type'][i]}: {cards['doc_num'][i]})"
         
         # Color Logic
         if is_pending:
             pdf.set_fill_color(255, 240, 230) # Light Orange for Pending
             pdf.set_text_color(200, 0, 0)     # RED TEXT for Pending
-            entry_title = f"[PENDIENTE] {name} ({doc_type}: {doc_num})"
+            entry_title = f"[PENDIENTE] {doc_label}"
         else:
             pdf.set_fill_color(230, 240, 255) # Light Blue for Active
             pdf.set_text_color(0, 0, 0)       # BLACK TEXT for Active
-            entry_title = f"{name} ({doc_type}: {doc_num})"
+            entry_title = doc_label
 
         # Header
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 8, f" {entry_title}", 0, 1, 'L', 1)
-        
-        # Details Block
-        pdf.set_font("Arial", '', 10)
+        set_font("Arial", 'B', 12)
+        cell(0, 8, f" {entry_title}", 0, 1, 'L', 1)
         
-        # Helper to print label-value pairs
-        def print_field(label, value, end_line=False, w_label=35):
-            pdf.set_font("Arial", 'B', 10)
-            pdf.cell(w_label, 6, label, 0, 0)
-            pdf.set_font("Arial", '', 10)
-            val_str = str(value) if value else "N/A"
-            if end_line:
-                pdf.cell(0, 6, val_str, 0, 1)
-            else:
-                pdf.cell(60, 6, val_str, 0, 0)
-
-        # Row 1
-        print_field("EPS:", eps)
-        print_field("Municipio:", mun, end_line=True)
-        # Row 2
-        print_field("Teléfono:", phone, end_line=True)
-        # Row 3
-        print_field("Servicio:", f"{tipo_terapia} ({cant} ses.)")
-        print_field("Tipo Usuario:", user_type, end_line=True)
-        # Row 4 (Dates)
-        if is_pending:
-             print_field("Estado:", "PENDIENTE DE INGRESO", end_line=True)
-        else:
-             print_field("Vigencia:", f"{f_ingreso} al {f_egreso}", end_line=True)
+        # Details Block (plantilla de filas)
+        for row in ROUTE_CARD_ROWS:
+            last = len(row) - 1
+            for j, (label, field) in enumerate(row):
+                if field is not None:
+                    print_field(label, cards[field][i], end_line=(j == last))
+                elif is_pending:
+                    print_field("Estado:", "PENDIENTE DE INGRESO", end_line=True)
+                else:
+                    print_field("Vigencia:", f"{cards['f_ingreso'][i]} al {cards['f_egreso'][i]}", end_line=True)
 
         # Full Width Entries
-        pdf.set_font("Arial", 'B', 10)
-        pdf.cell(35, 6, "Dirección:", 0, 0)
-        pdf.set_font("Arial", '', 10)
-        pdf.multi_cell(0, 6, address)
+        set_font("Arial", 'B', 10)
+        cell(35, 6, "Dirección:", 0, 0)
+        set_font("Arial", '', 10)
+        multi_cell(0, 6, cards['address'][i])
         
+        diagnosis = cards['diagnosis'][i]
         if diagnosis:
-            pdf.set_font("Arial", 'B', 10)
-            pdf.cell(35, 6, "Diagnóstico:", 0, 0)
-            pdf.set_font("Arial", '', 10)
-            pdf.multi_cell(0, 6, diagnosis)
+            set_font("Arial", 'B', 10)
+            cell(35, 6, "Diagnóstico:", 0, 0)
+            set_font("Arial", '', 10)
+            multi_cell(0, 6, diagnosis)
 
         # Separator line
         pdf.ln(4)
@@ -162,8 +219,8 @@ def create_route_pdf(df_full, professional_name):
 
 
     # 1. RENDER ACTIVE PATIENTS
-    for row in active_rows:
-        render_patient_card(row, is_pending=False)
+    for i in active_rows:
+        render_patient_card(i, is_pending=False)
         
     # 2. RENDER PENDING PATIENTS (If any)
     if len(pending_rows) > 0:
@@ -178,15 +235,20 @@ def create_route_pdf(df_full, professional_name):
         pdf.cell(0, 10, "EVENTOS PENDIENTES (NO INICIAR SIN AUTORIZACIÓN)", 0, 1, 'C')
         
         pdf.set_font("Arial", 'B', 10)
-        pdf.multi_cell(0, 5, "[!] PACIENTES PENDIENTES: Estos usuarios están por llegar. Solo deben iniciarse cuando se envíe la confirmación. Si se trabajan antes, la empresa NO se hace responsable de las sesiones en caso de que no lleguen.", 0, 'C')
+        pdf.multi_cell(0, 5, PENDING_NOTICE, 0, 'C')
         pdf.set_text_color(0, 0, 0) # Reset
         pdf.ln(10)
         
-        for row in pending_rows:
-            render_patient_card(row, is_pending=True)
+        for i in pending_rows:
+            render_patient_card(i, is_pending=True)
         
     return pdf.output(dest='S').encode('latin-1', 'replace')
 
+@timed()
+def create_route_pdf(df_full, professional_name):
+    return render_route_pdf(prepare_route_cards(df_full), np.arange(len(df_full)), professional_name)
+
+@timed()
 def generate_all_routes_zip(df_full):
     """
     Generates a ZIP file containing route PDFs for all professionals in the dataframe.
@@ -197,23 +259,22 @@ def generate_all_routes_zip(df_full):
     if 'PROFESIONAL' not in df_full.columns:
         return None
         
-    professionals = df_full['PROFESIONAL'].dropna().unique()
+    # Tarjetas de todas las filas en una pasada; cada PDF solo toma sus posiciones
+    cards = prepare_route_cards(df_full)
+    groups = df_full.reset_index(drop=True).groupby('PROFESIONAL', sort=False).indices
     
     with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for prof in professionals:
+        for prof, positions in groups.items():
             prof_name = str(prof).strip()
             if not prof_name:
                 continue
                 
-            # Filter data for this professional
-            df_prof = df_full[df_full['PROFESIONAL'] == prof]
-            
-            if df_prof.empty:
+            if len(positions) == 0:
                 continue
                 
             try:
                 # Generate PDF
-                pdf_bytes = create_route_pdf(df_prof, prof_name)
+                pdf_bytes = render_route_pdf(cards, positions, prof_name)
                 
                 # Add to ZIP
                 filename = f"Ruta_{clean_text(prof_name).replace(' ', '_')}.pdf"
@@ -223,6 +284,53 @@ def generate_all_routes_zip(df_full):
                 
     return zip_buffer.getvalue()
 
+# Especialidades del informe de cobertura, en orden de prioridad, con las
+# palabras clave que la identifican en cualquiera de las terapias del profesional
+SPECIALTY_KEYWORDS = [
+    ('FISIOTERAPIA', ['FISIO', 'FÍSIO']),
+    ('FONOAUDIOLOGÍA', ['FONO', 'TL', 'LENGUAJE']),
+    ('TERAPIA OCUPACIONAL', ['OCUP', 'TO']),
+    ('PSICOLOGÍA', ['PSICO']),
+    ('PEDAGOGÍA', ['PEDAG']),
+]
+SPECIALTIES = [name for name, _ in SPECIALTY_KEYWORDS] + ['OTROS']
+
+def specialty_flags(therapies):
+    """
+    Matriz booleana (filas x especialidades de SPECIALTY_KEYWORDS): la terapia
+    de cada fila contiene alguna palabra clave. Se evalúa por valor distinto.
+    """
+    codes, uniques = pd.factorize(therapies, use_na_sentinel=False)
+    texts = [str(v).upper() for v in uniques]
+    lookup = np.array([[any(k in t for k in keywords) for _, keywords in SPECIALTY_KEYWORDS] for t in texts],
+                      dtype=bool).reshape(len(texts), len(SPECIALTY_KEYWORDS))
+    return lookup[codes]
+
+def municipality_coverage(df):
+    """
+    Profesionales por municipio y especialidad, con un solo groupby sobre
+    (MUNICIPIO, PROFESIONAL). La especialidad de un profesional en un municipio
+    es la primera (por prioridad) presente en alguna de sus terapias allí.
+
+    Returns:
+        dict: municipio -> {especialidad: [nombres saneados]}
+    """
+    therapies = df['TIPO DE TERAPIAS'] if 'TIPO DE TERAPIAS' in df.columns else pd.Series('', index=df.index)
+    flags = pd.DataFrame(specialty_flags(therapies), index=df.index)
+    has_specialty = flags.groupby([df['MUNICIPIO'], df['PROFESIONAL']], sort=False).any()
+    if has_specialty.empty:
+        return {}
+
+    matrix = has_specialty.to_numpy()
+    # Primera especialidad presente; si no hay ninguna, OTROS
+    chosen = np.where(matrix.any(axis=1), matrix.argmax(axis=1), len(SPECIALTY_KEYWORDS))
+
+    coverage = {}
+    for (muni, prof), spec in zip(has_specialty.index, chosen):
+        coverage.setdefault(muni, {}).setdefault(SPECIALTIES[spec], []).append(clean_text(str(prof)))
+    return coverage
+
+@timed()
 def create_municipality_report_pdf(df):
     """
     Generates a PDF report listing coverage by Municipality and Specialty.
@@ -245,56 +353,21 @@ def create_municipality_report_pdf(df):
     # Get Municipalities
     municipalities = sorted([m for m in df['MUNICIPIO'].dropna().unique() if str(m).strip() != ''], key=str)
     
+    # Especialidad de cada profesional en cada municipio, en una sola pasada
+    coverage = municipality_coverage(df)
+    
     for muni in municipalities:
-        # Filter for Muni
-        df_muni = df[df['MUNICIPIO'] == muni]
-        
         # Header for Municipality
         pdf.set_font("Arial", 'B', 14)
         pdf.set_fill_color(240, 240, 240)
         pdf.cell(0, 10, f"MUNICIPIO: {clean_text(str(muni).upper())}", 0, 1, 'L', 1)
         pdf.ln(2)
         
-        # Identify Professionals and their Specialties in this context
-        # We assume a professional has one main specialty per row, or we aggregate logic
-        # Logic: Iterate unique professionals, find their most common therapy type
-        
-        profs_in_muni = df_muni['PROFESIONAL'].dropna().unique()
-        
-        # Categorize
-        specialties_map = {
-            'FISIOTERAPIA': [],
-            'FONOAUDIOLOGÍA': [],
-            'TERAPIA OCUPACIONAL': [],
-            'PSICOLOGÍA': [],
-            'PEDAGOGÍA': [],
-            'OTROS': []
-        }
-        
-        for prof in profs_in_muni:
-            # Determine Specialty based on available data for this prof in this muni
-            df_p = df_muni[df_muni['PROFESIONAL'] == prof]
-            
-            # Check therapies
-            therapies_str = " ".join(df_p['TIPO DE TERAPIAS'].astype(str).unique()).upper()
-            
-            clean_name = clean_text(str(prof))
-            
-            if 'FISIO' in therapies_str or 'FÍSIO' in therapies_str:
-                specialties_map['FISIOTERAPIA'].append(clean_name)
-            elif 'FONO' in therapies_str or 'TL' in therapies_str or 'LENGUAJE' in therapies_str:
-                 specialties_map['FONOAUDIOLOGÍA'].append(clean_name)
-            elif 'OCUP' in therapies_str or 'TO' in therapies_str:
-                 specialties_map['TERAPIA OCUPACIONAL'].append(clean_name)
-            elif 'PSICO' in therapies_str:
-                 specialties_map['PSICOLOGÍA'].append(clean_name)
-            elif 'PEDAG' in therapies_str:
-                 specialties_map['PEDAGOGÍA'].append(clean_name)
-            else:
-                 specialties_map['OTROS'].append(clean_name)
+        specialties_map = coverage.get(muni, {})
                  
         # Print Grouped
-        for spec_name, prof_list in specialties_map.items():
+        for spec_name in SPECIALTIES:
+            prof_list = specialties_map.get(spec_name)
             if not prof_list:
                 continue
                 
@@ -306,7 +379,7 @@ def create_municipality_report_pdf(df):
             # List Professionals
             pdf.set_font("Arial", '', 10)
             pdf.set_text_color(0, 0, 0)
-            for p in sorted(list(set(prof_list))): # Dedupe just in case
+            for p in sorted(set(prof_list)): # Dedupe just in case
                 pdf.cell(10, 5, "", 0, 0)
                 pdf.cell(0, 5, f"- {p}", 0, 1)
             
@@ -316,6 +389,7 @@ def create_municipality_report_pdf(df):
         
     return pdf.output(dest='S').encode('latin-1', 'replace')
 
+@timed()
 def create_general_professionals_report_pdf(df):
     """
     Generates a PDF report listing ALL professionals (Uncategorized, Alphabetical).
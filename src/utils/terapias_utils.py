@@ -0,0 +1,79 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+def clean_therapy_standard(val):
+    """
+    Normaliza los nombres de terapias a códigos estándar:
+    - TL: Terapia de Lenguaje / Fonoaudiología
+    - TF: Terapia Física / Fisioterapia
+    - TO: Terapia Ocupacional
+    - PS: Psicología
+    Elimina números y caracteres extra.
+    """
+    if pd.isna(val): return "N/A"
+    s = str(val).upper().strip()
+    
+    # 1. Códigos estándar y variaciones comunes
+    if 'TL' in s or 'FONO' in s or 'LENGUAJ' in s or 'COMUNICA' in s: return 'TL'
+    if 'TF' in s or 'FISI' in s: return 'TF'
+    if 'TO' in s or 'OCUP' in s: return 'TO'
+    if 'PS' in s or 'SICO' in s: return 'PS'
+    if 'EDUC' in s or 'ESP' in s: return 'EE'
+    
+    # 2. Limpieza de prefijos numéricos ("01. TL", "2-TF")
+    # Eliminar todo lo que NO sea letra
+    cleaned = re.sub(r'[^A-Z]', '', s)
+    
+    # Si queda algo razonable (2-3 chars), usarlo
+    if 2 <= len(cleaned) <= 3:
+        return cleaned
+        
+    # 3. Fallback estricto: Si no se reconoció nada válido (ej: "1", "A", "2023"), agrupar
+    return "OTROS"
+
+
+# Columna categórica con el código de terapia, materializada al cargar los datos
+THERAPY_CODE_COL = 'THERAPY_CODE'
+
+
+@lru_cache(maxsize=4096)
+def _therapy_code(val):
+    """`clean_therapy_standard` memorizado por valor crudo (los valores distintos son pocos)."""
+    return clean_therapy_standard(val)
+
+
+def therapy_codes(series):
+    """
+    Clasifica una columna de terapias evaluando `clean_therapy_standard` una
+    sola vez por valor distinto. Devuelve una Serie categórica (mismo índice).
+    """
+    codes, uniques = pd.factorize(series)
+    labels = [_therapy_code(v) for v in uniques] + ['N/A']  # el código -1 (nulos) apunta a 'N/A'
+    categories = sorted(set(labels))
+    label_codes = np.array([categories.index(label) for label in labels], dtype=np.int16)
+    categorical = pd.Categorical.from_codes(label_codes[codes], categories=categories)
+    return pd.Series(categorical, index=series.index, name=THERAPY_CODE_COL)
+
+
+def add_therapy_code(df, col):
+    """Devuelve `df` con la columna THERAPY_CODE calculada desde `col` (sin modificar `df`)."""
+    if col not in df.columns:
+        return df
+    return df.assign(**{THERAPY_CODE_COL: therapy_codes(df[col])})
+
+
+def get_therapy_codes(df, col):
+    """Códigos de terapia de `df`: la columna ya materializada o, si falta, calculada desde `col`."""
+    if THERAPY_CODE_COL in df.columns:
+        return df[THERAPY_CODE_COL]
+    return therapy_codes(df[col])
+
+
+def drop_therapy_code(df):
+    """`df` sin la columna interna THERAPY_CODE, para tablas y descargas (no modifica `df`)."""
+    if THERAPY_CODE_COL not in df.columns:
+        return df
+    return df.drop(columns=THERAPY_CODE_COL)
@@ -6,6 +6,10 @@ import re
 import json
 from unidecode import unidecode
 
+from src.utils.normalizacion_utils import normalize_data
+from src.utils.terapias_utils import add_therapy_code
+from src.utils.historico_utils import HistoricalStore
+
 # Mapping of historical column names to standard names
 COLUMN_MAPPING = {
     # Names
@@ -134,31 +138,27 @@ def scan_trazabilidades(base_path):
     return consolidated_df
 
 @st.cache_data(ttl=3600)
-def load_historical_data_db(db_path):
+def load_historical_data_db(db_path, filters=None):
     """
-    Carga los datos históricos desde la base de datos SQLite optimizada.
+    Carga filas del histórico desde la base SQLite tipada (ver historico_utils),
+    con los filtros {columna: valores} aplicados en la base. Para KPIs y gráficos
+    conviene consultar HistoricalStore, que agrega en SQL sin traer las filas.
     """
     if not os.path.exists(db_path):
         return pd.DataFrame()
         
     try:
-        import sqlite3
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql('SELECT * FROM trazabilidad', conn)
-        conn.close()
-        
-        if 'FECHA_INICIO' in df.columns:
-            df['FECHA_INICIO'] = pd.to_datetime(df['FECHA_INICIO'], errors='coerce')
-        if 'FECHA_EGRESO' in df.columns:
-            df['FECHA_EGRESO'] = pd.to_datetime(df['FECHA_EGRESO'], errors='coerce')
-            
-        return df
+        return HistoricalStore(db_path).rows(filters)
     except Exception as e:
         print(f"Error leyendo DB: {e}")
         return pd.DataFrame()
 
 @st.cache_data(ttl=3600)
 def load_historical_data_json(path):
+    """Versión cacheada de read_historical_data_json (todas las filas en memoria)."""
+    return read_historical_data_json(path)
+
+def read_historical_data_json(path):
     """
     Carga datos históricos desde archivos JSON individuales o un archivo consolidado.
     Realiza normalización automática de columnas.
@@ -292,8 +292,30 @@ def load_historical_data_json(path):
         }
         consolidated_df['MUNICIPIO'] = consolidated_df['MUNICIPIO'].replace(corrections)
 
+    # 5. Normalización global (profesionales): una vez por carga cacheada, no en cada rerun
+    consolidated_df = normalize_data(consolidated_df)
+
+    # 6. Código de terapia normalizado (categórico), reutilizado por gráficos y reportes
+    consolidated_df = add_therapy_code(consolidated_df, 'TIPO_TERAPIA')
+
     return consolidated_df
 
+def get_path_version(path):
+    """
+    Versión de los datos en `path` (archivo o carpeta): la fecha de modificación
+    más reciente. Sirve como clave de caché para lo derivado de esos archivos.
+    """
+    if not os.path.exists(path):
+        return None
+    if os.path.isfile(path):
+        return os.path.getmtime(path)
+    latest = os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            if file.endswith('.json'):
+                latest = max(latest, os.path.getmtime(os.path.join(root, file)))
+    return latest
+
 def get_rendicion_stats(df):
     """
     Calculates summary stats for Rendición de Cuentas.